@@ -0,0 +1,522 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+load_dotenv() # Before the project imports, which read their settings when imported
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from judgment_pipeline import BACKEND, LATENCY, MODEL_NAME, analyze_pdf
+from model_backend import MODEL_BACKEND
+from model_runner import RateLimiter
+from report_pdf import generate_pdf_output
+from result_cache import hash_bytes
+from tracing import Trace
+
+# --- Configuration ---
+# Jobs are queued and run inside this process, so serve it with a single uvicorn worker process
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4")) # Judgments analysed at once; each makes up to two model calls at a time
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", "32")) # Jobs waiting for a worker; beyond this new jobs get a 503
+API_RATE_LIMIT = int(os.getenv("API_RATE_LIMIT", "120")) # Requests per minute per client; 0 for no limit
+API_JOB_RATE_LIMIT = int(os.getenv("API_JOB_RATE_LIMIT", "20")) # Jobs submitted per minute per client; 0 for no limit
+API_KEYS = {key for key in os.getenv("API_KEYS", "").split(",") if key} # If set, every request needs one in X-API-Key
+API_MAX_UPLOAD_MB = float(os.getenv("API_MAX_UPLOAD_MB", "50"))
+API_UPLOAD_DIR = os.getenv("API_UPLOAD_DIR", os.path.join(".cache", "uploads")) # Uploaded PDFs, one per content hash
+API_UPLOAD_TTL_HOURS = float(os.getenv("API_UPLOAD_TTL_HOURS", "24")) # Uploads unused this long are deleted
+API_KEPT_JOBS = int(os.getenv("API_KEPT_JOBS", "1000")) # Finished jobs kept for polling; the oldest are dropped first
+API_REPORT_CACHE_ENTRIES = int(os.getenv("API_REPORT_CACHE_ENTRIES", "32")) # Rendered reports kept in memory
+STREAM_KEEPALIVE_SECONDS = 15 # A comment line is sent this often on an idle event stream so proxies keep it open
+UPLOAD_SWEEP_SECONDS = 3600 # How often uploads past API_UPLOAD_TTL_HOURS are looked for
+
+MAX_UPLOAD_BYTES = int(API_MAX_UPLOAD_MB * 1024 * 1024)
+FINISHED = ("done", "rejected", "failed")
+JOB_FIELDS = ("job_id", "file_name", "doc_hash", "status", "progress", "summary", "key_info", "key_info_fields",
+              "num_chars", "strategy", "duplicate_of", "similarity", "error", "submitted_at", "started_at",
+              "finished_at")
+
+
+# --- Uploaded PDFs ---
+# POST /judgments stores a PDF under its content hash, for any number of jobs on it until it has gone
+# unused for API_UPLOAD_TTL_HOURS. A PDF sent with POST /jobs is stored for that job alone and deleted
+# when the job finishes.
+def upload_path(doc_hash):
+    return os.path.join(API_UPLOAD_DIR, f"{doc_hash}.pdf")
+
+
+def job_pdf_path():
+    return os.path.join(API_UPLOAD_DIR, "jobs", f"{uuid.uuid4().hex}.pdf")
+
+
+def _write_atomically(path, pdf_bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(temp_path, path) # Readers never see a half-written file
+
+
+def save_upload(pdf_bytes):
+    """Stores an uploaded PDF under its content hash (once, however often it is uploaded) and returns the hash."""
+    doc_hash = hash_bytes(pdf_bytes)
+    path = upload_path(doc_hash)
+    if os.path.exists(path):
+        touch_upload(doc_hash)
+    else:
+        _write_atomically(path, pdf_bytes)
+    return doc_hash
+
+
+def save_job_pdf(pdf_bytes):
+    """Stores a PDF sent with a job in a file of its own and returns (doc_hash, path)."""
+    path = job_pdf_path()
+    _write_atomically(path, pdf_bytes)
+    return hash_bytes(pdf_bytes), path
+
+
+def touch_upload(doc_hash):
+    """Marks an uploaded PDF as used now, restarting its time to live."""
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(upload_path(doc_hash))
+
+
+def remove_file(path):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def remove_old_uploads(ttl_seconds=API_UPLOAD_TTL_HOURS * 3600):
+    """
+    Deletes uploads unused for ttl_seconds, and job PDFs and partial writes left behind by a
+    server that stopped mid-job. Returns the number of files deleted.
+    """
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for directory in (API_UPLOAD_DIR, os.path.join(API_UPLOAD_DIR, "jobs")):
+        with contextlib.suppress(FileNotFoundError):
+            for entry in os.scandir(directory):
+                with contextlib.suppress(FileNotFoundError):
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+    return removed
+
+
+async def sweep_uploads():
+    """Runs remove_old_uploads every UPLOAD_SWEEP_SECONDS while the server is up."""
+    while True:
+        try:
+            await run_in_threadpool(remove_old_uploads)
+        except OSError as e:
+            print(f"Could not delete old uploads: {e}")
+        await asyncio.sleep(UPLOAD_SWEEP_SECONDS)
+
+
+# --- Job Queue ---
+class JobQueue:
+    """
+    In-process queue of judgment analyses drained by a pool of worker threads, each running one
+    job through analyze_pdf at a time. Waiting jobs are capped at max_queued: submit() raises
+    asyncio.QueueFull beyond that, so a burst is turned away at once instead of piling up
+    behind the model quota. A PDF already queued or running isn't queued again.
+    Jobs are dicts of JOB_FIELDS; workers update them in place, and watchers are woken on each change.
+    submit(), get() and watch() must be called from the event loop.
+    """
+
+    def __init__(self, workers=API_WORKERS, max_queued=API_QUEUE_SIZE, kept_jobs=API_KEPT_JOBS):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.kept_jobs = kept_jobs
+        self.jobs = OrderedDict()
+        self._active = {} # doc_hash -> job_id of its queued or running job
+        self._job_pdfs = {} # job_id -> PDF sent with the job, deleted when it finishes
+        self._changed = {} # job_id -> asyncio.Event set (and replaced) at the job's next change
+        self._running = 0
+        self._durations = [] # Seconds taken by recent jobs, to estimate when there will be room
+        self._lock = threading.Lock()
+        self._queue = None
+        self._loop = None
+        self._pool = None
+        self._tasks = []
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="judgment")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, doc_hash, file_name, pdf_path=None):
+        """
+        Queues a PDF and returns (job, created); created is False for a job already in progress.
+        The PDF is the upload stored for doc_hash, or pdf_path, a file of the job's own that is
+        deleted when the job finishes (or at once if it isn't queued).
+        """
+        job_id = self._active.get(doc_hash)
+        if job_id is not None:
+            if pdf_path is not None:
+                remove_file(pdf_path)
+            return self.jobs[job_id], False
+        job = dict.fromkeys(JOB_FIELDS)
+        job.update(job_id=uuid.uuid4().hex, file_name=file_name, doc_hash=doc_hash, status="queued", progress=0.0,
+                   submitted_at=time.time())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull: # max_queued jobs are waiting
+            if pdf_path is not None:
+                remove_file(pdf_path)
+            raise
+        if pdf_path is not None:
+            self._job_pdfs[job["job_id"]] = pdf_path
+        self.jobs[job["job_id"]] = job
+        self._active[doc_hash] = job["job_id"]
+        self._changed[job["job_id"]] = asyncio.Event()
+        self._drop_old_jobs()
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def watch(self, job_id):
+        """
+        Returns (job, changed): the job, or None if there is no such job, and an asyncio.Event
+        that is set at its next change, so a change made while the job is being read isn't missed.
+        """
+        return self.jobs.get(job_id), self._changed.get(job_id)
+
+    def retry_after(self):
+        """Rough seconds until a worker frees up a queue slot, from the time recent jobs took."""
+        with self._lock:
+            average = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return max(1, math.ceil(average / self.workers))
+
+    def stats(self):
+        with self._lock:
+            running = self._running
+        return {"workers": self.workers, "running": running, "queued": self._queue.qsize(),
+                "max_queued": self.max_queued, "jobs": len(self.jobs)}
+
+    def _drop_old_jobs(self):
+        """Forgets the oldest finished jobs beyond kept_jobs; queued and running ones are always kept."""
+        excess = len(self.jobs) - self.kept_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["status"] in FINISHED][:excess]:
+            del self.jobs[job_id]
+            self._notify(job_id) # Ends any event stream still open on it
+            del self._changed[job_id]
+
+    def _notify(self, job_id):
+        event = self._changed.get(job_id)
+        if event is not None:
+            self._changed[job_id] = asyncio.Event()
+            event.set()
+
+    def _update(self, job, **changes):
+        """Worker thread: changes a job and wakes whoever is waiting on it."""
+        job.update(changes)
+        self._loop.call_soon_threadsafe(self._notify, job["job_id"])
+
+    def _run(self, job):
+        """Worker thread: analyses one uploaded judgment, recording its status, progress and results in the job."""
+        with self._lock:
+            self._running += 1
+        started = time.time()
+        self._update(job, status="checking", started_at=started)
+        with Trace(job["file_name"]):
+            try:
+                with open(self._job_pdfs.get(job["job_id"]) or upload_path(job["doc_hash"]), "rb") as f:
+                    pdf_bytes = f.read()
+                result = analyze_pdf(pdf_bytes, job["doc_hash"], name=job["file_name"],
+                                     on_status=lambda status, progress: self._update(job, status=status, progress=progress))
+                self._update(job, **result, progress=1.0, finished_at=time.time())
+            except Exception as e:
+                self._update(job, status="failed", error=f"Error processing {job['file_name']}: {e}",
+                             finished_at=time.time())
+        with self._lock:
+            self._running -= 1
+            self._durations = self._durations[-49:] + [time.time() - started]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._loop.run_in_executor(self._pool, self._run, job)
+            finally:
+                self._active.pop(job["doc_hash"], None)
+                pdf_path = self._job_pdfs.pop(job["job_id"], None)
+                if pdf_path is not None:
+                    remove_file(pdf_path)
+
+
+JOBS = JobQueue()
+
+
+# --- Per-Client Rate Limits ---
+class ClientLimits:
+    """
+    A RateLimiter of rpm requests per minute for each client, created on its first request.
+    The least recently seen clients are forgotten beyond max_clients.
+    """
+
+    def __init__(self, rpm, max_clients=10000):
+        self.rpm = rpm
+        self.max_clients = max_clients
+        self._limiters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, client):
+        """Returns 0 if the client may make a request now, otherwise the seconds until it may."""
+        if not self.rpm:
+            return 0.0
+        with self._lock:
+            limiter = self._limiters.pop(client, None) or RateLimiter(self.rpm)
+            self._limiters[client] = limiter
+            if len(self._limiters) > self.max_clients:
+                self._limiters.popitem(last=False)
+        return limiter.try_acquire()
+
+
+REQUEST_LIMITS = ClientLimits(API_RATE_LIMIT)
+JOB_LIMITS = ClientLimits(API_JOB_RATE_LIMIT)
+
+
+def client_id(request):
+    """
+    Clients are told apart by their API key, or by address when the service runs without keys
+    (an unchecked key could be changed on every request to get round the rate limits).
+    """
+    if API_KEYS:
+        return request.headers["x-api-key"] # endpoint() has checked it
+    return request.client.host if request.client else "unknown"
+
+
+def error_response(status_code, message, retry_after=None):
+    headers = {"Retry-After": str(math.ceil(retry_after))} if retry_after else None
+    return JSONResponse({"error": message}, status_code=status_code, headers=headers)
+
+
+def endpoint(handler):
+    """Checks the API key and the client's request rate before handler runs."""
+    async def checked(request):
+        if API_KEYS and request.headers.get("x-api-key") not in API_KEYS:
+            return error_response(401, "A valid X-API-Key header is required.")
+        wait = REQUEST_LIMITS.try_acquire(client_id(request))
+        if wait > 0:
+            return error_response(429, "Too many requests.", retry_after=wait)
+        return await handler(request)
+    return checked
+
+
+def public_job(job):
+    """A job as returned by the API, with links to its event stream and report."""
+    return dict(job, links={"self": f"/jobs/{job['job_id']}", "events": f"/jobs/{job['job_id']}/events",
+                            "report": f"/jobs/{job['job_id']}/report"})
+
+
+# --- Request Bodies ---
+async def read_pdf(request):
+    """
+    Returns (pdf_bytes, file_name) from a multipart form's "file" field or a raw application/pdf
+    body (named by the ?file_name= parameter), or an error response.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+        return None, error_response(413, f"PDFs are limited to {API_MAX_UPLOAD_MB:g} MB.")
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form(max_files=1) as form:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return None, error_response(400, 'Send the PDF in a form field named "file".')
+            if upload.size and upload.size > MAX_UPLOAD_BYTES:
+                return None, error_response(413, f"PDFs are limited to {API_MAX_UPLOAD_MB:g} MB.")
+            pdf_bytes, file_name = await upload.read(), upload.filename or "judgment.pdf"
+    else:
+        chunks, size = [], 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                return None, error_response(413, f"PDFs are limited to {API_MAX_UPLOAD_MB:g} MB.")
+            chunks.append(chunk)
+        pdf_bytes, file_name = b"".join(chunks), request.query_params.get("file_name", "judgment.pdf")
+    if not pdf_bytes.startswith(b"%PDF-"):
+        return None, error_response(415, "The upload is not a PDF.")
+    return (pdf_bytes, os.path.basename(file_name)), None
+
+
+# --- Endpoints ---
+@endpoint
+async def upload_judgment(request):
+    """POST /judgments: stores a PDF and returns its doc_hash, for submitting jobs on it later."""
+    upload, error = await read_pdf(request)
+    if error is not None:
+        return error
+    pdf_bytes, file_name = upload
+    doc_hash = await run_in_threadpool(save_upload, pdf_bytes)
+    return JSONResponse({"doc_hash": doc_hash, "file_name": file_name, "size": len(pdf_bytes)}, status_code=201)
+
+
+@endpoint
+async def submit_job(request):
+    """
+    POST /jobs: queues an analysis, either of an uploaded PDF given as JSON
+    {"doc_hash", "file_name"} or of a PDF sent with the request as in POST /judgments.
+    Returns 202 with the job, or 200 with the existing job if the PDF is already being analysed.
+    """
+    wait = JOB_LIMITS.try_acquire(client_id(request))
+    if wait > 0:
+        return error_response(429, "Too many jobs submitted.", retry_after=wait)
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+            doc_hash, file_name = body["doc_hash"], os.path.basename(body.get("file_name") or "judgment.pdf")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return error_response(400, 'Send {"doc_hash": ...} from POST /judgments, or the PDF itself.')
+        if not (isinstance(doc_hash, str) and doc_hash.isalnum() and os.path.exists(upload_path(doc_hash))):
+            return error_response(404, "No uploaded PDF has this doc_hash.")
+        touch_upload(doc_hash) # Not swept while the job waits
+        pdf_path = None
+    else:
+        upload, error = await read_pdf(request)
+        if error is not None:
+            return error
+        pdf_bytes, file_name = upload
+        doc_hash, pdf_path = await run_in_threadpool(save_job_pdf, pdf_bytes)
+    try:
+        job, created = JOBS.submit(doc_hash, file_name, pdf_path)
+    except asyncio.QueueFull:
+        return error_response(503, "The job queue is full; try again later.", retry_after=JOBS.retry_after())
+    return JSONResponse(public_job(job), status_code=202 if created else 200)
+
+
+@endpoint
+async def get_job(request):
+    """GET /jobs/{job_id}: the job's status and progress, and its results once it is done."""
+    job = JOBS.get(request.path_params["job_id"])
+    if job is None:
+        return error_response(404, "No such job.")
+    return JSONResponse(public_job(job))
+
+
+@endpoint
+async def stream_job(request):
+    """
+    GET /jobs/{job_id}/events: a server-sent event stream with the job as a "status" event on
+    every change, ending with a "result" event once it has finished.
+    """
+    job_id = request.path_params["job_id"]
+    if JOBS.get(job_id) is None:
+        return error_response(404, "No such job.")
+
+    async def events():
+        while True:
+            job, changed = JOBS.watch(job_id)
+            if job is None: # Dropped while the client was listening
+                return
+            finished = job["status"] in FINISHED
+            yield f"event: {'result' if finished else 'status'}\ndata: {json.dumps(public_job(job))}\n\n"
+            if finished:
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), STREAM_KEEPALIVE_SECONDS)
+                    break
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+REPORTS = OrderedDict() # job_id -> rendered report, most recently fetched last
+
+
+def content_disposition(file_name):
+    """
+    An attachment header for file_name: its ASCII characters as filename for older clients,
+    and the exact name percent-encoded as filename* (RFC 6266).
+    """
+    fallback = "".join(c if c.isascii() and c.isprintable() and c not in '"\\' else "_" for c in file_name)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(file_name, safe='')}"
+
+
+@endpoint
+async def get_report(request):
+    """GET /jobs/{job_id}/report: the PDF report of a finished job, rendered on first request."""
+    job = JOBS.get(request.path_params["job_id"])
+    if job is None:
+        return error_response(404, "No such job.")
+    if job["status"] != "done":
+        return error_response(409, f"The job is {job['status']}; only finished analyses have a report.")
+    report = REPORTS.pop(job["job_id"], None)
+    if report is None:
+        report = await run_in_threadpool(generate_pdf_output, job["summary"], job["key_info"], job["file_name"],
+                                         job["key_info_fields"])
+    REPORTS[job["job_id"]] = report
+    while len(REPORTS) > API_REPORT_CACHE_ENTRIES:
+        REPORTS.popitem(last=False)
+    file_name = f"{os.path.splitext(job['file_name'])[0]}_analysis.pdf"
+    return Response(report, media_type="application/pdf",
+                    headers={"Content-Disposition": content_disposition(file_name)})
+
+
+async def health(request):
+    """GET /health: queue occupancy and the model calls made so far. Not rate limited."""
+    return JSONResponse({"status": "ok", "model": MODEL_NAME, **JOBS.stats(), "usage": BACKEND.usage(),
+                         "latency": LATENCY.stats()})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await JOBS.start()
+    sweeper = asyncio.create_task(sweep_uploads())
+    yield
+    sweeper.cancel()
+    await JOBS.stop()
+
+
+app = Starlette(
+    routes=[
+        Route("/judgments", upload_judgment, methods=["POST"]),
+        Route("/jobs", submit_job, methods=["POST"]),
+        Route("/jobs/{job_id}", get_job),
+        Route("/jobs/{job_id}/events", stream_job),
+        Route("/jobs/{job_id}/report", get_report),
+        Route("/health", health),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the judgment pipeline over HTTP.")
+    parser.add_argument("--host", default=API_HOST, help=f"Address to listen on (default: {API_HOST}).")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Port to listen on (default: {API_PORT}).")
+    args = parser.parse_args()
+
+    if MODEL_BACKEND == "gemini" and not os.getenv("GOOGLE_API_KEY"):
+        sys.exit("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file, "
+                 "or run with MODEL_BACKEND=fake.")
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,431 +1,406 @@
 import streamlit as st 
-import google.generativeai as genai
-import os
 import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from pypdf import PdfReader
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 
-# --- Configuration ---
-load_dotenv()
+load_dotenv() # Before the project imports, which read their settings when imported
+
+from result_cache import hash_bytes
+from model_runner import run_concurrently, stream_concurrently
+from model_backend import MODEL_BACKEND
+from structured_analysis import key_info_to_markdown
+from report_pdf import generate_pdf_output
+from tracing import Trace, in_current_context, profiled, traced
+from judgment_pipeline import (
+    ANALYSIS_MODE, BACKEND, CLASSIFY_MAX_PAGES, LATENCY, MODEL_CALL_TIMEOUT, MODEL_NAME, PREFILTER, RESULT_CACHE,
+    analyze_judgment, analyze_pdf, extract_key_info, find_near_duplicate, is_indian_supreme_court_judgment,
+    prepare_analysis_texts, shared_judgment_context, store_analysis, summarize_judgment,
+)
 
+# --- Configuration ---
+# Streamlit re-executes this script on every interaction, but imported modules run once per server
+# process: the model client and caches are created in judgment_pipeline.
 API_KEY = os.getenv("GOOGLE_API_KEY")
 
-if not API_KEY:
+if MODEL_BACKEND == "gemini" and not API_KEY:
     st.error("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
     st.stop() # Stop the app if API key is missing
 
-genai.configure(api_key=API_KEY)
-MODEL = genai.GenerativeModel("gemini-2.0-flash")
+# Stream the summary and key information into the page as Gemini generates them ("0" waits for full responses)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") != "0"
 
 # --- Define Folders (Not directly used in UI, but good for context) ---
 JUDGMENTS_FOLDER = "judgments" # The UI will handle uploads, not read from this directly
 OUTPUT_FOLDER = "output" # We won't save files to disk in this UI version for simplicity
 
 # --- PDF Text Extraction Function (Modified for Streamlit's UploadedFile) ---
-def extract_text_from_pdf(uploaded_file):
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1))) # Processes for long PDFs
+APP_CACHE_ENTRIES = int(os.getenv("APP_CACHE_ENTRIES", "32")) # Judgments whose text and reports are kept in memory
+
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def extract_pdf_bytes(doc_hash, _pdf_bytes, max_pages=None):
+    """
+    Extracts the text of an uploaded PDF, memoized by its hash so reruns and repeat clicks don't
+    parse it again (the leading underscore stops Streamlit from hashing the bytes on every call).
+    """
+    from pdf_text import extract_pdf_text_parallel # pypdf is only loaded once a PDF is processed
+    return extract_pdf_text_parallel(io.BytesIO(_pdf_bytes), workers=PDF_EXTRACT_WORKERS, max_pages=max_pages)
+
+@traced("extract")
+def extract_text_from_pdf(uploaded_file, doc_hash, max_pages=None):
     """
     Extracts text from a Streamlit uploaded PDF file.
-    Assumes the PDF contains searchable text.
+    Pages without a text layer (scanned pages) are OCRed when Tesseract is installed.
+    Long PDFs are split across PDF_EXTRACT_WORKERS processes; max_pages limits parsing to the first pages.
     """
     text = ""
     try:
-        # PdfReader can read directly from a file-like object (BytesIO)
-        pdf_reader = PdfReader(io.BytesIO(uploaded_file.read()))
-        for page in pdf_reader.pages:
-            text += page.extract_text() or ""
-        st.success(f"Successfully extracted text from: {uploaded_file.name}")
+        text = extract_pdf_bytes(doc_hash, uploaded_file.getvalue(), max_pages)
+        if not text.strip():
+            st.error(f"No text could be found in {uploaded_file.name}. It looks scanned (image-based), and "
+                     "scanned judgments can only be read when Tesseract OCR is installed on the server.")
+            return ""
+        if max_pages is None:
+            st.success(f"Successfully extracted text from: {uploaded_file.name}")
     except Exception as e:
         st.error(f"Error extracting text from {uploaded_file.name}: {e}")
-        st.warning("This might happen if the PDF is scanned (image-based) and not searchable text.")
+        st.warning("This might happen if the PDF is damaged or encrypted.")
         text = "" # Return empty string on error
     return text
 
-def generate_pdf_output(summary_text, key_info_markdown, judgment_file_name="judgment_analysis"):
-    """
-    Generate PDF using ReportLab - much more reliable than FPDF for text handling
-    """
-    # Create a BytesIO buffer
-    buffer = io.BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.75*inch)
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        alignment=1,  # Center alignment
-        spaceAfter=20
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        alignment=1,  # Center alignment
-        spaceAfter=30
-    )
-    
-    section_header_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=10
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=6,
-        leftIndent=0,
-        rightIndent=0
-    )
-    
-    bold_style = ParagraphStyle(
-        'CustomBold',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=6,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Build the document content
-    content = []
-    
-    # Title
-    content.append(Paragraph("Legal Judgment Analysis", title_style))
-    
-    # Subtitle
-    safe_filename = judgment_file_name.replace('.pdf', '')
-    content.append(Paragraph(f"Analysis for: {safe_filename}", subtitle_style))
-    
-    # Summary Section
-    content.append(Paragraph("Summary", section_header_style))
-    
-    if summary_text:
-        # Split summary into paragraphs and add each one
-        for paragraph in summary_text.split('\n'):
-            if paragraph.strip():
-                content.append(Paragraph(paragraph.strip(), normal_style))
-    
-    content.append(Spacer(1, 20))
-    
-    # Key Information Section
-    content.append(Paragraph("Key Information", section_header_style))
-    
-    if key_info_markdown:
-        lines = key_info_markdown.split('\n')
-        for line in lines:
-            if line.strip():
-                # Handle bold headers
-                if line.startswith('**') and line.endswith('**'):
-                    # Remove ** and add as bold
-                    header_text = line.replace('**', '').strip()
-                    content.append(Paragraph(header_text, bold_style))
-                elif '**' in line and line.strip().endswith(':'):
-                    # Handle headers with ** formatting
-                    header_text = line.replace('**', '').strip()
-                    content.append(Paragraph(header_text, bold_style))
-                else:
-                    # Regular text - remove any remaining markdown
-                    clean_text = line.replace('**', '').replace('*', '').strip()
-                    if clean_text:
-                        content.append(Paragraph(clean_text, normal_style))
-    
-    # Build the PDF
-    doc.build(content)
-    
-    # Get the PDF bytes
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_bytes
-
-# --- Gemini API Function for Judgment Classification ---
-def is_indian_supreme_court_judgment(text):
-    """
-    Uses the Gemini API to determine if the given text is an Indian Supreme Court judgment.
-    Returns True if it is, False otherwise.
-    """
-    if not text:
-        return False # No text means it's not a judgment
-
-    # Take a snippet of the text to save tokens for the classification
-    # The beginning of legal documents usually contains identifying information
-    text_snippet = text[:1000] # Use the first 1000 characters for classification
-
-    prompt = f"""
-    Analyze the following document text. Is this document an official judgment from the Supreme Court of India?
-    Look for characteristic features like case names (e.g., "Appellant v. Respondent"), citations, names of judges, legal terminology common in Indian judgments, and the overall structure.
-
-    Respond with ONLY "YES" if it is an Indian Supreme Court judgment, and ONLY "NO" if it is not.
-    Do not add any other text, explanation, or punctuation.
+# --- Report Download ---
+ANALYSES_PER_SESSION = 8 # Finished analyses kept per session, so reruns show them again without new work
 
-    Document Text:
-    {text_snippet}
-    """
-
-    try:
-        response = MODEL.generate_content(prompt)
-        # Clean the response to ensure robust parsing
-        clean_response = response.text.strip().upper()
-
-        if "YES" in clean_response:
-            return True
-        elif "NO" in clean_response:
-            return False
-        else:
-            # Fallback for unexpected AI responses
-            print(f"Unexpected AI response for judgment check: {clean_response}")
-            return False # Default to false for safety if unexpected response
-    except Exception as e:
-        print(f"Error checking if document is judgment: {e}")
-        return False # Return False on API error
-
-# --- Gemini API Function for Summarization ---
-def summarize_judgment(text):
-    """
-    Uses the Gemini API to summarize the extracted judgment text for a law student.
-    """
-    if not text:
-        return "No text to summarize."
-
-    prompt = f"""
-    This document may be a truncated version of a long Indian Supreme Court judgment.
-    Prioritize extracting the most critical legal arguments, reasoning, and the final decision
-    from the available text.
-
-    Summarize the following Indian Supreme Court judgment for a law student.
-    Focus on:
-    1.  A concise overview of the case (parties, subject).
-    2.  The key facts relevant to the legal issue.
-    3.  The main legal issue(s) before the court.
-    4.  The court's primary legal reasoning (ratio decidendi) that led to its decision.
-    5.  Concurring or dissenting opinions by any judges, if applicable. (Note that this only happens when there is a three or more judge bench).
-    6.  The final decision/holding.
-    7.  Any important legal principles or statutes applied.
-
-    Keep the summary clear, educational, and no longer than 150-200 words.
-
-    Judgment Text:
-    {text}
-    """
+@st.cache_data(max_entries=APP_CACHE_ENTRIES, show_spinner=False)
+def build_report(summary, key_info, judgment_file_name, key_info_fields=None):
+    """PDF report bytes for an analysis, memoized so each one is rendered at most once."""
+    return generate_pdf_output(summary, key_info, judgment_file_name, key_info_fields)
 
-    try:
-        response = MODEL.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error summarizing text: {e}"
+def remember_analysis(doc_hash, analysis):
+    """Stores a finished analysis in the session, dropping the oldest beyond ANALYSES_PER_SESSION."""
+    analyses = st.session_state.setdefault("analyses", {})
+    analyses.pop(doc_hash, None)
+    analyses[doc_hash] = analysis
+    while len(analyses) > ANALYSES_PER_SESSION:
+        analyses.pop(next(iter(analyses)))
 
+def report_file_name(judgment_file_name):
+    """Download name of the report for an uploaded judgment."""
+    return judgment_file_name.replace('.pdf', '_analysis.pdf')
 
-# --- Gemini API Function for Key Information Extraction ---
-def extract_key_info(text):
+def show_download_button(analysis, key=None):
     """
-    Uses the Gemini API to extract key information from the judgment text
-    in a structured format for a law student's case brief.
+    Offers the analysis as a PDF. The report (and reportlab) is only built when the button is
+    clicked, and downloading doesn't rerun the page.
     """
-    if not text:
-        return "No text provided for key information extraction."
-
-    prompt = f"""
-    This document may be a truncated version of a long Indian Supreme Court judgment.
-    Prioritize extracting the most critical legal information from the available text.
-
-    Extract the following specific information from the Indian Supreme Court judgment below.
-    Present the output clearly, using the headings provided. If a piece of information is not found,
-    state "Not found" for that specific field.
-
-    **Case Name:**
-    [Extract full case name, e.g., 'Appellant Name vs. Respondent Name']
-
-    **Citation:**
-    [Extract the official citation, e.g., '(YEAR) VOLUME SCC PAGE' or similar]
-
-    **Court & Date:**
-    [State 'Court Name' and the exact date of judgment delivery. e.g., 'Supreme Court of India, DD Month YYYY']
-
-    **Judges:**
-    [List the names of the judges who authored or concurred with the judgment]
-
-    **Facts:**
-    [Summarize the most relevant facts that led to the legal dispute, concise, around 40-50 words]. 
-    **Explicitly identify and label any direct evidence (e.g., eyewitness testimony, documents), circumstantial evidence (e.g., motive, opportunity, forensic clues) and other types of evidence (e.g., expert testimony, physical evidence), if present and relevant.**
-
-    **Jurisdictional Basis**
-    [State the specific legal provision or source of power that allows the court to hear the case such as articles/sections of the Constitution, specific statutes, etc.]
-
-    **Issue(s):**
-    [State the main legal question(s) the court was asked to decide]
-
-    **Holding:**
-    [State the court's final decision or ruling on the issue(s)]
-
-    **Reasoning (Ratio Decidendi):**
-    [Explain the core legal rationale and principles the court used to arrive at its holding]
-
-    **Relevant Statutes/Principles:**
-    [List any specific Indian Acts, Sections, or established legal principles cited or discussed]
-
-    **Practical Implications:** [State the real-world consequences or significance of this judgment for future cases, legal practice, or the interpretation of law, concise, around 30 words. If it sets a new precedent or significantly clarifies an existing one, state that.]
-    
-    Judgment Text:
-    {text}
-    """
-
-    try:
-        response = MODEL.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"Error extracting key info: {e}"
+    report = in_current_context( # Keeps the report in the trace of the run that produced the analysis
+        lambda: build_report(analysis["summary"], analysis["key_info"], analysis["file_name"], analysis["key_info_fields"])
+    )
+    st.download_button(
+        label="Download Analysis as PDF",
+        data=report,
+        file_name=report_file_name(analysis["file_name"]),
+        mime="application/pdf",
+        on_click="ignore",
+        key=key,
+    )
 
-# --- Text Chunking Function ---
-def chunk_text(text, chunk_size=10000, chunk_overlap=1000):
+def build_zip(analyses):
+    """Returns a ZIP archive, built in memory, with the PDF report of each analysis."""
+    buffer = io.BytesIO()
+    names = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for analysis in analyses:
+            name = report_file_name(analysis["file_name"])
+            base, extension = os.path.splitext(name)
+            copy = 1
+            while name in names: # Different PDFs uploaded under the same name
+                copy += 1
+                name = f"{base} ({copy}){extension}"
+            names.add(name)
+            archive.writestr(name, build_report(analysis["summary"], analysis["key_info"],
+                                                analysis["file_name"], analysis["key_info_fields"]))
+    return buffer.getvalue()
+
+# --- Background Processing of Several Uploads ---
+BATCH_WORKERS = int(os.getenv("APP_BATCH_WORKERS", "3")) # Judgments analysed at once, across all sessions
+BATCH_POLL_SECONDS = 1.0 # How often the job list refreshes while judgments are being processed
+BATCH_STATUS_LABELS = {
+    "queued": "Waiting for a free worker",
+    "checking": "Verifying document type",
+    "extracting": "Extracting text",
+    "selecting": "Selecting sections",
+    "condensing": "Condensing sections",
+    "analysing": "Generating summary and key information",
+    "done": "Done",
+    "rejected": "Not an official Supreme Court of India judgment",
+    "failed": "Failed",
+}
+BATCH_FINISHED = ("done", "rejected", "failed")
+
+@st.cache_resource
+def batch_executor():
+    """Worker pool for uploaded batches; one per server process, so BATCH_WORKERS bounds every session together."""
+    return ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="judgment")
+
+def run_batch_job(job, pdf_bytes):
+    """Worker: analyses one uploaded judgment, recording its status, progress and results in job."""
+    with Trace(job["file_name"]):
+        try:
+            job.update(analyze_pdf(pdf_bytes, job["doc_hash"], name=job["file_name"], on_status=lambda status, progress:
+                                   job.update(status=status, progress=progress)))
+        except Exception as e:
+            job.update(status="failed", error=f"Error processing {job['file_name']}: {e}")
+
+def submit_batch_job(uploaded_file, doc_hash):
+    """Queues an uploaded judgment for background analysis and returns its job record."""
+    job = {"file_name": uploaded_file.name, "doc_hash": doc_hash, "status": "queued", "progress": 0.0,
+           "summary": None, "key_info": None, "key_info_fields": None, "error": None}
+    batch_executor().submit(run_batch_job, job, uploaded_file.getvalue())
+    return job
+
+def show_batch_jobs(doc_hashes, polling):
     """
-    Splits text into smaller chunks with overlap.
-    Aims for chunks around chunk_size characters.
+    Shows each job's status, and its results and download as soon as it finishes. Runs as a
+    fragment refreshing every BATCH_POLL_SECONDS while polling; once every job has finished, the
+    page reruns once so the refreshing stops.
     """
-    chunks = []
-    start_index = 0
-    while start_index < len(text):
-        end_index = min(start_index + chunk_size, len(text))
-        chunk = text[start_index:end_index]
-        chunks.append(chunk)
-        if end_index == len(text):
-            break
-        start_index += (chunk_size - chunk_overlap)
-        # Ensure we don't start negative
-        if start_index < 0:
-            start_index = 0
-    return chunks
-
+    jobs = [st.session_state["batch_jobs"][doc_hash] for doc_hash in doc_hashes]
+    for job in jobs:
+        with st.container(border=True):
+            label = f"**{job['file_name']}**: {BATCH_STATUS_LABELS[job['status']]}"
+            if job["status"] in BATCH_FINISHED:
+                st.markdown(label)
+            else:
+                st.progress(job["progress"], text=label)
+            if job["status"] == "done":
+                if job.get("strategy") == "near_duplicate":
+                    st.caption(f"A copy of {job['duplicate_of']} ({job['similarity']:.0%} similar), "
+                               "so its analysis was reused.")
+                with st.expander("Summary and key information"):
+                    st.subheader("Summary")
+                    st.write(job["summary"])
+                    st.subheader("Key Information")
+                    st.markdown(job["key_info"])
+                show_download_button(job, key=f"download-{job['doc_hash']}")
+            elif job["status"] == "rejected":
+                st.warning("This document does not appear to be an official judgment from the Supreme Court of India.")
+            elif job["status"] == "failed":
+                st.error(job["error"])
+
+    finished = [job for job in jobs if job["status"] == "done"]
+    if len(finished) > 1:
+        st.download_button(
+            label=f"Download All {len(finished)} Analyses as ZIP",
+            data=lambda: build_zip(finished),
+            file_name="judgment_analyses.zip",
+            mime="application/zip",
+            on_click="ignore",
+            key="download-zip",
+        )
+    if polling and all(job["status"] in BATCH_FINISHED for job in jobs):
+        st.rerun() # Re-creates the fragment without run_every
 
 # --- Streamlit UI Layout ---
 st.set_page_config(page_title="Legal AI Agent (MVP)", layout="centered")
 
 st.title("⚖️ Legal AI Agent for Indian Law Students (MVP)")
-st.markdown("Upload an Indian Supreme Court judgment PDF to get a summary and key case information.")
+st.markdown("Upload an Indian Supreme Court judgment PDF to get a summary and key case information. "
+            "Upload several to process a whole reading list.")
 
-uploaded_file = st.file_uploader("Choose a PDF judgment file", type="pdf")
+uploaded_files = st.file_uploader("Choose PDF judgment files", type="pdf", accept_multiple_files=True)
+# A single judgment is processed step by step with its results streamed in; several are processed in the background
+uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
 
 if uploaded_file is not None:
     file_details = {"FileName": uploaded_file.name, "FileType": uploaded_file.type, "FileSize": uploaded_file.size}
-    st.write(file_details)
+    st.json(file_details)
+    doc_hash = hash_bytes(uploaded_file.getvalue()) # Cache key for the extracted text and every model call on this PDF
+    stored_analysis = st.session_state.get("analyses", {}).get(doc_hash)
 
     # Process button
     if st.button("Process Judgment"):
-        with st.spinner("Extracting text..."):
-            extracted_text = extract_text_from_pdf(uploaded_file)
-
-        if extracted_text:
+        with Trace(uploaded_file.name) as trace, profiled(uploaded_file.name): # Per-stage timings for the performance panel
             with st.spinner("Verifying document type..."):
-                is_judgment = is_indian_supreme_court_judgment(extracted_text)
+                # Only the opening pages are parsed here, so other documents are rejected without reading the whole PDF
+                opening_text = extract_text_from_pdf(uploaded_file, doc_hash, max_pages=CLASSIFY_MAX_PAGES)
+                if not opening_text:
+                    st.stop() # Nothing to analyse; the reason has already been shown
+                is_judgment = is_indian_supreme_court_judgment(opening_text, doc_hash)
 
             if not is_judgment:
                 st.error("This document does not appear to be an official judgment from the Supreme Court of India. Please upload a valid judgment PDF.")
                 st.stop() # Stop further processing if it's not a judgment
 
-            # --- MODIFIED Chunking Logic for Head-and-Tail Analysis ---
-            all_chunks = chunk_text(extracted_text, chunk_size=10000, chunk_overlap=1000)
-
-            # Define the strategy for selecting chunks
-            MAX_CHUNKS_FOR_DEEPER_ANALYSIS = 20  # Overall limit for AI context (approx 200,000 chars)
-            CHUNKS_FROM_START = 14               # How many chunks from the beginning
-            CHUNKS_FROM_END = 6                  # How many chunks from the end
-
-            # Ensure the sum of start and end chunks does not exceed the max allowed
-            # This is a safety check and ensures logic works even if you change values later
-            if (CHUNKS_FROM_START + CHUNKS_FROM_END) > MAX_CHUNKS_FOR_DEEPER_ANALYSIS:
-                # Adjust CHUNKS_FROM_END if sum is too high, or rebalance as needed
-                CHUNKS_FROM_END = MAX_CHUNKS_FOR_DEEPER_ANALYSIS - CHUNKS_FROM_START
-                if CHUNKS_FROM_END < 0: CHUNKS_FROM_END = 0 # Ensure it's not negative
-
-            processed_text_for_ai_parts = []
-            description_for_warning = ""
-            total_selected_chunks_count = 0
-
-            if len(all_chunks) <= MAX_CHUNKS_FOR_DEEPER_ANALYSIS:
-                # If the document is short enough to process fully (within our max limit)
-                processed_text_for_ai_parts.extend(all_chunks)
-                description_for_warning = f"completely in {len(all_chunks)} sections."
-                total_selected_chunks_count = len(all_chunks)
-            else:
-                # Select chunks from the beginning
-                head_chunks = all_chunks[:CHUNKS_FROM_START]
-                processed_text_for_ai_parts.extend(head_chunks)
-                
-                # Select chunks from the end, ensuring no overlap with head_chunks
-                # and not exceeding the total allowed chunks after taking from start.
-                # The starting index for tail chunks should be after the head chunks.
-                
-                # Calculate how many tail chunks we *can* take without overlap AND staying within max_chunks
-                actual_tail_chunks_to_take = min(CHUNKS_FROM_END, len(all_chunks) - CHUNKS_FROM_START)
-                
-                if actual_tail_chunks_to_take > 0:
-                    tail_chunks = all_chunks[len(all_chunks) - actual_tail_chunks_to_take:]
-                    # Ensure no exact duplicates if overlap occurs in very short documents,
-                    # though with head_chunks_count and tail_chunks_count, this is minimized.
-                    # For simplicity, if actual_tail_chunks_to_take starts *before* head_chunks end, it's better to concatenate distinct parts.
-                    # This simple extend might have minor overlap if CHUNKS_FROM_START + CHUNKS_FROM_END > len(all_chunks) but handled by overall len(all_chunks) check.
-                    
-                    # More robust way to add tail chunks avoiding overlap:
-                    # Find the starting index for tail chunks ensuring it's not within the head chunks
-                    tail_start_idx = max(CHUNKS_FROM_START, len(all_chunks) - actual_tail_chunks_to_take)
-                    processed_text_for_ai_parts.extend(all_chunks[tail_start_idx:])
-                    
-                    description_for_warning = (f"the first {len(head_chunks)} and last {actual_tail_chunks_to_take} sections.")
-                else:
-                    description_for_warning = (f"only the first {len(head_chunks)} sections.")
-                
-                total_selected_chunks_count = len(processed_text_for_ai_parts)
-
-
-            processed_text_for_ai = "".join(processed_text_for_ai_parts)
-
-
-            # --- Updated Warning/Info Messages ---
-            if len(all_chunks) > total_selected_chunks_count: # This means we skipped middle parts
-                st.warning(f"**Note:** This judgment is very long ({len(extracted_text):,} characters). "
-                           f"The AI is processing **{description_for_warning}** " # Use the new description
-                           f"({len(processed_text_for_ai):,} characters) for deep analysis. "
-                           "The middle sections of the judgment are not included to optimize for API limits and focus on key parts (head & tail).")
-            elif len(extracted_text) > 10000: # If it's more than one chunk but all fit (and processed completely by earlier logic)
-                st.info(f"The judgment ({len(extracted_text):,} characters) was processed in {len(all_chunks)} sections for comprehensive analysis.")
-            else: # For shorter judgments processed completely (single chunk)
-                st.info(f"The judgment ({len(extracted_text):,} characters) was processed completely.")
-
-            with st.spinner("Analyzing judgment and generating output... This may take a moment."):
-                st.subheader("Summary")
-                summary = summarize_judgment(processed_text_for_ai)
-                st.write(summary)
+            with st.spinner("Extracting text..."):
+                extracted_text = extract_text_from_pdf(uploaded_file, doc_hash)
 
+            # Another copy of a judgment analysed before (a different reporter's PDF, a re-upload) reuses that analysis
+            duplicate = find_near_duplicate(extracted_text, doc_hash, uploaded_file.name) if extracted_text else None
+            if duplicate is not None:
+                st.info(f"This judgment is a copy of {duplicate['name']} ({duplicate['similarity']:.0%} similar), "
+                        "which was analysed before, so its analysis is shown without calling the AI again.")
+                st.subheader("Summary")
+                st.write(duplicate["summary"])
                 st.subheader("Key Information")
-                key_info = extract_key_info(processed_text_for_ai)
-                st.markdown(key_info)
-
-                # Generate PDF bytes correctly
-                download_file_name = uploaded_file.name.replace('.pdf', '_analysis.pdf')
-                
-                # Generate PDF bytes (now returns bytes directly)
-                pdf_bytes_for_download = generate_pdf_output(summary, key_info, uploaded_file.name)
-                
-                # Store in session state
-                st.session_state['download_pdf_bytes'] = pdf_bytes_for_download
-                st.session_state['download_file_name'] = download_file_name
-
-            # Download button
-            if 'download_pdf_bytes' in st.session_state:
-                st.download_button(
-                    label="Download Analysis as PDF",
-                    data=st.session_state['download_pdf_bytes'],
-                    file_name=st.session_state['download_file_name'],
-                    mime="application/pdf"
-                )
+                st.markdown(duplicate["key_info"])
+                remember_analysis(doc_hash, {"summary": duplicate["summary"], "key_info": duplicate["key_info"],
+                                             "key_info_fields": duplicate["key_info_fields"], "file_name": uploaded_file.name})
+                show_download_button(st.session_state["analyses"][doc_hash])
+            elif extracted_text:
+                # --- Chunking and Chunk Selection (see judgment_pipeline.prepare_analysis_texts) ---
+                progress_bar = st.empty()
+
+                def show_progress(level, done, total):
+                    step = "Condensing sections" if level == 1 else f"Combining notes (level {level})"
+                    progress_bar.progress(done / total, text=f"{step}: {done}/{total}")
+
+                plan = prepare_analysis_texts(extracted_text, doc_hash, on_progress=show_progress)
+                progress_bar.empty()
+                summary_text_for_ai = plan["summary_text"]
+                processed_text_for_ai = plan["key_info_text"]
+                analysis_doc_hash = plan["analysis_doc_hash"] # Cache key for the final summary and key-info calls
+
+                if plan["strategy"] == "map_reduce":
+                    levels = plan["levels"]
+                    st.info(f"This judgment is very long ({len(extracted_text):,} characters). All {plan['num_chunks']} sections "
+                            f"were condensed in parallel ({levels} level{'s' if levels > 1 else ''}) and the AI is analysing "
+                            f"the combined notes (about {plan['key_info_tokens']:,} tokens), so no part of the judgment is skipped.")
+                elif plan["strategy"] == "retrieval":
+                    st.info(f"This judgment is very long ({len(extracted_text):,} characters, {plan['num_chunks']} sections). "
+                            f"The AI is analysing the sections most relevant to the facts, issues, holding, reasoning and "
+                            f"statutes: {plan['summary_sections']} sections (about {plan['summary_tokens']:,} tokens) for the "
+                            f"summary and {plan['key_info_sections']} (about {plan['key_info_tokens']:,} tokens) for the "
+                            "key information.")
+                # --- Updated Warning/Info Messages ---
+                elif plan["num_chunks"] > plan["selected_chunks"]: # This means we skipped middle parts
+                    st.warning(f"**Note:** This judgment is very long ({len(extracted_text):,} characters). "
+                               f"The AI is processing **{plan['description']}** " # Use the new description
+                               f"(about {plan['key_info_tokens']:,} of its {plan['total_tokens']:,} tokens) for deep analysis. "
+                               "The middle sections of the judgment are not included to optimize for API limits and focus on key parts (head & tail).")
+                elif plan["num_chunks"] > 1: # If it's more than one chunk but all fit (and processed completely by earlier logic)
+                    st.info(f"The judgment ({len(extracted_text):,} characters, about {plan['total_tokens']:,} tokens) was processed "
+                            f"in {plan['num_chunks']} sections for comprehensive analysis.")
+                else: # For shorter judgments processed completely (single chunk)
+                    st.info(f"The judgment ({len(extracted_text):,} characters, about {plan['total_tokens']:,} tokens) "
+                            "was processed completely.")
+
+                with st.spinner("Analyzing judgment and generating output... This may take a moment."):
+                    st.subheader("Summary")
+                    summary_placeholder = st.empty()
+
+                    st.subheader("Key Information")
+                    key_info_placeholder = st.empty()
+
+                    key_info_fields = None
+                    if ANALYSIS_MODE == "combined":
+                        analysis = analyze_judgment(processed_text_for_ai, analysis_doc_hash)
+                        if analysis is not None:
+                            summary, key_info_fields = analysis
+                            key_info = key_info_to_markdown(key_info_fields)
+                            summary_placeholder.write(summary)
+                            key_info_placeholder.markdown(key_info)
+
+                    if key_info_fields is None:
+                        # Both requests are independent, so send them together and show each one as it arrives
+                        placeholders = {"summary": summary_placeholder, "key_info": key_info_placeholder}
+                        results = {}
+                        # When both prompts get the same text, it is uploaded once as a cached context
+                        with shared_judgment_context(summary_text_for_ai, processed_text_for_ai):
+                            if STREAM_RESPONSES:
+                                analysis_calls = {
+                                    "summary": lambda on_text: summarize_judgment(summary_text_for_ai, analysis_doc_hash, on_text),
+                                    "key_info": lambda on_text: extract_key_info(processed_text_for_ai, analysis_doc_hash, on_text),
+                                }
+                                updates = stream_concurrently(analysis_calls, timeout=MODEL_CALL_TIMEOUT)
+                            else:
+                                analysis_calls = {
+                                    "summary": lambda: summarize_judgment(summary_text_for_ai, analysis_doc_hash),
+                                    "key_info": lambda: extract_key_info(processed_text_for_ai, analysis_doc_hash),
+                                }
+                                updates = ((name, result, error, True) for name, result, error in run_concurrently(analysis_calls, timeout=MODEL_CALL_TIMEOUT))
+
+                            for name, result, error, finished in updates:
+                                if not finished:
+                                    placeholders[name].markdown(result + " ▌") # Partial text while Gemini is still writing
+                                    continue
+                                if name == "summary":
+                                    results[name] = result if error is None else f"Error summarizing text: {error}"
+                                    summary_placeholder.write(results[name])
+                                else:
+                                    results[name] = result if error is None else f"Error extracting key info: {error}"
+                                    key_info_placeholder.markdown(results[name])
+
+                        summary = results["summary"]
+                        key_info = results["key_info"]
+
+                    # Store in session state (the PDF itself is built when it is downloaded)
+                    remember_analysis(doc_hash, {"summary": summary, "key_info": key_info,
+                                                 "key_info_fields": key_info_fields, "file_name": uploaded_file.name})
+                    store_analysis(doc_hash, summary, key_info, key_info_fields) # For near-duplicate copies uploaded later
+
+                cache_stats = RESULT_CACHE.stats()
+                prefilter_stats = PREFILTER.stats()
+                st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses this session "
+                           f"({cache_stats['entries']} cached results). Document checks answered locally: "
+                           f"{prefilter_stats['local_yes'] + prefilter_stats['local_no']}, sent to Gemini: {prefilter_stats['escalated']}.")
+                latency_stats = LATENCY.stats()
+                latency_labels = {"summary": "Summary", "key_info": "Key information", "analysis": "Combined analysis", "section_notes": "Section notes"}
+                latency_parts = [
+                    f"{label}: first text after {latency_stats[task]['avg_time_to_first_token']:.1f}s, "
+                    f"complete after {latency_stats[task]['avg_total_latency']:.1f}s"
+                    + (f" (average of {latency_stats[task]['calls']} calls)" if latency_stats[task]['calls'] > 1 else "")
+                    for task, label in latency_labels.items() if task in latency_stats
+                ]
+                if latency_parts:
+                    st.caption(f"Model latency ({MODEL_NAME}): " + "; ".join(latency_parts) + ".")
+                usage = BACKEND.usage()
+                st.caption(f"Model usage: {usage['calls']} calls, {usage['input_tokens']:,} input and "
+                           f"{usage['output_tokens']:,} output tokens, {usage['errors']} errors."
+                           + (f" A further {usage['cached_tokens']:,} input tokens were read from cached judgment contexts."
+                              if usage['cached_tokens'] else ""))
+
+                # --- Performance Panel (this run's stages; the same records go to the JSON trace log) ---
+                with st.expander("Performance"):
+                    # A Markdown table rather than st.table, which would import pandas (about 0.4s) on the first run
+                    st.markdown(
+                        "| Stage | Runs | Wall (s) | CPU (s) | Chars in | Chars out | Model calls | Tokens in | Tokens out | Retries | Cache hits |\n"
+                        "|---|--:|--:|--:|--:|--:|--:|--:|--:|--:|--:|\n"
+                        + "\n".join(
+                            f"| {totals['stage']} | {totals['runs']} | {totals['wall_seconds']:.2f} | {totals['cpu_seconds']:.2f} "
+                            f"| {totals['input_chars']:,} | {totals['output_chars']:,} | {totals['model_calls']} "
+                            f"| {totals['input_tokens']:,} | {totals['output_tokens']:,} | {totals['retries']} | {totals['cache_hits']} |"
+                            for totals in trace.summary()
+                        )
+                    )
+                    st.caption(f"Total {trace.elapsed():.1f}s. Stages that run concurrently overlap, so their times add up to "
+                               f"more than the total. CPU time excludes worker processes. Trace ID: {trace.trace_id}.")
+
+                # Download button
+                show_download_button(st.session_state["analyses"][doc_hash])
+
+    elif stored_analysis is not None:
+        # Any other rerun (e.g. another widget changed): show the stored analysis again instead of redoing it
+        st.subheader("Summary")
+        st.write(stored_analysis["summary"])
+        st.subheader("Key Information")
+        st.markdown(stored_analysis["key_info"])
+        show_download_button(stored_analysis)
+
+if len(uploaded_files) > 1:
+    batch_jobs = st.session_state.setdefault("batch_jobs", {})
+    batch = {hash_bytes(f.getvalue()): f for f in uploaded_files} # The same PDF uploaded twice is processed once
+    st.write(f"{len(batch)} judgments selected. Up to {BATCH_WORKERS} are processed at a time, "
+             "and each one's results appear as soon as it is finished.")
+
+    if st.button(f"Process {len(batch)} Judgments"):
+        for doc_hash, batch_file in batch.items():
+            if doc_hash not in batch_jobs or batch_jobs[doc_hash]["status"] == "failed":
+                batch_jobs[doc_hash] = submit_batch_job(batch_file, doc_hash)
+
+    submitted = [doc_hash for doc_hash in batch if doc_hash in batch_jobs]
+    if submitted:
+        polling = any(batch_jobs[doc_hash]["status"] not in BATCH_FINISHED for doc_hash in submitted)
+        st.fragment(run_every=BATCH_POLL_SECONDS if polling else None)(show_batch_jobs)(submitted, polling)
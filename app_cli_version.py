@@ -1,19 +1,45 @@
+import argparse
 import sys
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-from pypdf import PdfReader # New import for PDF handling
 
-# --- Configuration ---
-load_dotenv() # Load environment variables from .env file
+load_dotenv() # Load environment variables from .env file, before the project modules read their settings
+
+from pdf_text import extract_pdf_pages_parallel
+from result_cache import ResultCache, hash_file, hash_text
+from model_runner import RateLimiter, call_with_backoff
+from model_backend import MODEL_BACKEND, get_backend
+from batch_runner import DEFAULT_WORKERS, run_batch
+from chunking import DEFAULT_CHUNK_TOKENS, chunk_judgment
+from job_manifest import JobManifest
+from judgment_store import JudgmentStore
+from near_duplicates import NearDuplicateIndex
+from report_pdf import render_reports
+from search_index import INDEX_VERSION, SearchIndex
+from structured_analysis import parse_key_info_markdown
+from token_budget import count_tokens, prompt_budget, select_within_budget
+from tracing import PROFILER, Trace, profiled, traced
+from tracing import stage as trace_stage # "stage" is used for manifest stages below
 
+# --- Configuration ---
 API_KEY = os.getenv("GOOGLE_API_KEY")
 
-if not API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+# The backend checks GOOGLE_API_KEY on its first call, so this module imports without one
+BACKEND = get_backend(MODEL_BACKEND) # Override with --backend; "fake" runs offline
+MODEL_NAME = BACKEND.name
+
+# --- Result Cache (shared with app.py) ---
+# Bump a prompt version whenever its prompt template, or the way its input text is prepared,
+# changes so stale results are not reused.
+SUMMARY_PROMPT_VERSION = "cli-summary-v2" # v2: long judgments are cut to the token budget, not 40,000 characters
+KEY_INFO_PROMPT_VERSION = "cli-key-info-v2"
+RESULT_CACHE = ResultCache()
 
-genai.configure(api_key=API_KEY)
-MODEL = genai.GenerativeModel('gemini-2.0-flash') # Using 'gemini-2.0-flash' for text generation
+# --- Rate Limiting (Gemini quota; override with --rpm/--tpm) ---
+DEFAULT_RPM = int(os.getenv("GEMINI_RPM", "15"))
+DEFAULT_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+EXPECTED_OUTPUT_TOKENS = 1000 # Reserved per request for the response, which also counts towards TPM
+RATE_LIMITER = RateLimiter(DEFAULT_RPM, DEFAULT_TPM)
 
 # --- Define Folders ---
 JUDGMENTS_FOLDER = "judgments"
@@ -23,32 +49,73 @@ OUTPUT_FOLDER = "output" # New folder for results
 if not os.path.exists(OUTPUT_FOLDER):
     os.makedirs(OUTPUT_FOLDER)
 
+# --- Job Manifest (tracks finished stages so re-runs only do new or changed work) ---
+MANIFEST = JobManifest(os.path.join(OUTPUT_FOLDER, "manifest.sqlite3"))
+
+# --- Judgment Store (extracted text, chunk boundaries, analyses and run metadata, keyed by PDF hash) ---
+STORE = JudgmentStore()
+RUN_ID = None # Set for each run of this script, and recorded with every analysis it stores
+WRITE_TXT = False # --txt also writes each analysis to OUTPUT_FOLDER as a .txt file
+FORCE = False # --force extracts and analyses afresh, bypassing the stored text, the result cache and near-duplicates
+
+# --- Search Index (full text and key information of every processed judgment; query with search_index.py) ---
+SEARCH_INDEX = SearchIndex()
+
+# --- Near-Duplicate Index (copies of a judgment already processed reuse its outputs) ---
+DUPLICATES = NearDuplicateIndex()
+
 # --- PDF Text Extraction Function ---
-def extract_text_from_pdf(pdf_path):
+def extract_pages_from_pdf(pdf_path, workers=1):
     """
-    Extracts text from a given PDF file.
-    Assumes the PDF contains searchable text.
+    Returns the text of a given PDF file page by page, from the judgment store if the same
+    content was extracted before (unless --force). Pages without a text layer (scanned pages) are OCRed when
+    Tesseract is installed. Raises if the PDF can't be read.
+    Only reads the store: in batch mode this runs in a worker process while the main process
+    writes to it, so process_judgment stores newly extracted text.
+    With workers > 1, long PDFs are split across that many processes (not usable inside batch workers).
     """
-    text = ""
-    try:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            text += page.extract_text() or "" # Use .extract_text() and handle potential None
-        print(f"Successfully extracted text from: {os.path.basename(pdf_path)}")
-    except Exception as e:
-        print(f"Error extracting text from {pdf_path}: {e}")
-        print("This might happen if the PDF is scanned (image-based) and not searchable text.")
-        text = "" # Return empty string on error
-    return text
+    # In batch mode this runs in a worker process, so extraction is logged as a trace of its own
+    with Trace(os.path.basename(pdf_path)), trace_stage("extract") as record:
+        pages = None if FORCE else STORE.get_pages(hash_file(pdf_path))
+        if pages is not None:
+            print(f"Using the stored text of: {os.path.basename(pdf_path)}")
+        else:
+            try:
+                pages = extract_pdf_pages_parallel(pdf_path, workers=workers) # Memory-mapped
+            except Exception as e:
+                raise RuntimeError(f"Error extracting text from {pdf_path}: {e}. "
+                                   "This might happen if the PDF is damaged or encrypted.") from e
+            print(f"Successfully extracted text from: {os.path.basename(pdf_path)}")
+        record["output_chars"] = sum(len(page) for page in pages)
+    return pages
+
+# --- Gemini API Call with Rate Limiting and Retries ---
+def generate_text(prompt):
+    """
+    Sends a prompt to the model backend and returns the response text.
+    Waits on the rate limiter before every attempt and retries 429/5xx errors with exponential backoff.
+    """
+    def attempt():
+        RATE_LIMITER.acquire(count_tokens(prompt) + EXPECTED_OUTPUT_TOKENS)
+        return BACKEND.generate(prompt)
+    return call_with_backoff(attempt)
 
 # --- Gemini API Function for Summarization ---
-def summarize_judgment(text):
+@traced("summarize")
+def summarize_judgment(text, doc_hash=None, raise_errors=False):
     """
     Uses the Gemini API to summarize the extracted judgment text for a law student.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    API errors are returned as an error message unless raise_errors is True.
     """
     if not text:
         return "No text to summarize."
 
+    cache_key = RESULT_CACHE.make_key("summary", doc_hash or hash_text(text), SUMMARY_PROMPT_VERSION, MODEL_NAME)
+    cached = None if FORCE else RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     # This is your prompt for summarization. We'll refine it as needed.
     prompt = f"""
     Summarize the following Indian Supreme Court judgment for a law student.
@@ -68,19 +135,30 @@ def summarize_judgment(text):
     """
 
     try:
-        response = MODEL.generate_content(prompt)
-        return response.text
+        summary = generate_text(prompt)
+        RESULT_CACHE.put(cache_key, summary)
+        return summary
     except Exception as e:
+        if raise_errors:
+            raise
         return f"Error summarizing text: {e}"
     
-def extract_key_info(text):
+@traced("key_info")
+def extract_key_info(text, doc_hash=None, raise_errors=False):
     """
     Uses the Gemini API to extract key information from the judgment text
     in a structured format for a law student's case brief.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    API errors are returned as an error message unless raise_errors is True.
     """
     if not text:
         return "No text provided for key information extraction."
 
+    cache_key = RESULT_CACHE.make_key("key_info", doc_hash or hash_text(text), KEY_INFO_PROMPT_VERSION, MODEL_NAME)
+    cached = None if FORCE else RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     prompt = f"""
     Extract the following specific information from the Indian Supreme Court judgment below.
     Present the output clearly, using the headings provided. If a piece of information is not found,
@@ -121,9 +199,12 @@ def extract_key_info(text):
     """
 
     try:
-        response = MODEL.generate_content(prompt)
-        return response.text
+        key_info = generate_text(prompt)
+        RESULT_CACHE.put(cache_key, key_info)
+        return key_info
     except Exception as e:
+        if raise_errors:
+            raise
         return f"Error extracting key info: {e}"
 
 # --- Helper Function to Save Output ---
@@ -133,41 +214,236 @@ def save_output_to_file(filename, content):
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(content)
     print(f"Output saved to: {filepath}")
+    return filepath
+
+
+# --- Per-Judgment Pipeline ---
+# (manifest stage, prompt version, analysis function, output file suffix)
+ANALYSIS_STAGES = (
+    ("summarized", SUMMARY_PROMPT_VERSION, summarize_judgment, "_summary.txt"),
+    ("key_info", KEY_INFO_PROMPT_VERSION, extract_key_info, "_key_info.txt"),
+)
+STAGE_PROMPTS = {"summarized": "summary", "key_info": "key_info"} # Token budget of each stage's prompt (token_budget.py)
+
+def stage_done(pdf_path, stage, doc_hash, prompt_version):
+    """
+    True if an analysis stage is recorded as done for this PDF's content with the current model
+    and its output is in the store.
+    """
+    return MANIFEST.is_done(pdf_path, stage, doc_hash, prompt_version, MODEL_NAME) and \
+        STORE.has_analysis(doc_hash, stage, prompt_version, MODEL_NAME)
+
+def is_up_to_date(pdf_path, doc_hash):
+    """True if every analysis output for this PDF is stored, was produced from its current content and is indexed."""
+    return all(stage_done(pdf_path, stage, doc_hash, prompt_version)
+               for stage, prompt_version, _, _ in ANALYSIS_STAGES) and \
+        MANIFEST.is_done(pdf_path, "indexed", doc_hash, INDEX_VERSION, MODEL_NAME)
+
+def save_analysis(pdf_path, doc_hash, stage, prompt_version, suffix, content, model_name, fields=None, input_chars=None):
+    """Stores one analysis output (also as a .txt file with --txt) and records the stage as done."""
+    STORE.put_analysis(doc_hash, stage, content, prompt_version, model_name, fields=fields, input_chars=input_chars,
+                       run_id=RUN_ID)
+    if WRITE_TXT:
+        save_output_to_file(f"{os.path.splitext(os.path.basename(pdf_path))[0]}{suffix}", content)
+    MANIFEST.mark_done(pdf_path, stage, doc_hash, prompt_version, STORE.path, model_name)
+
+@traced("near_duplicate", measure_input=lambda args, kwargs: len(args[2]))
+def reuse_near_duplicate(pdf_path, doc_hash, extracted_text):
+    """
+    Adds the judgment to the near-duplicate index and, if it is a copy of one processed before,
+    stores that judgment's analyses for this one too and marks those stages done. Analyses are
+    only reused if they were made with the current prompt versions and model. Returns the
+    number of stages reused.
+    """
+    duplicate = DUPLICATES.add(doc_hash, extracted_text, pdf_path)
+    if duplicate is None or FORCE:
+        return 0
+    reused = 0
+    for stage, prompt_version, _, suffix in ANALYSIS_STAGES:
+        if stage_done(pdf_path, stage, doc_hash, prompt_version):
+            continue
+        for source_hash in (duplicate["doc_hash"], duplicate["canonical_hash"]):
+            source = STORE.get_analysis(source_hash, stage)
+            if source is not None and source["prompt_version"] == prompt_version and source["model_name"] == MODEL_NAME:
+                save_analysis(pdf_path, doc_hash, stage, prompt_version, suffix, source["content"],
+                              source["model_name"], source["fields"], source["input_chars"])
+                reused += 1
+                break
+    if reused:
+        print(f"{os.path.basename(pdf_path)} is a copy of {os.path.basename(duplicate['name'] or duplicate['doc_hash'])} "
+              f"({duplicate['similarity']:.0%} similar); reused its outputs.")
+    return reused
+
+@traced("index", measure_input=lambda args, kwargs: len(args[2]))
+def index_judgment(pdf_path, doc_hash, extracted_text):
+    """
+    Adds the judgment's full text and the key information stored for it to the search index,
+    recording the model the key information came from so a rerun with another model reindexes it.
+    """
+    key_info = STORE.get_analysis(doc_hash, "key_info")
+    SEARCH_INDEX.add(pdf_path, doc_hash, extracted_text, key_info["fields"])
+    MANIFEST.mark_done(pdf_path, "indexed", doc_hash, INDEX_VERSION, SEARCH_INDEX.path, key_info["model_name"])
+
+def process_judgment(pdf_path, pages):
+    """
+    Stores the extracted pages of one judgment, summarizes it, extracts its key information,
+    saves both to the judgment store and adds the judgment to the search index.
+    Stages already done for the same content, prompt version and model are skipped, as are
+    stages reused from a near-duplicate copy, and each finished stage is recorded straight away.
+    Raises if no text was extracted or any stage failed, leaving it pending for the next run.
+    """
+    pdf_file_name = os.path.basename(pdf_path)
+    extracted_text = "".join(pages)
+    if not extracted_text.strip(): # Not stored, so it is extracted again next time, e.g. once Tesseract is installed
+        raise RuntimeError(f"Could not extract text from {pdf_file_name}. If it is scanned, install Tesseract to OCR it.")
+
+    doc_hash = hash_file(pdf_path)
+    if FORCE or not STORE.has_text(doc_hash):
+        STORE.put_text(doc_hash, pages)
+    MANIFEST.mark_done(pdf_path, "extracted", doc_hash)
+    STORE.add_name(doc_hash, pdf_path)
+    reuse_near_duplicate(pdf_path, doc_hash, extracted_text)
+    chunks = None if FORCE else STORE.get_chunks(doc_hash, DEFAULT_CHUNK_TOKENS)
+    if chunks is None: # New, forced, or chunked by an older chunker
+        chunks = chunk_judgment(extracted_text)
+        STORE.put_chunks(doc_hash, DEFAULT_CHUNK_TOKENS, chunks)
+
+    # Generate and save the summary, then the key information, each from as much text as its token budget allows
+    failures = []
+    for stage, prompt_version, analyze, suffix in ANALYSIS_STAGES:
+        if stage_done(pdf_path, stage, doc_hash, prompt_version):
+            continue
+        selection = select_within_budget(chunks, prompt_budget(STAGE_PROMPTS[stage]))
+        print(f"{pdf_file_name} ({stage}): sending about {selection['tokens']:,} of {selection['total_tokens']:,} tokens, "
+              f"{selection['description']}")
+        try:
+            # A partial selection depends on the budget, so its results are cached by the text sent
+            result = analyze(selection["text"], doc_hash if selection["complete"] else None, raise_errors=True)
+        except Exception as e:
+            failures.append(f"{stage}: {e}")
+            continue
+        fields = parse_key_info_markdown(result) if stage == "key_info" else None
+        save_analysis(pdf_path, doc_hash, stage, prompt_version, suffix, result, MODEL_NAME, fields,
+                      len(selection["text"]))
+
+    if failures:
+        raise RuntimeError(f"{'; '.join(failures)} (will be retried on the next run)")
+
+    if not MANIFEST.is_done(pdf_path, "indexed", doc_hash, INDEX_VERSION, MODEL_NAME):
+        index_judgment(pdf_path, doc_hash, extracted_text)
+
+def process_judgment_traced(pdf_path, pages):
+    """
+    Runs process_judgment inside a trace (written to the JSON trace log), profiling it when
+    PROFILER is set, and prints how long each stage took.
+    """
+    pdf_file_name = os.path.basename(pdf_path)
+    with Trace(pdf_file_name) as trace, profiled(pdf_file_name, PROFILER):
+        try:
+            return process_judgment(pdf_path, pages)
+        finally:
+            if trace.records:
+                print(f"Stage timings for {pdf_file_name}: {trace.describe()}")
+
+
+# --- PDF Reports ---
+def write_reports(pdf_paths, force=False, workers=None):
+    """
+    Renders a PDF report to OUTPUT_FOLDER for each judgment with a stored summary and key
+    information, in a pool of worker processes. Reports newer than both analyses are kept
+    unless force is set.
+    """
+    jobs = []
+    for pdf_path in pdf_paths:
+        status = MANIFEST.status(pdf_path)
+        if "summarized" not in status:
+            continue
+        doc_hash = status["summarized"]["doc_hash"]
+        summary, key_info = STORE.get_analysis(doc_hash, "summarized"), STORE.get_analysis(doc_hash, "key_info")
+        if summary is None or key_info is None:
+            continue
+        pdf_file_name = os.path.basename(pdf_path)
+        output_path = os.path.join(OUTPUT_FOLDER, f"{os.path.splitext(pdf_file_name)[0]}_analysis.pdf")
+        if not force and os.path.exists(output_path) and \
+                os.path.getmtime(output_path) >= max(summary["created_at"], key_info["created_at"]):
+            continue
+        jobs.append({"output_path": output_path, "summary": summary["content"], "key_info": key_info["content"],
+                     "judgment_file_name": pdf_file_name})
+
+    if not jobs:
+        print("PDF reports are up to date.")
+        return
+    for output_path, error in render_reports(jobs, workers=workers):
+        if error:
+            print(f"Error writing report {output_path}: {error}")
+        else:
+            print(f"Report saved to: {output_path}")
 
 
 # --- Main Execution Block (with output saving) ---
 if __name__ == "__main__":
-    print("Gemini API configured successfully and model loaded!")
+    parser = argparse.ArgumentParser(description="Summarize Indian Supreme Court judgments and extract key information.")
+    parser.add_argument("pdf_file", nargs="?",
+                        help=f"PDF file name in the '{JUDGMENTS_FOLDER}' folder. Omit to process every PDF in the folder.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Judgments analysed concurrently in batch mode (default: {DEFAULT_WORKERS}).")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM,
+                        help=f"Gemini requests-per-minute quota (default: {DEFAULT_RPM}, or $GEMINI_RPM).")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TPM,
+                        help=f"Gemini tokens-per-minute quota (default: {DEFAULT_TPM}, or $GEMINI_TPM).")
+    parser.add_argument("--page-workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to extract the pages of a single long PDF (default: CPU count).")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-process judgments even if they are up to date: extract their text again (ignoring "
+                             "the judgment store) and make fresh model calls (ignoring the result cache and "
+                             "near-duplicate copies). New results replace the stored ones.")
+    parser.add_argument("--backend", choices=("gemini", "fake"), default=MODEL_BACKEND,
+                        help=f"Model backend; 'fake' is a deterministic offline stand-in (default: {MODEL_BACKEND}, or $MODEL_BACKEND).")
+    parser.add_argument("--profile", choices=("cprofile", "pyinstrument"), default=PROFILER or None,
+                        help="Save a profile of each judgment's analysis under .cache/profiles/ "
+                             "(one at a time, so most useful for a single file; default: $PROFILER).")
+    parser.add_argument("--reports", action="store_true",
+                        help=f"Also write a PDF report of each judgment to '{OUTPUT_FOLDER}', rendered in parallel.")
+    parser.add_argument("--txt", action="store_true",
+                        help=f"Also write each summary and key information to '{OUTPUT_FOLDER}' as .txt files "
+                             "(everything is kept in the judgment store; judgment_store.py --export writes them later).")
+    args = parser.parse_args()
+
+    if args.backend == "gemini" and not API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+    BACKEND = get_backend(args.backend)
+    MODEL_NAME = BACKEND.name
+    RATE_LIMITER = RateLimiter(args.rpm, args.tpm)
+    PROFILER = args.profile
+    WRITE_TXT = args.txt
+    FORCE = args.force
+    RUN_ID = STORE.start_run(MODEL_NAME, vars(args))
+    processed = 0
+    print(f"Model backend ready: {MODEL_NAME}")
 
     # Check if a specific PDF file was provided as a command-line argument
-    if len(sys.argv) > 1:
-        pdf_file_name = sys.argv[1]
-        pdf_base_name = os.path.splitext(pdf_file_name)[0] # Get filename without extension
+    if args.pdf_file:
+        pdf_file_name = args.pdf_file
         pdf_path = os.path.join(JUDGMENTS_FOLDER, pdf_file_name)
 
         if not os.path.exists(pdf_path):
             print(f"Error: PDF file '{pdf_file_name}' not found in the '{JUDGMENTS_FOLDER}' folder.")
-            print(f"Usage: python app.py <pdf_file_name_in_judgments_folder>")
+            print(f"Usage: python app_cli_version.py <pdf_file_name_in_judgments_folder>")
             sys.exit(1)
 
         print(f"\n--- Processing requested judgment: {pdf_file_name} ---")
-        extracted_text = extract_text_from_pdf(pdf_path)
-
-        if extracted_text:
-            processed_text = extracted_text[:40000] # Limit text length
-
-            # Generate and save summary
-            summary = summarize_judgment(processed_text)
-            summary_filename = f"{pdf_base_name}_summary.txt"
-            save_output_to_file(summary_filename, summary)
-
-            # Generate and save key information
-            key_info = extract_key_info(processed_text)
-            key_info_filename = f"{pdf_base_name}_key_info.txt"
-            save_output_to_file(key_info_filename, key_info)
-
+        if args.force:
+            MANIFEST.reset(pdf_path)
+        if is_up_to_date(pdf_path, hash_file(pdf_path)):
+            print(f"Outputs for {pdf_file_name} are up to date. Use --force to re-process.")
         else:
-            print(f"Could not extract text from {pdf_file_name}. Skipping processing.")
+            try:
+                process_judgment_traced(pdf_path, extract_pages_from_pdf(pdf_path, workers=args.page_workers))
+                processed = 1
+            except Exception as e:
+                print(f"Error processing {pdf_file_name}: {e}")
+        if args.reports:
+            write_reports([pdf_path], force=args.force)
 
     else:
         # If no argument is provided, process all PDFs
@@ -177,27 +453,29 @@ if __name__ == "__main__":
             pdf_files = [f for f in os.listdir(JUDGMENTS_FOLDER) if f.lower().endswith(".pdf")]
             if not pdf_files:
                 print(f"No PDF files found in the '{JUDGMENTS_FOLDER}' folder. Please place your sample PDFs there.")
-                print(f"Usage: python app.py <pdf_file_name_in_judgments_folder>")
+                print(f"Usage: python app_cli_version.py <pdf_file_name_in_judgments_folder>")
             else:
-                print("\n--- Processing all judgments in the folder ---")
-                for pdf_file in pdf_files:
-                    pdf_base_name = os.path.splitext(pdf_file)[0]
-                    pdf_path = os.path.join(JUDGMENTS_FOLDER, pdf_file)
-                    print(f"\nProcessing: {pdf_file}")
-
-                    extracted_text = extract_text_from_pdf(pdf_path)
-
-                    if extracted_text:
-                        processed_text = extracted_text[:40000] # Limit text length
-
-                        # Generate and save summary
-                        summary = summarize_judgment(processed_text)
-                        summary_filename = f"{pdf_base_name}_summary.txt"
-                        save_output_to_file(summary_filename, summary)
-
-                        # Generate and save key information
-                        key_info = extract_key_info(processed_text)
-                        key_info_filename = f"{pdf_base_name}_key_info.txt"
-                        save_output_to_file(key_info_filename, key_info)
-                    else:
-                        print(f"Could not extract text from {pdf_file}. Skipping processing.")
\ No newline at end of file
+                if args.force:
+                    MANIFEST.reset()
+                all_pdf_paths = [os.path.join(JUDGMENTS_FOLDER, f) for f in pdf_files]
+                pdf_paths = [p for p in all_pdf_paths if not is_up_to_date(p, hash_file(p))]
+
+                print(f"\n--- Processing all judgments in the folder ({args.workers} workers, {args.rpm} RPM) ---")
+                print(f"{len(all_pdf_paths) - len(pdf_paths)} of {len(all_pdf_paths)} judgments are up to date; "
+                      f"{len(pdf_paths)} to process.")
+                with STORE.bulk(): # Stored text and analyses are committed together, not one by one
+                    errors = run_batch(pdf_paths, extract_pages_from_pdf, process_judgment_traced, workers=args.workers)
+                processed = len(pdf_paths) - len(errors)
+                if args.reports:
+                    write_reports(all_pdf_paths, force=args.force)
+
+    cache_stats = RESULT_CACHE.stats()
+    print(f"\nResult cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"({cache_stats['entries']} cached results, {cache_stats['bytes']:,} bytes).")
+    usage = BACKEND.usage()
+    print(f"Model usage: {usage['calls']} calls, {usage['input_tokens']:,} input and "
+          f"{usage['output_tokens']:,} output tokens, {usage['errors']} errors.")
+    STORE.finish_run(RUN_ID, processed, usage)
+    store_stats = STORE.stats()
+    print(f"Judgment store ({STORE.path}): {store_stats['documents']} judgments, {store_stats['analyses']} analyses, "
+          f"{store_stats['file_bytes']:,} bytes.")
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# --- Configuration ---
+DEFAULT_WORKERS = 4
+
+_DONE = object() # Queue sentinel telling an analysis worker to stop
+
+
+# --- Batch Engine ---
+async def _run_batch_async(pdf_paths, extract_fn, process_fn, workers, extract_workers):
+    loop = asyncio.get_running_loop()
+    path_queue = asyncio.Queue()
+    # Bounded so extraction can only run a little ahead of the model calls,
+    # instead of holding the text of every judgment in memory at once
+    text_queue = asyncio.Queue(maxsize=workers * 2)
+    errors = {}
+
+    for pdf_path in pdf_paths:
+        path_queue.put_nowait(pdf_path)
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as process_pool, \
+            ThreadPoolExecutor(max_workers=workers) as thread_pool:
+
+        async def extractor():
+            while not path_queue.empty():
+                pdf_path = path_queue.get_nowait()
+                try:
+                    text = await loop.run_in_executor(process_pool, extract_fn, pdf_path)
+                except Exception as e:
+                    errors[pdf_path] = e
+                    continue
+                await text_queue.put((pdf_path, text))
+
+        async def analyzer():
+            while True:
+                item = await text_queue.get()
+                if item is _DONE:
+                    return
+                pdf_path, text = item
+                try:
+                    await loop.run_in_executor(thread_pool, process_fn, pdf_path, text)
+                except Exception as e:
+                    errors[pdf_path] = e
+
+        analyzers = [asyncio.create_task(analyzer()) for _ in range(workers)]
+        await asyncio.gather(*(extractor() for _ in range(extract_workers)))
+        for _ in analyzers:
+            await text_queue.put(_DONE)
+        await asyncio.gather(*analyzers)
+
+    return errors
+
+
+def run_batch(pdf_paths, extract_fn, process_fn, workers=DEFAULT_WORKERS, extract_workers=None):
+    """
+    Runs a folder of judgments through the pipeline concurrently.
+
+    Text is extracted with extract_fn(pdf_path) in a process pool (pypdf is CPU-bound),
+    then each result is handed to process_fn(pdf_path, text) through a bounded async
+    queue drained by `workers` concurrent consumers. process_fn does the model calls,
+    so `workers` is the maximum number of documents being analysed at once; quotas are
+    enforced by the rate limiter inside the model calls.
+
+    extract_fn must be a module-level function so it can be sent to worker processes.
+    Returns a dict mapping each failed pdf_path to its exception.
+    """
+    if not pdf_paths:
+        return {}
+    extract_workers = extract_workers or min(workers, os.cpu_count() or 1)
+
+    start_time = time.perf_counter()
+    errors = asyncio.run(_run_batch_async(pdf_paths, extract_fn, process_fn, workers, extract_workers))
+    elapsed = time.perf_counter() - start_time
+
+    print(f"\nProcessed {len(pdf_paths) - len(errors)}/{len(pdf_paths)} judgments in {elapsed:.1f}s "
+          f"({len(pdf_paths) / elapsed * 60:.1f} judgments/minute).")
+    for pdf_path, error in errors.items():
+        print(f"Failed: {pdf_path}: {error}")
+    return errors
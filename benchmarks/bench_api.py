@@ -0,0 +1,181 @@
+"""
+Load test of the HTTP service (api_server.py) against the local fake model backend.
+
+Starts the server in a subprocess with scratch caches, then --clients concurrent clients each
+submit --jobs judgments (the bundled PDFs, each made unique so nothing is served from a cache)
+and follow the job's event stream to its result, backing off as told by Retry-After when the
+queue is full (503) or the client is rate limited (429). Reports throughput, end-to-end and
+queue-wait latency percentiles, the refusals seen, and the model calls the server made.
+Before the load test, a PDF uploaded with POST /judgments is checked to stay usable for more
+jobs after the first one on it has finished.
+
+Usage: python benchmarks/bench_api.py [--clients 8] [--jobs 4] [--workers 4] [--queue-size 8]
+           [--rate-limit 0] [--latency 0.5] [--tokens-per-second 200]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def request(url, data=None, headers=None):
+    """Returns (status, headers, body) of an HTTP request, including error statuses."""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers or {}), timeout=300) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def follow_events(url, headers):
+    """Reads a job's event stream until its "result" event and returns that job."""
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=300) as response:
+        event = None
+        for line in response:
+            line = line.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "result":
+                return json.loads(line[len("data: "):])
+    raise RuntimeError("The event stream ended without a result.")
+
+
+def run_client(base_url, client, pdfs, jobs, results, refusals):
+    headers = {"X-API-Key": f"client-{client}"}
+    for number in range(jobs):
+        # A trailing comment changes the file's hash but not its text, so every job is analysed afresh
+        pdf_bytes = pdfs[(client + number) % len(pdfs)] + f"\n% client {client} job {number}\n".encode()
+        submitted = time.perf_counter()
+        while True:
+            status, response_headers, body = request(f"{base_url}/jobs?file_name=client{client}_{number}.pdf", pdf_bytes,
+                                                     dict(headers, **{"Content-Type": "application/pdf"}))
+            if status not in (429, 503):
+                break
+            refusals[status] += 1
+            time.sleep(float(response_headers.get("Retry-After", "1")))
+        if status not in (200, 202):
+            results.append({"error": f"{status} {body[:200]!r}"})
+            continue
+        job = follow_events(f"{base_url}/jobs/{json.loads(body)['job_id']}/events", headers)
+        results.append({"status": job["status"], "latency": time.perf_counter() - submitted,
+                        "queue_wait": job["started_at"] - job["submitted_at"], "error": job["error"]})
+
+
+def check_upload_reuse(base_url, pdf_bytes):
+    """
+    Uploads a PDF and runs a job on its doc_hash, then a job sending the same PDF, then another
+    job on the doc_hash. Returns an error message, or None if all three finished.
+    """
+    headers = {"X-API-Key": "upload-check"}
+    status, _, body = request(f"{base_url}/judgments?file_name=reuse.pdf", pdf_bytes,
+                              dict(headers, **{"Content-Type": "application/pdf"}))
+    if status != 201:
+        return f"upload: {status} {body[:200]!r}"
+    by_hash = json.dumps({"doc_hash": json.loads(body)["doc_hash"], "file_name": "reuse.pdf"}).encode()
+    for number, (data, content_type) in enumerate(
+            [(by_hash, "application/json"), (pdf_bytes, "application/pdf"), (by_hash, "application/json")], 1):
+        status, _, body = request(f"{base_url}/jobs?file_name=reuse.pdf", data,
+                                  dict(headers, **{"Content-Type": content_type}))
+        if status not in (200, 202):
+            return f"job {number}: {status} {body[:200]!r}"
+        job = follow_events(f"{base_url}/jobs/{json.loads(body)['job_id']}/events", headers)
+        if job["status"] != "done":
+            return f"job {number}: {job['status']} {job['error']}"
+        time.sleep(0.5) # The server tidies up after a job just after sending its result
+    return None
+
+
+def wait_for_server(base_url, server, timeout=60):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            sys.exit(f"The server exited with code {server.returncode}.")
+        try:
+            if request(f"{base_url}/health")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    sys.exit("The server did not start.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the HTTP service against the fake model backend.")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients (default: 8).")
+    parser.add_argument("--jobs", type=int, default=4, help="Judgments each client submits in turn (default: 4).")
+    parser.add_argument("--workers", type=int, default=4, help="Server worker threads, API_WORKERS (default: 4).")
+    parser.add_argument("--queue-size", type=int, default=8, help="Server queue size, API_QUEUE_SIZE (default: 8).")
+    parser.add_argument("--rate-limit", type=int, default=0,
+                        help="Jobs per minute per client, API_JOB_RATE_LIMIT (default: 0, no limit).")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake model seconds to first token (default: 0.5).")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake model output speed (default: 200).")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server (default: 8765).")
+    args = parser.parse_args()
+
+    pdfs = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))):
+        with open(path, "rb") as f:
+            pdfs.append(f.read())
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, MODEL_BACKEND="fake", FAKE_MODEL_LATENCY=str(args.latency),
+                   FAKE_MODEL_TOKENS_PER_SECOND=str(args.tokens_per_second), TRACE_LOG_PATH="",
+                   RESULT_CACHE_PATH=os.path.join(directory, "results.sqlite3"),
+                   RETRIEVAL_CACHE_DIR=os.path.join(directory, "chunk_vectors"),
+                   NEAR_DUPLICATE_INDEX_PATH=os.path.join(directory, "near_duplicates.sqlite3"),
+                   REUSE_NEAR_DUPLICATES="0", API_UPLOAD_DIR=os.path.join(directory, "uploads"),
+                   API_WORKERS=str(args.workers), API_QUEUE_SIZE=str(args.queue_size), API_RATE_LIMIT="0",
+                   API_JOB_RATE_LIMIT=str(args.rate_limit),
+                   API_KEYS=",".join(["upload-check"] + [f"client-{client}" for client in range(args.clients)]))
+        env.pop("GOOGLE_API_KEY", None)
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "api_server.py"), "--port", str(args.port)],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(base_url, server)
+            upload_error = check_upload_reuse(base_url, pdfs[0] + b"\n% upload reuse check\n")
+            results, refusals = [], {429: 0, 503: 0}
+            started = time.perf_counter()
+            clients = [threading.Thread(target=run_client, args=(base_url, client, pdfs, args.jobs, results, refusals))
+                       for client in range(args.clients)]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            health = json.loads(request(f"{base_url}/health")[2])
+        finally:
+            server.terminate()
+            server.wait()
+
+    done = [result for result in results if result.get("status") == "done"]
+    print(f"{args.clients} clients x {args.jobs} jobs, {args.workers} workers, queue of {args.queue_size}, "
+          f"fake model {args.latency}s + {args.tokens_per_second:g} tokens/s")
+    print(f"Done {len(done)}/{len(results)} in {elapsed:.1f}s ({len(done) / elapsed * 60:.1f} judgments/minute)")
+    if done:
+        for label, key in (("end to end", "latency"), ("queue wait", "queue_wait")):
+            values = [result[key] for result in done]
+            print(f"  {label:<10} p50 {percentile(values, 0.5):6.2f}s  p95 {percentile(values, 0.95):6.2f}s  "
+                  f"max {max(values):6.2f}s")
+    print(f"Upload reuse: {'failed, ' + upload_error if upload_error else 'ok'}")
+    print(f"Refused: {refusals[503]} with 503 (queue full), {refusals[429]} with 429 (rate limited)")
+    print(f"Model calls: {health['usage']['calls']} ({health['usage']['errors']} errors), "
+          f"{health['usage']['input_tokens']:,} input and {health['usage']['output_tokens']:,} output tokens")
+    for result in results:
+        if result.get("status") != "done":
+            print(f"Not done: {result.get('status')} {result['error']}")
@@ -0,0 +1,85 @@
+"""
+Measures Streamlit cold start and rerun cost of app.py, offline, with Streamlit's AppTest harness.
+
+Each sample is a fresh Python process (so nothing is imported or cached yet) using the fake model
+backend with no latency and a throwaway result cache. It times:
+  import:           importing streamlit itself (the same for every version of the app)
+  cold_start:       the first run of app.py (its imports plus building the page)
+  rerun:            a rerun with nothing uploaded, as after any widget interaction
+  rerun_with_file:  a rerun with a judgment uploaded but not processed
+  first_process:    clicking "Process Judgment" (extraction, analysis and report)
+  rerun_after:      a rerun after processing (e.g. after clicking "Download")
+  second_process:   clicking "Process Judgment" again on the same file
+
+Usage: python benchmarks/bench_app_startup.py [--samples 5] [--pdf judgments/judgement_1_criminal_appeal.pdf]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STEPS = ("import", "cold_start", "rerun", "rerun_with_file", "first_process", "rerun_after", "second_process")
+
+
+def run_child(pdf_path):
+    """Runs the app once through every step in this process and prints the timings as JSON."""
+    timings = {}
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    timings["import"] = time.perf_counter() - start
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=300)
+
+    def timed(step, action):
+        start = time.perf_counter()
+        action()
+        timings[step] = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(f"app.py raised during {step}: {app.exception[0].message}")
+
+    timed("cold_start", app.run)
+    timed("rerun", app.run)
+    with open(pdf_path, "rb") as f:
+        app.file_uploader[0].upload(os.path.basename(pdf_path), f.read(), "application/pdf")
+    timed("rerun_with_file", app.run)
+    timed("first_process", lambda: app.button[0].click().run())
+    timed("rerun_after", app.run)
+    timed("second_process", lambda: app.button[0].click().run())
+    print(json.dumps(timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Streamlit cold start and rerun latency of app.py.")
+    parser.add_argument("--samples", type=int, default=5, help="Fresh processes to time (default: 5).")
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "judgments", "judgement_1_criminal_appeal.pdf"),
+                        help="Judgment to upload.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        os.chdir(ROOT)
+        run_child(args.pdf)
+        sys.exit(0)
+
+    samples = []
+    for _ in range(args.samples):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, MODEL_BACKEND="fake", FAKE_MODEL_LATENCY="0", FAKE_MODEL_TOKENS_PER_SECOND="0",
+                       RESULT_CACHE_PATH=os.path.join(directory, "results.sqlite3"), TRACE_LOG_PATH="",
+                       RETRIEVAL_CACHE_DIR=os.path.join(directory, "chunk_vectors"))
+            env.pop("GOOGLE_API_KEY", None)
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--pdf", args.pdf],
+                                    env=env, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'step':<16} {'median':>9} {'min':>9} {'max':>9}   ({len(samples)} fresh processes)")
+    for step in STEPS:
+        values = [sample[step] * 1000 for sample in samples]
+        print(f"{step:<16} {statistics.median(values):>7.0f}ms {min(values):>7.0f}ms {max(values):>7.0f}ms")
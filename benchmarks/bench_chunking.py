@@ -0,0 +1,67 @@
+"""
+Compares the old fixed-size character chunker with the structure-aware chunker.
+
+For each bundled judgment, and for synthetic long judgments built by repeating them,
+both chunkers feed the same token-budgeted selection the app and the CLI use (token_budget.py).
+The script reports the input tokens sent per judgment and how many chunk boundaries fall
+between paragraphs or sentences rather than mid-sentence.
+
+Usage: python benchmarks/bench_chunking.py [--synthetic-chars 300000 600000]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chunking import chunk_judgment
+from pdf_text import extract_pdf_text
+from token_budget import PROMPT_TOKEN_BUDGET, select_within_budget
+
+CLEAN_BOUNDARY = re.compile(r"([.?!:;][\"'”’)]*|\n)\s*$")
+
+
+def legacy_chunk_text(text, chunk_size=10000, chunk_overlap=1000):
+    """The fixed-size chunker app.py used before (kept here as the baseline)."""
+    chunks = []
+    start_index = 0
+    while start_index < len(text):
+        end_index = min(start_index + chunk_size, len(text))
+        chunks.append(text[start_index:end_index])
+        if end_index == len(text):
+            break
+        start_index += (chunk_size - chunk_overlap)
+    return chunks
+
+
+def measure(chunks):
+    """Returns (tokens sent within the prompt token budget, % clean chunk boundaries)."""
+    selection = select_within_budget(chunks, PROMPT_TOKEN_BUDGET)
+    boundaries = chunks[:-1]
+    clean = sum(1 for chunk in boundaries if CLEAN_BOUNDARY.search(chunk))
+    return selection["tokens"], (clean / len(boundaries) if boundaries else 1.0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare chunkers by tokens sent per judgment.")
+    parser.add_argument("--synthetic-chars", type=int, nargs="*", default=[300000, 600000],
+                        help="Sizes of synthetic long judgments built from the bundled ones.")
+    args = parser.parse_args()
+
+    documents = []
+    for pdf_path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))):
+        documents.append((os.path.basename(pdf_path), extract_pdf_text(pdf_path)))
+    corpus = "\n\n".join(text for _, text in documents)
+    for size in args.synthetic_chars:
+        documents.append((f"synthetic_{size // 1000}k", (corpus * (size // len(corpus) + 1))[:size]))
+
+    print(f"{'judgment':<34} {'chars':>8} {'old tokens':>11} {'new tokens':>11} {'saved':>7} "
+          f"{'old clean':>10} {'new clean':>10}")
+    for name, text in documents:
+        old_tokens, old_clean = measure(legacy_chunk_text(text))
+        new_tokens, new_clean = measure(chunk_judgment(text))
+        print(f"{name:<34} {len(text):>8,} {old_tokens:>11,} {new_tokens:>11,} {1 - new_tokens / old_tokens:>6.1%} "
+              f"{old_clean:>10.0%} {new_clean:>10.0%}")
@@ -0,0 +1,125 @@
+"""
+Benchmarks the judgment store (judgment_store.py) against loose files in output/.
+
+For --judgments synthetic judgments (the bundled judgments' text with a different header each,
+plus a summary and key information from the fake backend) it measures, for both layouts:
+  write:  storing the text, summary and key information of every judgment
+  scan:   listing every judgment and reading all of its summaries, as a report or export run does
+  read:   fetching the text of --reads random judgments, as re-analysis does
+and the space used on disk. The loose layout is one <name>_text.txt, <name>_summary.txt and
+<name>_key_info.txt file per judgment. Both run against a warm page cache, so this shows the
+cost of compression and SQLite, not the directory and inode overhead of millions of files.
+
+Usage: python benchmarks/bench_judgment_store.py [--judgments 2000] [--reads 500]
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chunking import DEFAULT_CHUNK_TOKENS, chunk_judgment
+from judgment_store import JudgmentStore, zstandard
+from model_backend import fake_response
+from pdf_text import iter_pdf_pages
+from result_cache import hash_text
+from structured_analysis import KEY_INFO_FIELDS, parse_key_info_markdown
+
+
+def make_judgments(count):
+    """Returns count (doc_hash, name, pages, summary, key_info) tuples."""
+    sources = [[text for _, text in iter_pdf_pages(path)] for path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf")))]
+    headings = "\n".join(f"**{heading}:**" for _, heading, _ in KEY_INFO_FIELDS)
+    judgments = []
+    for i in range(count):
+        pages = list(sources[i % len(sources)])
+        pages[0] = f"Civil Appeal No. {i} of 2024\n" + pages[0]
+        judgments.append((hash_text(pages[0] + str(i)), f"judgments/judgment_{i}.pdf", pages,
+                          fake_response(f"Summarize judgment {i}", output_words=180),
+                          fake_response(f"Judgment {i}\n{headings}")))
+    return judgments
+
+
+def folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(directory, name)) for directory, _, names in os.walk(folder) for name in names)
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    print(f"  {label:<6} {seconds:7.2f}s  ({count / seconds:9.0f}/s)")
+    return seconds
+
+
+def bench_files(judgments, reads, folder):
+    print(f"Loose files ({folder})")
+
+    def write():
+        for _, name, pages, summary, key_info in judgments:
+            base = os.path.join(folder, os.path.splitext(os.path.basename(name))[0])
+            for suffix, content in (("_text.txt", "".join(pages)), ("_summary.txt", summary), ("_key_info.txt", key_info)):
+                with open(base + suffix, "w", encoding="utf-8") as f:
+                    f.write(content)
+
+    def scan():
+        for entry in os.scandir(folder):
+            if entry.name.endswith("_summary.txt"):
+                with open(entry.path, encoding="utf-8") as f:
+                    f.read()
+
+    def read():
+        for _, name, _, _, _ in reads:
+            with open(os.path.join(folder, os.path.splitext(os.path.basename(name))[0] + "_text.txt"), encoding="utf-8") as f:
+                f.read()
+
+    timed("write", len(judgments), write)
+    timed("scan", len(judgments), scan)
+    timed("read", len(reads), read)
+    print(f"  {len(os.listdir(folder)):,} files, {folder_bytes(folder) / 1e6:.1f} MB")
+
+
+def bench_store(judgments, reads, folder):
+    print(f"Judgment store ({'zstd' if zstandard else 'zlib'})")
+    store = JudgmentStore(os.path.join(folder, "judgments.sqlite3"))
+    chunks = {doc_hash: chunk_judgment("".join(pages)) for doc_hash, _, pages, _, _ in judgments} # Done by the pipeline
+
+    def write():
+        with store.bulk():
+            for doc_hash, name, pages, summary, key_info in judgments:
+                store.add_name(doc_hash, name)
+                store.put_text(doc_hash, pages)
+                store.put_chunks(doc_hash, DEFAULT_CHUNK_TOKENS, chunks[doc_hash])
+                store.put_analysis(doc_hash, "summarized", summary, "v1", "fake")
+                store.put_analysis(doc_hash, "key_info", key_info, "v1", "fake", fields=parse_key_info_markdown(key_info))
+
+    def scan():
+        for doc_hash, _, _, _, _ in judgments:
+            store.get_analysis(doc_hash, "summarized")
+
+    def read():
+        for doc_hash, _, _, _, _ in reads:
+            store.get_text(doc_hash)
+
+    timed("write", len(judgments), write)
+    timed("scan", len(judgments), scan)
+    timed("read", len(reads), read)
+    print(f"  1 file, {folder_bytes(folder) / 1e6:.1f} MB (includes chunk boundaries and parsed key-information fields)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the judgment store against loose text files.")
+    parser.add_argument("--judgments", type=int, default=2000, help="Synthetic judgments to write (default: 2,000).")
+    parser.add_argument("--reads", type=int, default=500, help="Random judgments whose text is read back (default: 500).")
+    args = parser.parse_args()
+
+    judgments = make_judgments(args.judgments)
+    reads = random.Random(0).choices(judgments, k=args.reads)
+    with tempfile.TemporaryDirectory() as files_folder, tempfile.TemporaryDirectory() as store_folder:
+        bench_files(judgments, reads, files_folder)
+        bench_store(judgments, reads, store_folder)
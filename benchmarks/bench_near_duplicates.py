@@ -0,0 +1,147 @@
+"""
+Benchmarks near-duplicate judgment detection (near_duplicates.py).
+
+  detection: for every bundled judgments/*.pdf, builds copies the way they turn up in the
+             corpus (re-rendered by another reporter with its own headers and page numbers,
+             a few words lost or changed in extraction, a truncated copy) and reports the
+             estimated and exact similarity to the original, and whether the index matches it.
+             Different judgments must never match.
+  signature: time to shingle and sign each judgment.
+  scaling:   add and lookup latency as the index grows to --documents signatures (random
+             ones, as unrelated judgments look to the index), for a copy of an indexed
+             judgment (hit) and a judgment not in the index (miss).
+
+Usage: python benchmarks/bench_near_duplicates.py [--documents 100000] [--lookups 500]
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from near_duplicates import (
+    NUM_PERMUTATIONS, SIMILARITY_THRESHOLD, NearDuplicateIndex, minhash_signature, shingle_hashes, signature_similarity,
+    text_words,
+)
+from pdf_text import extract_pdf_text
+
+
+def rerendered(text, rng):
+    """The text re-flowed with a reporter's running header and page numbers every ~400 words."""
+    words = text.split()
+    pages = [" ".join(words[start:start + 400]) for start in range(0, len(words), 400)]
+    return "\n".join(f"SUPREME COURT REPORTS [{rng.randint(2000, 2024)}] {page}\nPage {number} of {len(pages)}"
+                     for number, page in enumerate(pages, 1))
+
+
+def with_errors(text, rng, rate):
+    """The text with a fraction rate of its words dropped or replaced, as bad extraction or OCR does."""
+    words = []
+    for word in text.split():
+        roll = rng.random()
+        if roll < rate / 2:
+            continue
+        words.append("x" + word[::-1] if roll < rate else word)
+    return " ".join(words)
+
+
+def exact_similarity(first, second):
+    """Exact Jaccard similarity of two texts' shingle sets."""
+    a, b = set(shingle_hashes(text_words(first)).tolist()), set(shingle_hashes(text_words(second)).tolist())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def check_detection(texts):
+    rng = random.Random(0)
+    variants = {
+        "re-rendered": lambda text: rerendered(text, rng),
+        "1% word errors": lambda text: with_errors(text, rng, 0.01),
+        "3% word errors": lambda text: with_errors(text, rng, 0.03),
+        "re-rendered + 2% errors": lambda text: rerendered(with_errors(text, rng, 0.02), rng),
+        "first 60%": lambda text: text[:int(len(text) * 0.6)],
+    }
+    print(f"{'judgment':<34} {'copy':<24} {'estimated':>9} {'exact':>6}  match")
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "index.sqlite3"))
+        for name, text in texts.items():
+            unrelated = index.add(name, text, name)
+            if unrelated is not None:
+                print(f"FALSE MATCH: {name} matched {unrelated['name']} ({unrelated['similarity']:.2f})")
+        for name, text in texts.items():
+            signature = minhash_signature(shingle_hashes(text_words(text)))
+            for label, make_copy in variants.items():
+                copy = make_copy(text)
+                match = index.find(copy)
+                estimated = signature_similarity(signature, minhash_signature(shingle_hashes(text_words(copy))))
+                found = "yes" if match and match["doc_hash"] == name else "no"
+                print(f"{name:<34} {label:<24} {estimated:9.2f} {exact_similarity(text, copy):6.2f}  {found}")
+
+
+def time_signatures(texts):
+    for name, text in texts.items():
+        started = time.perf_counter()
+        minhash_signature(shingle_hashes(text_words(text)))
+        print(f"signature {name:<34} {len(text):>9,} chars  {(time.perf_counter() - started) * 1000:7.1f} ms")
+
+
+def perturbed(signature, rng, similarity):
+    """A copy of signature agreeing in about similarity of its positions, like a near-duplicate's."""
+    copy = signature.copy()
+    changed = rng.random(NUM_PERMUTATIONS) > similarity
+    copy[changed] = rng.integers(0, 1 << 32, int(changed.sum()), dtype=np.uint64).astype(np.uint32)
+    return copy
+
+
+def check_scaling(documents, lookups):
+    rng = np.random.default_rng(0)
+    checkpoints = sorted({size for size in (1_000, 10_000, 100_000, 1_000_000) if size < documents} | {documents})
+    with tempfile.TemporaryDirectory() as directory:
+        index = NearDuplicateIndex(os.path.join(directory, "index.sqlite3"))
+        signatures = []
+        for size in checkpoints:
+            new = size - len(signatures)
+            started = time.perf_counter()
+            while len(signatures) < size:
+                signature = rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64).astype(np.uint32)
+                index.add_signature(f"doc{len(signatures)}", signature, 5000)
+                signatures.append(signature)
+            add_ms = (time.perf_counter() - started) * 1000 / new
+
+            hits = [perturbed(signatures[i], rng, SIMILARITY_THRESHOLD + 0.1)
+                    for i in rng.integers(0, len(signatures), lookups)]
+            misses = [rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64).astype(np.uint32)
+                      for _ in range(lookups)]
+            found = 0
+            started = time.perf_counter()
+            for signature in hits:
+                found += index.find_signature(signature, 5000) is not None
+            hit_ms = (time.perf_counter() - started) * 1000 / lookups
+            started = time.perf_counter()
+            false_matches = sum(index.find_signature(signature, 5000) is not None for signature in misses)
+            miss_ms = (time.perf_counter() - started) * 1000 / lookups
+            size_mb = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "index.sqlite3*"))) / 1e6
+            print(f"{size:>9,} documents: add {add_ms:.2f} ms, lookup {hit_ms:.3f} ms (copy, {found}/{lookups} found), "
+                  f"{miss_ms:.3f} ms (new judgment, {false_matches} false matches), index {size_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate judgment detection.")
+    parser.add_argument("--documents", type=int, default=100_000, help="Index size to grow to (default: 100,000).")
+    parser.add_argument("--lookups", type=int, default=500, help="Lookups timed at each index size (default: 500).")
+    args = parser.parse_args()
+
+    texts = {os.path.basename(path): extract_pdf_text(path)
+             for path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf")))}
+    minhash_signature(shingle_hashes(text_words("warm up the NumPy import")))
+    time_signatures(texts)
+    print()
+    check_detection(texts)
+    print()
+    check_scaling(args.documents, args.lookups)
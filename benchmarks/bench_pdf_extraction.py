@@ -0,0 +1,56 @@
+"""
+Compares serial and parallel (process pool) text extraction on the bundled judgments.
+
+Usage: python benchmarks/bench_pdf_extraction.py [--workers N] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader
+from pdf_text import extract_pdf_text, extract_pdf_text_parallel
+
+JUDGMENTS_GLOB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "judgments", "*.pdf")
+
+
+def best_of(repeat, fn):
+    """Returns (best wall time in seconds, result) over `repeat` runs of fn()."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(JUDGMENTS_GLOB))
+    print(f"{os.cpu_count()} CPUs, {args.workers} workers, best of {args.repeat}\n")
+
+    # Start the pool once up front so its startup cost doesn't land on the first document
+    extract_pdf_text_parallel(pdf_paths[0], workers=args.workers, min_pages=1)
+
+    print(f"{'judgment':<40} {'pages':>5} {'serial s':>9} {'parallel s':>11} {'speedup':>8}")
+    total_serial = total_parallel = 0.0
+    for pdf_path in pdf_paths:
+        pages = len(PdfReader(pdf_path).pages)
+        serial_time, serial_text = best_of(args.repeat, lambda: extract_pdf_text(pdf_path))
+        parallel_time, parallel_text = best_of(
+            args.repeat, lambda: extract_pdf_text_parallel(pdf_path, workers=args.workers, min_pages=1)
+        )
+        assert parallel_text == serial_text, f"parallel extraction changed the text of {pdf_path}"
+        total_serial += serial_time
+        total_parallel += parallel_time
+        print(f"{os.path.basename(pdf_path):<40} {pages:>5} {serial_time:>9.3f} {parallel_time:>11.3f} "
+              f"{serial_time / parallel_time:>7.2f}x")
+
+    print(f"{'total':<40} {'':>5} {total_serial:>9.3f} {total_parallel:>11.3f} {total_serial / total_parallel:>7.2f}x")
@@ -0,0 +1,248 @@
+"""
+End-to-end benchmark of the web app's judgment pipeline against the local fake model backend.
+
+Runs every bundled judgments/*.pdf, plus synthetic long judgments of configurable size,
+through the same stages as app.py: text extraction, the judgment check (opening pages),
+chunk selection (including map-reduce section calls for long judgments), the summary and
+key-information calls, and ReportLab PDF generation. Reports per-stage latency percentiles,
+peak RSS, characters and tokens sent to the model, and throughput in judgments per minute,
+and writes the results as JSON (with the git commit) so runs on different commits can be compared.
+
+Usage: python benchmarks/bench_pipeline.py [--synthetic-chars 300000 600000] [--repeat 3]
+           [--strategy map_reduce] [--latency 0.5] [--tokens-per-second 200]
+           [--output results.json] [--baseline benchmarks/results/pipeline_<commit>.json]
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The benchmark must never touch Gemini or the real caches; set this up before importing the pipeline
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ["MODEL_BACKEND"] = "fake"
+os.environ["RESULT_CACHE_PATH"] = os.path.join(SCRATCH_DIR, "results.sqlite3")
+os.environ["RETRIEVAL_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "chunk_vectors")
+os.environ["NEAR_DUPLICATE_INDEX_PATH"] = os.path.join(SCRATCH_DIR, "near_duplicates.sqlite3")
+
+import judgment_pipeline
+from context_cache import ContextCache
+from model_backend import FakeBackend
+from model_runner import run_concurrently
+from pdf_text import extract_pdf_text, extract_pdf_text_parallel
+from report_pdf import generate_pdf_output
+from result_cache import hash_file
+
+STAGES = ("extraction", "classification", "chunk_selection", "llm_calls", "pdf_generation", "total")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def make_synthetic_pdf(path, size):
+    """Writes a PDF of about `size` characters by repeating the bundled judgments' text."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    corpus = "\n".join(extract_pdf_text(p) for p in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))))
+    text = (corpus * (size // len(corpus) + 1))[:size]
+    pdf = canvas.Canvas(path, pagesize=letter)
+    y = 750
+    for paragraph in text.split("\n"):
+        for line in textwrap.wrap(paragraph, 100) or [""]:
+            pdf.drawString(40, y, line)
+            y -= 13
+            if y < 50:
+                pdf.showPage()
+                y = 750
+    pdf.save()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished child processes, in MB (Linux reports KB)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_judgment(pdf_path, extract_workers):
+    """Runs one judgment through every stage; returns {stage: seconds} plus chars and tokens sent."""
+    backend = judgment_pipeline.BACKEND
+    usage_before = backend.usage()
+    timings = {}
+    started = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    text = extract_pdf_text_parallel(pdf_path, workers=extract_workers)
+    timings["extraction"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    doc_hash = hash_file(pdf_path)
+    opening_text = extract_pdf_text(pdf_path, max_pages=2)
+    is_judgment = judgment_pipeline.is_indian_supreme_court_judgment(opening_text, doc_hash)
+    timings["classification"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    plan = judgment_pipeline.prepare_analysis_texts(text, doc_hash)
+    timings["chunk_selection"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    calls = {
+        "summary": lambda: judgment_pipeline.summarize_judgment(plan["summary_text"], plan["analysis_doc_hash"]),
+        "key_info": lambda: judgment_pipeline.extract_key_info(plan["key_info_text"], plan["analysis_doc_hash"]),
+    }
+    with judgment_pipeline.shared_judgment_context(plan["summary_text"], plan["key_info_text"]):
+        results = {name: result if error is None else f"Error: {error}"
+                   for name, result, error in run_concurrently(calls, timeout=judgment_pipeline.MODEL_CALL_TIMEOUT)}
+    timings["llm_calls"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    pdf_bytes = generate_pdf_output(results["summary"], results["key_info"], os.path.basename(pdf_path))
+    timings["pdf_generation"] = time.perf_counter() - stage_start
+    timings["total"] = time.perf_counter() - started
+
+    usage_after = backend.usage()
+    chars_sent = len(plan["summary_text"]) + len(plan["key_info_text"])
+    return {
+        "judgment": os.path.basename(pdf_path),
+        "chars_extracted": len(text),
+        "is_judgment": is_judgment,
+        "strategy": plan["strategy"],
+        "chunks": plan["num_chunks"],
+        "chars_sent": chars_sent,
+        "estimated_tokens_sent": plan["summary_tokens"] + plan["key_info_tokens"], # Counted by token_budget.py
+        "model_calls": usage_after["calls"] - usage_before["calls"],
+        "input_tokens": usage_after["input_tokens"] - usage_before["input_tokens"],
+        "output_tokens": usage_after["output_tokens"] - usage_before["output_tokens"],
+        "cached_tokens": usage_after["cached_tokens"] - usage_before["cached_tokens"],
+        "pdf_bytes": len(pdf_bytes),
+        "seconds": timings,
+    }
+
+
+def summarize_runs(runs, wall_seconds):
+    """Aggregates per-judgment runs into per-stage percentiles and totals."""
+    stages = {}
+    for stage in STAGES:
+        values = [run["seconds"][stage] for run in runs]
+        stages[stage] = {
+            "p50": percentile(values, 0.50), "p90": percentile(values, 0.90), "p95": percentile(values, 0.95),
+            "max": max(values), "mean": sum(values) / len(values),
+        }
+    own_rss, child_rss = peak_rss_mb()
+    return {
+        "judgments": len(runs),
+        "wall_seconds": wall_seconds,
+        "judgments_per_minute": len(runs) / wall_seconds * 60 if wall_seconds else 0.0,
+        "peak_rss_mb": own_rss,
+        "peak_child_rss_mb": child_rss,
+        "chars_sent": sum(run["chars_sent"] for run in runs),
+        "model_calls": sum(run["model_calls"] for run in runs),
+        "input_tokens": sum(run["input_tokens"] for run in runs),
+        "output_tokens": sum(run["output_tokens"] for run in runs),
+        "cached_tokens": sum(run["cached_tokens"] for run in runs),
+        "stages": stages,
+    }
+
+
+def print_report(summary, baseline=None):
+    print(f"\n{'stage':<16} {'p50':>9} {'p90':>9} {'p95':>9} {'max':>9}" + ("   p50 vs baseline" if baseline else ""))
+    for stage, stats in summary["stages"].items():
+        line = f"{stage:<16}" + "".join(f" {stats[key] * 1000:>7.0f}ms" for key in ("p50", "p90", "p95", "max"))
+        if baseline and stage in baseline["stages"] and baseline["stages"][stage]["p50"]:
+            change = stats["p50"] / baseline["stages"][stage]["p50"] - 1
+            line += f"   {change:+.0%}"
+        print(line)
+    print(f"\nJudgments: {summary['judgments']} in {summary['wall_seconds']:.1f}s "
+          f"({summary['judgments_per_minute']:.1f} judgments/minute)")
+    print(f"Sent to the model: {summary['chars_sent']:,} characters of judgment text in {summary['model_calls']} calls, "
+          f"{summary['input_tokens']:,} input and {summary['output_tokens']:,} output tokens, "
+          f"{summary.get('cached_tokens', 0):,} read from cached judgment contexts")
+    print(f"Peak RSS: {summary['peak_rss_mb']:.0f} MB (extraction workers: {summary['peak_child_rss_mb']:.0f} MB)")
+    if baseline:
+        print(f"Baseline ({baseline.get('git_commit', '?')}): {baseline['judgments_per_minute']:.1f} judgments/minute, "
+              f"{baseline['input_tokens']:,} input tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the full judgment pipeline with a fake model backend.")
+    parser.add_argument("--synthetic-chars", type=int, nargs="*", default=[300000],
+                        help="Sizes of synthetic long judgments to add to the bundled ones.")
+    parser.add_argument("--repeat", type=int, default=3, help="Times to run the whole set (default: 3).")
+    parser.add_argument("--strategy", choices=("map_reduce", "retrieval", "head_tail"),
+                        default=judgment_pipeline.LONG_JUDGMENT_STRATEGY, help="Long-judgment strategy.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake model seconds to first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake model output speed.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake model retryable error rate.")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count() or 1, help="Processes per long PDF.")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep model results cached between repeats.")
+    parser.add_argument("--no-context-cache", action="store_true",
+                        help="Send the judgment text with every prompt instead of caching it server-side.")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/pipeline_<commit>.json).")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against.")
+    args = parser.parse_args()
+
+    judgment_pipeline.BACKEND = FakeBackend(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                            error_rate=args.error_rate)
+    judgment_pipeline.CONTEXTS = ContextCache(judgment_pipeline.BACKEND, enabled=not args.no_context_cache)
+    judgment_pipeline.LONG_JUDGMENT_STRATEGY = args.strategy
+
+    pdf_paths = sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf")))
+    for size in args.synthetic_chars:
+        path = os.path.join(SCRATCH_DIR, f"synthetic_{size // 1000}k.pdf")
+        make_synthetic_pdf(path, size)
+        pdf_paths.append(path)
+
+    runs = []
+    started = time.perf_counter()
+    for repeat in range(args.repeat):
+        for pdf_path in pdf_paths:
+            if not args.warm_cache:
+                judgment_pipeline.RESULT_CACHE.clear()
+            run = run_judgment(pdf_path, args.extract_workers)
+            run["repeat"] = repeat
+            runs.append(run)
+            print(f"[{repeat + 1}/{args.repeat}] {run['judgment']:<36} {run['seconds']['total']:6.2f}s "
+                  f"{run['strategy']:<10} {run['chars_sent']:>8,} chars sent, {run['model_calls']} model calls")
+    summary = summarize_runs(runs, time.perf_counter() - started)
+
+    commit = git_commit()
+    results = {
+        "git_commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        **summary,
+        "runs": runs,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"pipeline_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output_path}")
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
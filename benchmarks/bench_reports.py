@@ -0,0 +1,87 @@
+"""
+Benchmarks PDF report generation in reports per second.
+
+Renders the same set of reports (summaries and key information shaped like the pipeline's,
+from the fake model backend) with:
+  baseline:  generate_pdf_output from report_pdf.py at an earlier git revision (--baseline-rev)
+  serial:    generate_pdf_output from the working tree, one report after another
+  to_files:  write_pdf_report straight to files, one report after another
+  pool:      render_reports, writing the files from a pool of --workers processes
+and checks that the current and baseline reports contain the same text.
+
+Usage: python benchmarks/bench_reports.py [--reports 200] [--workers 4] [--baseline-rev 586bd36]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_backend import fake_response
+from pdf_text import extract_pdf_text
+from report_pdf import generate_pdf_output, render_reports, write_pdf_report
+from structured_analysis import KEY_INFO_FIELDS
+
+
+def load_baseline(rev):
+    """Imports report_pdf.py as it was at git revision rev."""
+    source = subprocess.check_output(["git", "show", f"{rev}:report_pdf.py"], cwd=ROOT, text=True)
+    module = types.ModuleType("report_pdf_baseline")
+    exec(compile(source, f"report_pdf.py@{rev}", "exec"), module.__dict__)
+    return module
+
+
+def make_reports(count):
+    """Returns count (summary, key_info_markdown, judgment_file_name) tuples with varied text."""
+    headings = "\n".join(f"**{heading}:**" for _, heading, _ in KEY_INFO_FIELDS)
+    return [(fake_response(f"Summarize judgment {i}", output_words=450),
+             fake_response(f"Judgment {i}\n{headings}"),
+             f"judgment_{i}.pdf") for i in range(count)]
+
+
+def timed(label, reports, render):
+    started = time.perf_counter()
+    render()
+    seconds = time.perf_counter() - started
+    print(f"{label:<10} {len(reports) / seconds:8.1f} reports/s  ({seconds:.2f}s for {len(reports)})")
+    return seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF report generation.")
+    parser.add_argument("--reports", type=int, default=200, help="Reports to render per variant (default: 200).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the pool variant.")
+    parser.add_argument("--baseline-rev", help="Git revision whose report_pdf.py to compare against.")
+    args = parser.parse_args()
+
+    reports = make_reports(args.reports)
+    generate_pdf_output(*reports[0]) # Imports reportlab and builds the styles outside the timings
+
+    results = {}
+    if args.baseline_rev:
+        baseline = load_baseline(args.baseline_rev)
+        baseline.generate_pdf_output(*reports[0])
+        results["baseline"] = timed("baseline", reports, lambda: [baseline.generate_pdf_output(*r) for r in reports])
+        for report in reports[:5]:
+            if extract_pdf_text(io.BytesIO(baseline.generate_pdf_output(*report))) != \
+                    extract_pdf_text(io.BytesIO(generate_pdf_output(*report))):
+                print(f"Warning: reports for {report[2]} differ in text from the baseline")
+
+    results["serial"] = timed("serial", reports, lambda: [generate_pdf_output(*r) for r in reports])
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = [{"output_path": os.path.join(directory, name.replace(".pdf", "_analysis.pdf")), "summary": summary,
+                 "key_info": key_info, "judgment_file_name": name} for summary, key_info, name in reports]
+        results["to_files"] = timed("to_files", reports,
+                                    lambda: [write_pdf_report(job["output_path"], job["summary"], job["key_info"],
+                                                              job["judgment_file_name"]) for job in jobs])
+        results["pool"] = timed("pool", reports, lambda: render_reports(jobs, workers=args.workers))
+
+    if "baseline" in results:
+        for label in ("serial", "to_files", "pool"):
+            print(f"{label} vs baseline: {results['baseline'] / results[label]:.2f}x")
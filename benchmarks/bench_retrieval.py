@@ -0,0 +1,76 @@
+"""
+Compares head-and-tail chunk selection with BM25 retrieval on long judgments.
+
+Synthetic long judgments are built by concatenating the bundled judgments (so each contains
+several facts sections, holdings and statute discussions spread through the text). For each one
+the script reports the input tokens sent per prompt (head-and-tail selection gets the same
+budget as retrieval), the time to build, reload and score the chunk vectors, and how many
+holding sentences and statute references from the full judgment survive the selection.
+
+Usage: python benchmarks/bench_retrieval.py [--synthetic-chars 300000 600000] [--budget 20000]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chunking import chunk_judgment
+from pdf_text import extract_pdf_text
+from retrieval import PROMPT_FIELDS, ChunkVectors, join_selected, load_or_build_vectors, select_relevant_chunks
+from token_budget import count_tokens, select_within_budget
+
+# Final orders, e.g. "Appeals are, accordingly, allowed", "this appeal succeeds and is hereby allowed"
+HOLDING = re.compile(r"[^.]*\bappeals?\b[^.]*\b(allowed|dismissed)\b[^.]*\.|[^.]*\b(quashed|set\s+aside)\b[^.]*\.", re.I)
+STATUTE = re.compile(r"\b(Section|Article)s?\s+\d+[A-Z]?", re.I)
+
+
+def recall(pattern, full_text, selected_text):
+    """Fraction of distinct pattern matches in full_text that also appear in selected_text."""
+    wanted = {" ".join(m.group(0).split()) for m in pattern.finditer(full_text)}
+    if not wanted:
+        return 1.0
+    normalized = " ".join(selected_text.split())
+    return sum(1 for item in wanted if item in normalized) / len(wanted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare head-and-tail selection with BM25 retrieval.")
+    parser.add_argument("--synthetic-chars", type=int, nargs="*", default=[300000, 600000],
+                        help="Sizes of synthetic long judgments built from the bundled ones.")
+    parser.add_argument("--budget", type=int, default=20000, help="Retrieval token budget per prompt.")
+    args = parser.parse_args()
+
+    corpus = "\n\n".join(extract_pdf_text(path) for path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))))
+    print(f"{'judgment':<16} {'strategy':<20} {'tokens':>8} {'holding':>8} {'statutes':>9} {'time':>10}")
+    for size in args.synthetic_chars:
+        text = (corpus * (size // len(corpus) + 1))[:size]
+        chunks = chunk_judgment(text)
+        name = f"synthetic_{size // 1000}k"
+
+        head_tail = select_within_budget(chunks, args.budget)["text"]
+        print(f"{name:<16} {'head_tail':<20} {count_tokens(head_tail):>8,} {recall(HOLDING, text, head_tail):>8.0%} "
+              f"{recall(STATUTE, text, head_tail):>9.0%} {'-':>10}")
+
+        start = time.perf_counter()
+        vectors = ChunkVectors.build(chunks)
+        build_ms = (time.perf_counter() - start) * 1000
+        with tempfile.TemporaryDirectory() as directory:
+            load_or_build_vectors(chunks, "bench", directory)
+            start = time.perf_counter()
+            load_or_build_vectors(chunks, "bench", directory)
+            load_ms = (time.perf_counter() - start) * 1000
+
+        for prompt_name, fields in PROMPT_FIELDS.items():
+            start = time.perf_counter()
+            indices = select_relevant_chunks(chunks, vectors, fields, args.budget)
+            select_ms = (time.perf_counter() - start) * 1000
+            retrieved = join_selected(chunks, indices)
+            print(f"{'':<16} {'retrieval/' + prompt_name:<20} {count_tokens(retrieved):>8,} "
+                  f"{recall(HOLDING, text, retrieved):>8.0%} {recall(STATUTE, text, retrieved):>9.0%} {select_ms:>8.1f}ms")
+        print(f"{'':<16} build {build_ms:.0f} ms, reload from disk {load_ms:.1f} ms for {len(chunks)} chunks")
@@ -0,0 +1,91 @@
+"""
+Measures the full-text search index at corpus sizes the bundled judgments can't reach.
+
+Builds a throwaway index of synthetic judgments (random paragraphs of the bundled judgments'
+text, with generated case names, citations, judges and statutes), then reports indexing
+throughput, index size, and query latency percentiles for typical searches.
+
+Usage: python benchmarks/bench_search_index.py [--docs 20000] [--chars 20000] [--queries 200]
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pdf_text import extract_pdf_text
+from search_index import SearchIndex
+
+JUDGES = ["Vikram Nath", "Sanjay Karol", "Sandeep Mehta", "B. R. Gavai", "Surya Kant", "J. B. Pardiwala",
+          "Manoj Misra", "Pankaj Mithal", "Ahsanuddin Amanullah", "Prashant Kumar Mishra", "K. V. Viswanathan"]
+STATUTES = ["Section 302 IPC", "Section 304B IPC", "Section 498A IPC", "Section 138 Negotiable Instruments Act",
+            "Article 21 of the Constitution", "Article 136 of the Constitution", "Section 482 CrPC",
+            "Section 11 Arbitration and Conciliation Act", "Section 34 IPC", "Order VII Rule 11 CPC"]
+QUERIES = [
+    ("section 302 ipc", None), ('"rarest of rare"', None), ("circumstantial evidence motive", None),
+    ("Sandeep Mehta", "judges"), ("article 21", "statutes"), ("State of Uttar Pradesh", "case_name"),
+    ("2024 INSC", "citation"), ("arbitration award", None), ("dowry death", None),
+]
+
+
+def synthetic_judgments(count, chars, seed=0):
+    """Yields (pdf_path, doc_hash, text, key_info_fields) for count synthetic judgments."""
+    rng = random.Random(seed)
+    corpus = "\n\n".join(extract_pdf_text(path) for path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))))
+    paragraphs = [p for p in corpus.split("\n\n") if p.strip()] or corpus.split("\n")
+    for number in range(count):
+        parts, size = [], 0
+        while size < chars:
+            paragraph = rng.choice(paragraphs)
+            parts.append(paragraph)
+            size += len(paragraph)
+        fields = {
+            "case_name": f"Appellant {number} vs. State of {rng.choice(['Uttar Pradesh', 'Punjab', 'Kerala', 'Bihar'])}",
+            "citation": f"{rng.randint(2000, 2025)} INSC {rng.randint(1, 1200)}",
+            "judges": rng.sample(JUDGES, 3),
+            "relevant_statutes": rng.sample(STATUTES, 2),
+        }
+        yield f"judgments/synthetic_{number}.pdf", f"hash{number}", "\n\n".join(parts)[:chars], fields
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark indexing and querying the judgment search index.")
+    parser.add_argument("--docs", type=int, default=20000, help="Synthetic judgments to index.")
+    parser.add_argument("--chars", type=int, default=20000, help="Characters of text per synthetic judgment.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time (cycling through a fixed set).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = SearchIndex(os.path.join(directory, "search_index.sqlite3"))
+
+        start = time.perf_counter()
+        for pdf_path, doc_hash, text, fields in synthetic_judgments(args.docs, args.chars):
+            index.add(pdf_path, doc_hash, text, fields)
+        index_seconds = time.perf_counter() - start
+        index.optimize()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        timings = []
+        for query, column in (QUERIES * (args.queries // len(QUERIES) + 1))[:args.queries]:
+            start = time.perf_counter()
+            index.search(query, column=column, limit=10)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # Re-adding unchanged judgments is the common case for incremental runs
+        start = time.perf_counter()
+        for pdf_path, doc_hash, text, fields in synthetic_judgments(min(args.docs, 1000), args.chars):
+            index.add(pdf_path, doc_hash, text, fields)
+        unchanged_ms = (time.perf_counter() - start) * 1000 / min(args.docs, 1000)
+
+    timings.sort()
+    print(f"Indexed {args.docs:,} judgments of {args.chars:,} characters in {index_seconds:.1f}s "
+          f"({args.docs / index_seconds:,.0f} judgments/s); index size {size / 1e6:,.0f} MB")
+    print(f"Re-adding an unchanged judgment: {unchanged_ms:.2f} ms (includes generating its text)")
+    print(f"Query latency over {len(timings)} queries: p50 {statistics.median(timings):.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, max {timings[-1]:.1f} ms")
@@ -0,0 +1,72 @@
+"""
+Measures the local judgment pre-filter against a small labelled corpus.
+
+The corpus is benchmarks/classifier_corpus.jsonl (one {"label", "description", "text"} per line)
+plus the opening pages of the bundled judgments/*.pdf, which are all positives.
+It includes judgments that lose their markers to garbled OCR or a near-empty first page:
+these score 0 and should be escalated to the model, never rejected locally.
+Reports how many documents were decided locally, how many would go to Gemini,
+and the accuracy of the local decisions.
+
+Usage: python benchmarks/eval_judgment_classifier.py [--verbose]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from judgment_classifier import classify_locally, score_judgment_text
+from pdf_text import extract_pdf_text
+
+CORPUS_PATH = os.path.join(ROOT, "benchmarks", "classifier_corpus.jsonl")
+
+
+def load_corpus():
+    """Returns a list of (label, description, text) tuples."""
+    samples = []
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                samples.append((record["label"], record["description"], record["text"]))
+    for pdf_path in sorted(glob.glob(os.path.join(ROOT, "judgments", "*.pdf"))):
+        samples.append((True, os.path.basename(pdf_path), extract_pdf_text(pdf_path, max_pages=2)))
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local judgment pre-filter.")
+    parser.add_argument("--verbose", action="store_true", help="Print the score and matched features of every sample.")
+    args = parser.parse_args()
+
+    samples = load_corpus()
+    correct = wrong = escalated = 0
+    start = time.perf_counter()
+    verdicts = [classify_locally(text) for _, _, text in samples]
+    elapsed = time.perf_counter() - start
+
+    for (label, description, text), verdict in zip(samples, verdicts):
+        if verdict is None:
+            escalated += 1
+            outcome = "ESCALATED"
+        elif verdict == label:
+            correct += 1
+            outcome = "ok"
+        else:
+            wrong += 1
+            outcome = "WRONG"
+        if args.verbose or outcome != "ok":
+            score, features = score_judgment_text(text)
+            print(f"{outcome:<10} label={label!s:<5} score={score:>3} {description} {features}")
+
+    decided = correct + wrong
+    print(f"\nSamples: {len(samples)}")
+    print(f"Decided locally: {decided} ({decided / len(samples):.0%} of model calls skipped)")
+    print(f"Escalated to the model: {escalated}")
+    print(f"Local accuracy: {correct}/{decided} ({(correct / decided if decided else 0):.0%})")
+    print(f"Average local classification time: {elapsed / len(samples) * 1e6:.0f} µs")
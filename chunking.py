@@ -0,0 +1,98 @@
+import re
+
+from token_budget import count_tokens
+
+# --- Configuration ---
+DEFAULT_CHUNK_TOKENS = 2500 # Counted as in token_budget.py, so chunks fit the budgets they are selected for
+CHUNK_VERSION = "paragraphs-count-tokens-v1" # Bump when chunk boundaries change, so stored chunks are redone
+
+# A new block starts at a numbered paragraph ("12.", "(iv)", "A."), a heading line in capitals,
+# or after a blank line. The lookahead keeps the boundary at the start of the line.
+PARAGRAPH_BOUNDARY = re.compile(
+    r"\n(?=[ \t]*(?:\d{1,3}\.[ \t]|\(\s*[0-9ivxlcIVXLC]{1,6}\s*\)[ \t]|[A-Z]\.[ \t]|[A-Z][A-Z0-9 &,.'()/-]{3,}[ \t]*\n))"
+    r"|(?<=\n)[ \t]*\n"
+)
+SENTENCE_END = re.compile(r"[.?!][\"'”’)]*\s+(?=[\"'“‘(]*[A-Z0-9])")
+# Words that end in a full stop without ending the sentence, common in Indian judgments
+ABBREVIATIONS = {
+    "no", "nos", "j", "jj", "cji", "v", "vs", "ors", "anr", "sec", "secs", "s", "ss", "art", "arts",
+    "crl", "cr", "civ", "mr", "mrs", "ms", "dr", "sh", "smt", "hon'ble", "ld", "i.e", "e.g", "viz",
+    "etc", "para", "paras", "p", "pp", "r", "o", "cl", "sub", "sr", "st", "ltd", "pvt", "co", "govt",
+    "dt", "u", "m/s", "w.p", "c.a",
+}
+
+
+# --- Splitting ---
+def _split_at(text, pattern):
+    """Splits text at the end of each pattern match; the pieces join back to exactly text."""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() > start:
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        pieces.append(text[start:])
+    return pieces
+
+
+def split_paragraphs(text):
+    """Splits a judgment into numbered paragraphs, headings and blank-line separated blocks."""
+    return _split_at(text, PARAGRAPH_BOUNDARY)
+
+
+def split_sentences(text):
+    """Splits text into sentences, ignoring full stops after common legal abbreviations."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        preceding_word = text[start:match.start()].rsplit(None, 1)[-1:] or [""]
+        word = preceding_word[0].lstrip("(\"'“‘").lower()
+        if word in ABBREVIATIONS or len(word) == 1:
+            continue # "No. 5", "Section 302 r/w S. 34", initials like "B. R. Gavai"
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+
+# --- Chunking ---
+def _pieces(text, max_tokens):
+    """
+    Yields consecutive pieces of text no larger than max_tokens: whole paragraphs where they fit,
+    otherwise the paragraph's sentences, otherwise slices of an overlong sentence. No token is
+    shorter than a character, so a slice of max_tokens characters always fits; chunk_judgment
+    joins consecutive slices back up to max_tokens.
+    """
+    for paragraph in split_paragraphs(text):
+        if count_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for sentence in split_sentences(paragraph):
+            if count_tokens(sentence) <= max_tokens:
+                yield sentence
+                continue
+            for start in range(0, len(sentence), max_tokens):
+                yield sentence[start:start + max_tokens]
+
+
+def chunk_judgment(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """
+    Splits a judgment into chunks of at most max_tokens tokens (as counted by count_tokens), breaking only
+    between numbered paragraphs or headings where possible, then between sentences, and
+    mid-sentence only for a single sentence longer than a whole chunk.
+    Chunks do not overlap, so "".join(chunks) == text and nothing is sent to the model twice.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for piece in _pieces(text, max_tokens):
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
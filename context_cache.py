@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+from result_cache import hash_text
+from token_budget import count_tokens
+
+# --- Configuration ---
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE", "1") != "0" # Set to 0 to always send the judgment with each prompt
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "900")) # Seconds a judgment stays cached server-side
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "4096")) # Gemini won't cache less than this
+EXPIRY_MARGIN = 60 # A context this close to expiring is replaced rather than used
+FAILURE_RETRY_SECONDS = 600 # After a model fails to create a context, texts are sent inline this long
+
+
+# --- Server-Side Judgment Contexts ---
+class ContextCache:
+    """
+    Tracks the judgment texts cached server-side by a model backend, one per document hash.
+    get() uploads a document's text the first time and returns the same handle to every later
+    prompt on it until the TTL is nearly up; asking for a different text under the same
+    document hash (e.g. after re-chunking) deletes the old context first. Texts below
+    min_tokens, and backends without context caching, get None (send the text inline), as does
+    every text for FAILURE_RETRY_SECONDS after the model failed to create a context.
+    Call release() once a judgment's prompts are done, so its context doesn't outlive them.
+    """
+
+    def __init__(self, backend, ttl=CONTEXT_CACHE_TTL, min_tokens=CONTEXT_CACHE_MIN_TOKENS,
+                 enabled=CONTEXT_CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.created = 0
+        self.reused = 0
+        self._entries = {} # doc_hash -> {"text_hash", "handle", "expires"}
+        self._doc_locks = {}
+        self._failed_at = {} # Model name -> time its last context creation failed
+        self._lock = threading.Lock()
+
+    def usable_for(self, contents):
+        """True if contents is worth caching with this backend."""
+        return self.enabled and self.backend.supports_context_cache and count_tokens(contents) >= self.min_tokens
+
+    def get(self, doc_hash, contents):
+        """Returns the handle of the context holding contents for doc_hash, creating it if needed, or None."""
+        if not self.usable_for(contents):
+            return None
+        text_hash = hash_text(contents)
+        with self._lock:
+            doc_lock = self._doc_locks.setdefault(doc_hash, threading.Lock())
+        with doc_lock: # Concurrent prompts on one judgment wait for a single upload
+            with self._lock:
+                entry = self._entries.get(doc_hash)
+            if entry and entry["text_hash"] == text_hash and entry["expires"] - EXPIRY_MARGIN > time.monotonic():
+                with self._lock:
+                    self.reused += 1
+                return entry["handle"]
+            if entry:
+                self.invalidate(doc_hash)
+            with self._lock:
+                failed_at = self._failed_at.get(self.backend.name)
+            if failed_at is not None and time.monotonic() - failed_at < FAILURE_RETRY_SECONDS:
+                return None
+            try:
+                handle = self.backend.create_context(contents, self.ttl)
+            except Exception as e:
+                print(f"Could not cache the judgment context, sending it with each prompt instead: {e}")
+                with self._lock:
+                    self._failed_at[self.backend.name] = time.monotonic()
+                return None
+            with self._lock:
+                self._entries[doc_hash] = {"text_hash": text_hash, "handle": handle,
+                                           "expires": time.monotonic() + self.ttl}
+                self.created += 1
+            return handle
+
+    def invalidate(self, doc_hash):
+        """Forgets doc_hash's context and deletes it server-side; deletion errors are printed, never raised."""
+        with self._lock:
+            entry = self._entries.pop(doc_hash, None)
+        if entry is None:
+            return
+        try:
+            self.backend.delete_context(entry["handle"])
+        except Exception as e:
+            print(f"Could not delete cached context {entry['handle']} (it expires on its own): {e}")
+
+    def release(self, doc_hash):
+        """Deletes doc_hash's context, if any, once the prompts on it are done, and forgets the document."""
+        self.invalidate(doc_hash)
+        with self._lock:
+            self._doc_locks.pop(doc_hash, None)
+
+    def stats(self):
+        """Returns contexts created and reused in this process and how many are live."""
+        with self._lock:
+            return {"created": self.created, "reused": self.reused, "live": len(self._entries)}
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+import time
+
+# --- Configuration ---
+MANIFEST_PATH = os.path.join("output", "manifest.sqlite3")
+
+# Pipeline stages in the order they run for each judgment
+STAGES = ("extracted", "summarized", "key_info", "indexed")
+
+
+# --- Job Manifest ---
+class JobManifest:
+    """
+    Records which pipeline stages have been completed for each PDF, so batch runs can
+    skip finished work and an interrupted run resumes where it stopped.
+    A stage counts as done only while the PDF's content hash, the stage's prompt version
+    and the model it was run with are unchanged and its output file (if any) still exists.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stages (
+                pdf_path TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                doc_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model_name TEXT NOT NULL DEFAULT '',
+                output_path TEXT,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (pdf_path, stage)
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(stages)")]
+        if "model_name" not in columns: # Manifest from before model names were recorded; its analyses are redone
+            self._conn.execute("ALTER TABLE stages ADD COLUMN model_name TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def is_done(self, pdf_path, stage, doc_hash, prompt_version="", model_name=""):
+        """True if stage already completed for this exact PDF content, prompt version and model."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_hash, prompt_version, model_name, output_path FROM stages WHERE pdf_path = ? AND stage = ?",
+                (pdf_path, stage),
+            ).fetchone()
+        if row is None:
+            return False
+        done_hash, done_version, done_model, output_path = row
+        if done_hash != doc_hash or done_version != prompt_version or done_model != model_name:
+            return False
+        return output_path is None or os.path.exists(output_path)
+
+    def mark_done(self, pdf_path, stage, doc_hash, prompt_version="", output_path=None, model_name=""):
+        """Records that stage finished for this PDF. Committed immediately so a crash loses no progress."""
+        if stage not in STAGES:
+            raise ValueError(f"Unknown pipeline stage '{stage}'. Expected one of: {', '.join(STAGES)}")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (pdf_path, stage, doc_hash, prompt_version, model_name, output_path, "
+                "completed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pdf_path, stage, doc_hash, prompt_version, model_name, output_path, time.time()),
+            )
+            self._conn.commit()
+
+    def status(self, pdf_path):
+        """Returns {stage: row dict} for every stage recorded for pdf_path."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, doc_hash, prompt_version, model_name, output_path, completed_at FROM stages "
+                "WHERE pdf_path = ?",
+                (pdf_path,),
+            ).fetchall()
+        return {
+            stage: {"doc_hash": doc_hash, "prompt_version": version, "model_name": model_name, "output_path": output_path,
+                    "completed_at": completed_at}
+            for stage, doc_hash, version, model_name, output_path, completed_at in rows
+        }
+
+    def reset(self, pdf_path=None):
+        """Forgets recorded progress for one PDF, or for every PDF if pdf_path is None."""
+        with self._lock:
+            if pdf_path is None:
+                self._conn.execute("DELETE FROM stages")
+            else:
+                self._conn.execute("DELETE FROM stages WHERE pdf_path = ?", (pdf_path,))
+            self._conn.commit()
@@ -0,0 +1,117 @@
+import re
+import threading
+
+# --- Configuration ---
+HEADER_CHARS = 2500 # Court name, case number and parties appear at the very start of a judgment
+YES_THRESHOLD = 6 # Scores at or above this are confidently Supreme Court of India judgments
+NO_THRESHOLD = 0 # Scores below this are confidently something else; exactly this needs clean, full text too
+MIN_CLEAN_CHARS = 1500 # A score-0 opening shorter than this is too little text to rule a judgment out
+MIN_CLEAN_WORD_SHARE = 0.85 # A score-0 opening with fewer well-formed words than this may be garbled OCR
+
+# (name, weight, pattern, ignore_case) scored against the opening of the document. Each feature counts once.
+# Court headers are matched case-sensitively: they are printed in capitals, while the body of a
+# Supreme Court judgment routinely mentions "the High Court of ..." in running text.
+FEATURES = [
+    # Supreme Court of India markers
+    ("sc_header", 6, r"IN\s+THE\s+SUPREME\s+COURT\s+OF\s+INDIA", False),
+    ("neutral_citation", 3, r"\b(19|20)\d{2}\s+INSC\s+\d+", True),
+    ("appellate_jurisdiction", 2, r"\b(CIVIL|CRIMINAL)\s+APPELLATE\s+JURISDICTION", True),
+    ("original_jurisdiction", 2, r"\b(CIVIL|CRIMINAL)\s+ORIGINAL\s+JURISDICTION", True),
+    ("slp", 2, r"SPECIAL\s+LEAVE\s+PETITION|\bSLP\s*\(\s*(C|CIVIL|CRL|CRIMINAL)\b", True),
+    # Generic Indian judgment markers (also found in High Court judgments)
+    ("appeal_number", 1, r"\b(CIVIL|CRIMINAL|CRL\.)\s+APPEAL\s*(NO|NOS)\b", True),
+    ("writ_petition", 1, r"\bWRIT\s+PETITION\s*\(\s*(C|CIVIL|CRL|CRIMINAL)\b", True),
+    ("reportable", 1, r"\b(NON[-\s]?)?REPORTABLE\b", True),
+    ("parties", 1, r"\b(APPELLANT|PETITIONER|RESPONDENT)\s*\(?S?\)?|\bVERSUS\b", True),
+    ("judgment_heading", 1, r"\bJ\s*U\s*D\s*G\s*M\s*E\s*N\s*T\b|\bO\s+R\s+D\s+E\s+R\b", True),
+    ("judge_signature", 1, r"[.…]{3,}\s*,?\s*J\.|\(\s*[A-Z][A-Z .]+\)\s*,?\s*J\.|\b[A-Z][A-Z.]+(\s+[A-Z][A-Z.]+)*,\s*J\.|\bCJI\b", False),
+    ("scc_citation", 1, r"\(\s*(19|20)\d{2}\s*\)\s*\d+\s+SCC\s+\d+", False),
+    ("leave_granted", 1, r"\bLEAVE\s+GRANTED\b", True),
+    # Other courts and jurisdictions
+    ("high_court_header", -6, r"IN\s+THE\s+HIGH\s+COURT\s+OF|\bHIGH\s+COURT\s+OF\s+JUDICATURE\s+(AT|FOR)\b", False),
+    ("lower_court_header", -4, r"IN\s+THE\s+COURT\s+OF\s+(THE\s+)?(SESSIONS|DISTRICT|CIVIL|ADDITIONAL|CHIEF|PRINCIPAL)\b", False),
+    ("tribunal_header", -4, r"\bBEFORE\s+THE\s+[A-Z ]*TRIBUNAL\b|\bNATIONAL\s+COMPANY\s+LAW\s+(APPELLATE\s+)?TRIBUNAL\b", False),
+    ("foreign_court", -6, r"SUPREME\s+COURT\s+OF\s+THE\s+UNITED\s+STATES|\bUKSC\b|\bU\.\s*S\.\s+SUPREME\s+COURT\b", True),
+]
+
+WORD_PATTERN = re.compile(
+    r"[(\[\"'‘“.]*([A-Za-z]+([.'’&-][A-Za-z]+)*|\d+([.,/:-]\d+)*|[&§-])(\(S\))?[)\]\"'’”.,;:!?/-]*"
+)
+
+COMPILED_FEATURES = [
+    (name, weight, re.compile(pattern, re.IGNORECASE if ignore_case else 0))
+    for name, weight, pattern, ignore_case in FEATURES
+]
+
+
+# --- Feature Scoring ---
+def score_judgment_text(text):
+    """Returns (score, matched feature names) for the opening of a document."""
+    header = text[:HEADER_CHARS]
+    matched = [(name, weight) for name, weight, pattern in COMPILED_FEATURES if pattern.search(header)]
+    return sum(weight for _, weight in matched), [name for name, _ in matched]
+
+
+def looks_clean(text):
+    """
+    True when the opening of a document is long enough and well-formed enough that finding
+    no judgment markers in it means it is not a judgment, rather than that the markers were
+    cut off or garbled by OCR.
+    """
+    header = text[:HEADER_CHARS]
+    words = header.split()
+    if len(header.strip()) < MIN_CLEAN_CHARS or not words:
+        return False
+    well_formed = sum(1 for word in words if WORD_PATTERN.fullmatch(word))
+    return well_formed / len(words) >= MIN_CLEAN_WORD_SHARE
+
+
+def classify_locally(text):
+    """
+    Returns True or False when the document is confidently (not) a Supreme Court of India
+    judgment, or None when the signals are ambiguous and the model should decide.
+    A score of exactly NO_THRESHOLD is only a NO when the text looks clean: short or garbled
+    text scores 0 because its markers are missing, which is not evidence against it.
+    """
+    if not text or not text.strip():
+        return False
+    score, _ = score_judgment_text(text)
+    if score >= YES_THRESHOLD:
+        return True
+    if score < NO_THRESHOLD or (score == NO_THRESHOLD and looks_clean(text)):
+        return False
+    return None
+
+
+# --- Pre-filter with Counters ---
+class JudgmentPrefilter:
+    """Wraps classify_locally and counts how often the model call was skipped."""
+
+    def __init__(self):
+        self.local_yes = 0
+        self.local_no = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def classify(self, text):
+        """Same as classify_locally, recording which way each document went."""
+        verdict = classify_locally(text)
+        with self._lock:
+            if verdict is True:
+                self.local_yes += 1
+            elif verdict is False:
+                self.local_no += 1
+            else:
+                self.escalated += 1
+        return verdict
+
+    def stats(self):
+        """Returns the local/escalated counts and the fraction of model calls skipped."""
+        with self._lock:
+            total = self.local_yes + self.local_no + self.escalated
+            return {
+                "local_yes": self.local_yes,
+                "local_no": self.local_no,
+                "escalated": self.escalated,
+                "skip_rate": ((self.local_yes + self.local_no) / total) if total else 0.0,
+            }
@@ -0,0 +1,541 @@
+import contextvars
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv() # Before the project imports below, which read their settings when imported
+
+from chunking import chunk_judgment
+from context_cache import ContextCache
+from judgment_classifier import JudgmentPrefilter
+from map_reduce import map_reduce_judgment
+from model_backend import MODEL_BACKEND, get_backend
+from model_runner import LatencyRecorder, call_with_backoff, collect_stream, run_concurrently
+from near_duplicates import NearDuplicateIndex
+from result_cache import ResultCache, hash_text
+from structured_analysis import RESPONSE_SCHEMA, describe_fields, key_info_to_markdown, parse_analysis_response
+from token_budget import count_tokens, prompt_budget, select_within_budget
+from tracing import traced
+
+# --- Configuration ---
+BACKEND = get_backend(MODEL_BACKEND) # MODEL_BACKEND=fake runs the whole pipeline offline with a local stand-in
+MODEL_NAME = BACKEND.name
+MODEL_CALL_TIMEOUT = 120 # Seconds before a single Gemini request is abandoned
+
+# How judgments longer than a prompt's token budget (token_budget.py, PROMPT_TOKEN_BUDGET) are handled:
+# "map_reduce" condenses every section in parallel so the whole judgment is covered; "retrieval" sends each
+# prompt only the sections that best match what it asks for (BM25, offline); "head_tail" keeps only the
+# first and last sections that fit
+LONG_JUDGMENT_STRATEGY = os.getenv("LONG_JUDGMENT_STRATEGY", "map_reduce")
+MAP_REDUCE_WORKERS = int(os.getenv("MAP_REDUCE_WORKERS", "8")) # Concurrent section summaries
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "20000")) # Input tokens per prompt with "retrieval"
+
+# "two_call" sends the judgment separately for the summary and the key information; "combined" gets both
+# from one structured (JSON) call, falling back to the two calls if it fails or returns invalid JSON
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "two_call")
+
+# Define the strategy for selecting chunks
+CHUNK_TOKENS = 2500                  # ~10,000 characters per chunk
+CLASSIFY_MAX_PAGES = 2               # Court name, case number and parties are always on the opening pages
+
+# --- Result Cache (shared with app_cli_version.py) ---
+# Bump a prompt version whenever its prompt template, or the way its input text is prepared,
+# changes so stale results are not reused.
+CLASSIFY_PROMPT_VERSION = "app-classify-v1"
+SUMMARY_PROMPT_VERSION = "app-summary-v2"
+KEY_INFO_PROMPT_VERSION = "app-key-info-v2"
+SECTION_NOTES_PROMPT_VERSION = "app-section-notes-v1"
+ANALYSIS_PROMPT_VERSION = "app-analysis-v1"
+RESULT_CACHE = ResultCache()
+
+# --- Server-Side Judgment Contexts (the judgment is uploaded once for the prompts that share it) ---
+CONTEXTS = ContextCache(BACKEND)
+_shared_texts = contextvars.ContextVar("shared_judgment_texts", default=frozenset())
+_used_contexts = contextvars.ContextVar("used_judgment_contexts", default=None) # Document hashes to release
+
+# --- Local Pre-filter (answers obvious judgment checks without calling Gemini) ---
+PREFILTER = JudgmentPrefilter()
+
+# --- Near-Duplicate Index (another copy of an analysed judgment reuses its analysis) ---
+REUSE_NEAR_DUPLICATES = os.getenv("REUSE_NEAR_DUPLICATES", "1") != "0" # Set to 0 to analyse every copy afresh
+STORED_ANALYSIS_VERSION = f"{SUMMARY_PROMPT_VERSION}-{KEY_INFO_PROMPT_VERSION}-{ANALYSIS_PROMPT_VERSION}"
+DUPLICATES = NearDuplicateIndex()
+
+# --- Model Calls with Latency Tracking ---
+LATENCY = LatencyRecorder()
+
+def generate_text(prompt, task, on_text=None, response_schema=None, context=None):
+    """
+    Sends prompt to the model backend and returns the response text, recording time to first
+    token and total latency under task. With on_text, the response is streamed and
+    on_text(text_so_far) is called as text arrives. response_schema requests JSON output, and
+    context (a CONTEXTS handle) puts a cached judgment before the prompt.
+    """
+    started = time.perf_counter()
+    if on_text is not None:
+        pieces = BACKEND.generate_stream(prompt, timeout=MODEL_CALL_TIMEOUT, context=context)
+    else:
+        pieces = [BACKEND.generate(prompt, timeout=MODEL_CALL_TIMEOUT, response_schema=response_schema, context=context)]
+    text, time_to_first_token, total_latency = collect_stream(pieces, on_text, started)
+    LATENCY.record(task, time_to_first_token, total_latency)
+    return text
+
+# --- Prompts on the Judgment Text (inline, or from a cached context) ---
+@contextmanager
+def shared_judgment_context(*texts):
+    """
+    Declares the judgment texts the prompts in this block will be given (one per prompt).
+    A text given more than once is uploaded as a cached context on its first prompt, and every
+    prompt on it then sends only its instructions. Texts used by a single prompt stay inline,
+    since uploading them would cost as much as sending them. The contexts are deleted when the
+    block ends.
+    """
+    hashes = [hash_text(text) for text in texts if text]
+    shared = {text_hash for text_hash in hashes if hashes.count(text_hash) > 1}
+    used = set() # Filled by the prompts, which may run in other threads with a copy of this context
+    token = _shared_texts.set(_shared_texts.get() | shared)
+    used_token = _used_contexts.set(used)
+    try:
+        yield
+    finally:
+        _used_contexts.reset(used_token)
+        _shared_texts.reset(token)
+        for doc_hash in used:
+            CONTEXTS.release(doc_hash)
+
+def generate_about_judgment(instructions, text, doc_hash, task, on_text=None, response_schema=None):
+    """
+    Runs a prompt made of instructions followed by the judgment text. Inside
+    shared_judgment_context, the text comes from a cached context keyed by doc_hash (defaults to
+    a hash of the text); if that context has expired or fails, the text is sent inline instead.
+    """
+    contents = f"Judgment Text:\n{text}\n"
+    if hash_text(text) in _shared_texts.get():
+        doc_hash = doc_hash or hash_text(text)
+        _used_contexts.get().add(doc_hash)
+        context = CONTEXTS.get(doc_hash, contents)
+        if context is not None:
+            try:
+                return generate_text(instructions + "Use the judgment text given above.\n    ",
+                                     task, on_text, response_schema, context=context)
+            except Exception as e:
+                print(f"Cached judgment context failed for {task}, sending the text instead: {e}")
+                CONTEXTS.invalidate(doc_hash)
+    return generate_text(f"{instructions}Judgment Text:\n    {text}\n    ", task, on_text, response_schema)
+
+# --- Gemini API Function for Judgment Classification ---
+@traced("classify")
+def is_indian_supreme_court_judgment(text, doc_hash=None):
+    """
+    Uses the Gemini API to determine if the given text is an Indian Supreme Court judgment.
+    Returns True if it is, False otherwise.
+    Documents with clear signals (court header, case number, citations) are decided locally
+    and only ambiguous ones are sent to the model.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    """
+    if not text:
+        return False # No text means it's not a judgment
+
+    local_verdict = PREFILTER.classify(text)
+    if local_verdict is not None:
+        return local_verdict
+
+    cache_key = RESULT_CACHE.make_key("classify", doc_hash or hash_text(text), CLASSIFY_PROMPT_VERSION, MODEL_NAME)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached == "YES"
+
+    # Take a snippet of the text to save tokens for the classification
+    # The beginning of legal documents usually contains identifying information
+    text_snippet = text[:1000] # Use the first 1000 characters for classification
+
+    prompt = f"""
+    Analyze the following document text. Is this document an official judgment from the Supreme Court of India?
+    Look for characteristic features like case names (e.g., "Appellant v. Respondent"), citations, names of judges, legal terminology common in Indian judgments, and the overall structure.
+
+    Respond with ONLY "YES" if it is an Indian Supreme Court judgment, and ONLY "NO" if it is not.
+    Do not add any other text, explanation, or punctuation.
+
+    Document Text:
+    {text_snippet}
+    """
+
+    try:
+        # Clean the response to ensure robust parsing
+        clean_response = generate_text(prompt, "classify").strip().upper()
+
+        if "YES" in clean_response:
+            RESULT_CACHE.put(cache_key, "YES")
+            return True
+        elif "NO" in clean_response:
+            RESULT_CACHE.put(cache_key, "NO")
+            return False
+        else:
+            # Fallback for unexpected AI responses
+            print(f"Unexpected AI response for judgment check: {clean_response}")
+            return False # Default to false for safety if unexpected response
+    except Exception as e:
+        print(f"Error checking if document is judgment: {e}")
+        return False # Return False on API error
+
+# --- Gemini API Function for Summarization ---
+@traced("summarize")
+def summarize_judgment(text, doc_hash=None, on_text=None):
+    """
+    Uses the Gemini API to summarize the extracted judgment text for a law student.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    on_text(text_so_far), if given, receives the summary as it streams in.
+    """
+    if not text:
+        return "No text to summarize."
+
+    cache_key = RESULT_CACHE.make_key("summary", doc_hash or hash_text(text), SUMMARY_PROMPT_VERSION, MODEL_NAME)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    instructions = """
+    This document may be a truncated version of a long Indian Supreme Court judgment.
+    Prioritize extracting the most critical legal arguments, reasoning, and the final decision
+    from the available text.
+
+    Summarize the following Indian Supreme Court judgment for a law student.
+    Focus on:
+    1.  A concise overview of the case (parties, subject).
+    2.  The key facts relevant to the legal issue.
+    3.  The main legal issue(s) before the court.
+    4.  The court's primary legal reasoning (ratio decidendi) that led to its decision.
+    5.  Concurring or dissenting opinions by any judges, if applicable. (Note that this only happens when there is a three or more judge bench).
+    6.  The final decision/holding.
+    7.  Any important legal principles or statutes applied.
+
+    Keep the summary clear, educational, and no longer than 150-200 words.
+
+    """
+
+    try:
+        summary = generate_about_judgment(instructions, text, doc_hash, "summary", on_text)
+        RESULT_CACHE.put(cache_key, summary)
+        return summary
+    except Exception as e:
+        return f"Error summarizing text: {e}"
+
+
+# --- Gemini API Function for Key Information Extraction ---
+@traced("key_info")
+def extract_key_info(text, doc_hash=None, on_text=None):
+    """
+    Uses the Gemini API to extract key information from the judgment text
+    in a structured format for a law student's case brief.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    on_text(text_so_far), if given, receives the key information as it streams in.
+    """
+    if not text:
+        return "No text provided for key information extraction."
+
+    cache_key = RESULT_CACHE.make_key("key_info", doc_hash or hash_text(text), KEY_INFO_PROMPT_VERSION, MODEL_NAME)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    instructions = """
+    This document may be a truncated version of a long Indian Supreme Court judgment.
+    Prioritize extracting the most critical legal information from the available text.
+
+    Extract the following specific information from the Indian Supreme Court judgment below.
+    Present the output clearly, using the headings provided. If a piece of information is not found,
+    state "Not found" for that specific field.
+
+    **Case Name:**
+    [Extract full case name, e.g., 'Appellant Name vs. Respondent Name']
+
+    **Citation:**
+    [Extract the official citation, e.g., '(YEAR) VOLUME SCC PAGE' or similar]
+
+    **Court & Date:**
+    [State 'Court Name' and the exact date of judgment delivery. e.g., 'Supreme Court of India, DD Month YYYY']
+
+    **Judges:**
+    [List the names of the judges who authored or concurred with the judgment]
+
+    **Facts:**
+    [Summarize the most relevant facts that led to the legal dispute, concise, around 40-50 words]. 
+    **Explicitly identify and label any direct evidence (e.g., eyewitness testimony, documents), circumstantial evidence (e.g., motive, opportunity, forensic clues) and other types of evidence (e.g., expert testimony, physical evidence), if present and relevant.**
+
+    **Jurisdictional Basis**
+    [State the specific legal provision or source of power that allows the court to hear the case such as articles/sections of the Constitution, specific statutes, etc.]
+
+    **Issue(s):**
+    [State the main legal question(s) the court was asked to decide]
+
+    **Holding:**
+    [State the court's final decision or ruling on the issue(s)]
+
+    **Reasoning (Ratio Decidendi):**
+    [Explain the core legal rationale and principles the court used to arrive at its holding]
+
+    **Relevant Statutes/Principles:**
+    [List any specific Indian Acts, Sections, or established legal principles cited or discussed]
+
+    **Practical Implications:** [State the real-world consequences or significance of this judgment for future cases, legal practice, or the interpretation of law, concise, around 30 words. If it sets a new precedent or significantly clarifies an existing one, state that.]
+    
+    """
+
+    try:
+        key_info = generate_about_judgment(instructions, text, doc_hash, "key_info", on_text)
+        RESULT_CACHE.put(cache_key, key_info)
+        return key_info
+    except Exception as e:
+        return f"Error extracting key info: {e}"
+
+# --- Gemini API Function for Combined Analysis (summary and key information in one call) ---
+@traced("analysis")
+def analyze_judgment(text, doc_hash=None):
+    """
+    Uses the Gemini API to produce the summary and every key-information field in a single
+    structured (JSON) response, so the judgment text is only sent once.
+    Returns (summary, key_info_fields), or None if the call fails or the response doesn't validate.
+    doc_hash identifies the source PDF in the result cache; defaults to a hash of the text.
+    """
+    if not text:
+        return None
+
+    cache_key = RESULT_CACHE.make_key("analysis", doc_hash or hash_text(text), ANALYSIS_PROMPT_VERSION, MODEL_NAME)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return parse_analysis_response(cached)
+
+    instructions = f"""
+    This document may be a truncated version of a long Indian Supreme Court judgment.
+    Prioritize extracting the most critical legal arguments, reasoning, and the final decision
+    from the available text.
+
+    Analyze the following Indian Supreme Court judgment for a law student and respond with a JSON object.
+
+    "summary" (string): A clear, educational summary of no more than 150-200 words covering
+    1.  A concise overview of the case (parties, subject).
+    2.  The key facts relevant to the legal issue.
+    3.  The main legal issue(s) before the court.
+    4.  The court's primary legal reasoning (ratio decidendi) that led to its decision.
+    5.  Concurring or dissenting opinions by any judges, if applicable. (Note that this only happens when there is a three or more judge bench).
+    6.  The final decision/holding.
+    7.  Any important legal principles or statutes applied.
+
+    Key information fields (use "Not found" for any field the text does not contain):
+{describe_fields()}
+
+    """
+
+    try:
+        response_text = generate_about_judgment(instructions, text, doc_hash, "analysis",
+                                                response_schema=RESPONSE_SCHEMA)
+        result = parse_analysis_response(response_text)
+    except Exception as e:
+        print(f"Combined analysis failed, falling back to separate calls: {e}")
+        return None
+    RESULT_CACHE.put(cache_key, response_text)
+    return result
+
+# --- Gemini API Function for Section Notes (map step for long judgments) ---
+@traced("section_notes")
+def summarize_section(section_text):
+    """
+    Uses the Gemini API to condense one section of a long judgment (or of earlier notes)
+    into dense notes. Results are cached per section, so re-analysing a judgment only
+    pays for sections that changed. Raises on API errors after retrying.
+    """
+    cache_key = RESULT_CACHE.make_key("section_notes", hash_text(section_text), SECTION_NOTES_PROMPT_VERSION, MODEL_NAME)
+    cached = RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    prompt = f"""
+    The text below is one consecutive section of a long Indian Supreme Court judgment,
+    or notes already made on several such sections.
+
+    Condense it into dense notes for a law student who will later combine the notes on every section.
+    Keep, where present:
+    1.  Facts and procedural history.
+    2.  Arguments of each party.
+    3.  Legal issues framed by the court.
+    4.  The court's reasoning, findings and conclusions.
+    5.  Statutes, sections, articles and precedents cited, with citations exactly as written.
+    6.  Final orders or directions, and names of judges who authored, concurred or dissented.
+
+    Keep names, dates, section numbers and citations exact. Do not add information that is not in the text.
+    Write no more than 250 words. If the section contains only formal or procedural material, say so in one line.
+
+    Section Text:
+    {section_text}
+    """
+
+    notes = call_with_backoff(lambda: generate_text(prompt, "section_notes"), max_retries=3)
+    RESULT_CACHE.put(cache_key, notes)
+    return notes
+
+# --- Chunk Selection ---
+@traced("chunk_selection")
+def prepare_analysis_texts(extracted_text, doc_hash=None, strategy=None, on_progress=None):
+    """
+    Chunks a judgment and chooses the text each analysis prompt receives. Judgments within
+    each prompt's token budget (token_budget.prompt_budget) are sent whole; longer ones follow
+    strategy (default LONG_JUDGMENT_STRATEGY). on_progress(level, done, total) reports
+    map-reduce progress.
+
+    Returns a dict with the strategy used, summary_text and key_info_text with their
+    summary_tokens and key_info_tokens, total_tokens of the whole judgment, analysis_doc_hash
+    (the cache key for the final calls, or None to cache them by their input text), num_chunks,
+    and strategy details: levels (map_reduce), section counts (retrieval), selected_chunks and
+    description (head_tail).
+    """
+    strategy = strategy or LONG_JUDGMENT_STRATEGY
+    # --- Structure-Aware Chunking ---
+    # Chunks end between numbered paragraphs or sentences and don't overlap, so no text is sent twice
+    all_chunks = chunk_judgment(extracted_text, max_tokens=CHUNK_TOKENS)
+    budgets = {prompt_name: prompt_budget(prompt_name) for prompt_name in ("summary", "key_info")}
+    total_tokens = sum(count_tokens(chunk) for chunk in all_chunks) # Counts are cached for the selection below
+    plan = {"num_chunks": len(all_chunks), "total_tokens": total_tokens, "analysis_doc_hash": doc_hash}
+    too_long = total_tokens > min(budgets.values())
+
+    if too_long and strategy == "map_reduce":
+        # --- Map-Reduce: condense every section in parallel, then analyse the combined notes ---
+        notes, levels = map_reduce_judgment(
+            all_chunks, summarize_section, max_workers=MAP_REDUCE_WORKERS, max_tokens=min(budgets.values()),
+            on_progress=on_progress,
+        )
+        plan.update(strategy="map_reduce", summary_text=notes, key_info_text=notes, levels=levels,
+                    analysis_doc_hash=None) # The notes are the input now; cache the final calls by their content
+    elif too_long and strategy == "retrieval":
+        # --- Retrieval: rank sections against what each prompt asks for and send the best ones ---
+        # Imported here so NumPy is only loaded when a judgment actually needs retrieval
+        from retrieval import PROMPT_FIELDS, join_selected, load_or_build_vectors, select_relevant_chunks
+        chunk_vectors = load_or_build_vectors(all_chunks, f"{doc_hash or hash_text(extracted_text)}-{CHUNK_TOKENS}")
+        plan.update(strategy="retrieval", analysis_doc_hash=None) # The selection depends on the budget
+        for prompt_name, fields in PROMPT_FIELDS.items():
+            budget = min(RETRIEVAL_TOKEN_BUDGET, budgets[prompt_name])
+            selected = select_relevant_chunks(all_chunks, chunk_vectors, fields, budget)
+            plan[f"{prompt_name}_text"] = join_selected(all_chunks, selected)
+            plan[f"{prompt_name}_sections"] = len(selected)
+    else:
+        # --- Head-and-Tail Selection (the whole judgment when it fits) ---
+        selections = {prompt_name: select_within_budget(all_chunks, budget) for prompt_name, budget in budgets.items()}
+        shortest = min(selections.values(), key=lambda selection: selection["selected_chunks"])
+        plan.update(strategy="head_tail", summary_text=selections["summary"]["text"],
+                    key_info_text=selections["key_info"]["text"], selected_chunks=shortest["selected_chunks"],
+                    description=shortest["description"])
+        if not shortest["complete"]:
+            plan["analysis_doc_hash"] = None # The selection depends on the budget; cache the calls by the text sent
+
+    for prompt_name in budgets:
+        plan[f"{prompt_name}_tokens"] = count_tokens(plan[f"{prompt_name}_text"])
+    return plan
+
+# --- Near-Duplicate Reuse ---
+def store_analysis(doc_hash, summary, key_info, key_info_fields=None):
+    """
+    Keeps a finished analysis of a PDF in the result cache, so a near-duplicate copy found later
+    can reuse it. Analyses with an error in either part are not kept.
+    """
+    if not (summary and key_info) or summary.startswith("Error") or key_info.startswith("Error"):
+        return
+    cache_key = RESULT_CACHE.make_key("judgment_analysis", doc_hash, STORED_ANALYSIS_VERSION, MODEL_NAME)
+    RESULT_CACHE.put(cache_key, json.dumps({"summary": summary, "key_info": key_info,
+                                            "key_info_fields": key_info_fields}))
+
+
+@traced("near_duplicate")
+def find_near_duplicate(extracted_text, doc_hash, name=None):
+    """
+    Adds a judgment to the near-duplicate index and, if it is a copy of one analysed before
+    (another reporter's PDF, the non-reportable version, a re-upload), returns that analysis as
+    a dict with summary, key_info, key_info_fields, similarity and the copy's name. Returns None
+    when there is no such copy or its analysis is no longer stored.
+    """
+    if not REUSE_NEAR_DUPLICATES:
+        return None
+    match = DUPLICATES.add(doc_hash, extracted_text, name)
+    if match is None:
+        return None
+    for candidate in (match["doc_hash"], match["canonical_hash"]):
+        stored = RESULT_CACHE.get(RESULT_CACHE.make_key("judgment_analysis", candidate, STORED_ANALYSIS_VERSION, MODEL_NAME))
+        if stored is not None:
+            return dict(json.loads(stored), similarity=match["similarity"], name=match["name"])
+    return None
+
+# --- Whole-Judgment Analysis (for background jobs) ---
+NO_TEXT_MESSAGE = ("No text could be extracted. The PDF looks scanned (image-based), "
+                   "and scanned judgments can only be read when Tesseract OCR is installed.")
+
+def analyze_pdf(pdf_bytes, doc_hash, on_status=None, extract_workers=1, name=None):
+    """
+    Runs an uploaded judgment through the whole pipeline without any UI: the judgment check on its
+    opening pages, text extraction, chunk selection, and the summary and key-information calls
+    (one combined call when ANALYSIS_MODE is "combined"). on_status(status, progress) reports
+    each step with a progress fraction between 0 and 1. name (e.g. the file name) is recorded
+    in the near-duplicate index.
+
+    Returns a dict with status ("done", or "rejected" if the PDF is not a Supreme Court judgment),
+    summary, key_info, key_info_fields (None unless the combined call succeeded), num_chars and
+    strategy ("near_duplicate" when the analysis of an earlier copy was reused, with duplicate_of
+    and similarity). Model errors are returned in summary or key_info as messages; extraction
+    errors raise.
+    """
+    from pdf_text import extract_pdf_text_parallel # pypdf is only loaded once a PDF is processed
+
+    def report(status, progress):
+        if on_status:
+            on_status(status, progress)
+
+    report("checking", 0.05)
+    opening_text = extract_pdf_text_parallel(io.BytesIO(pdf_bytes), workers=1, max_pages=CLASSIFY_MAX_PAGES)
+    if not opening_text.strip():
+        raise ValueError(NO_TEXT_MESSAGE)
+    if not is_indian_supreme_court_judgment(opening_text, doc_hash):
+        return {"status": "rejected", "summary": None, "key_info": None, "key_info_fields": None,
+                "num_chars": 0, "strategy": None}
+
+    report("extracting", 0.15)
+    extracted_text = extract_pdf_text_parallel(io.BytesIO(pdf_bytes), workers=extract_workers)
+    if not extracted_text:
+        raise ValueError(NO_TEXT_MESSAGE)
+
+    duplicate = find_near_duplicate(extracted_text, doc_hash, name)
+    if duplicate is not None:
+        report("done", 1.0)
+        return {"status": "done", "summary": duplicate["summary"], "key_info": duplicate["key_info"],
+                "key_info_fields": duplicate["key_info_fields"], "num_chars": len(extracted_text),
+                "strategy": "near_duplicate", "duplicate_of": duplicate["name"], "similarity": duplicate["similarity"]}
+
+    report("selecting", 0.3)
+    plan = prepare_analysis_texts(
+        extracted_text, doc_hash,
+        on_progress=lambda level, done, total: report("condensing", 0.3 + 0.4 * done / total),
+    )
+
+    report("analysing", 0.75)
+    summary, key_info, key_info_fields = None, None, None
+    if ANALYSIS_MODE == "combined":
+        analysis = analyze_judgment(plan["key_info_text"], plan["analysis_doc_hash"])
+        if analysis is not None:
+            summary, key_info_fields = analysis
+            key_info = key_info_to_markdown(key_info_fields)
+    if key_info_fields is None:
+        calls = {
+            "summary": lambda: summarize_judgment(plan["summary_text"], plan["analysis_doc_hash"]),
+            "key_info": lambda: extract_key_info(plan["key_info_text"], plan["analysis_doc_hash"]),
+        }
+        error_messages = {"summary": "Error summarizing text", "key_info": "Error extracting key info"}
+        results = {}
+        with shared_judgment_context(plan["summary_text"], plan["key_info_text"]):
+            for prompt_name, result, error in run_concurrently(calls, timeout=MODEL_CALL_TIMEOUT):
+                results[prompt_name] = result if error is None else f"{error_messages[prompt_name]}: {error}"
+        summary, key_info = results["summary"], results["key_info"]
+    store_analysis(doc_hash, summary, key_info, key_info_fields)
+
+    report("done", 1.0)
+    return {"status": "done", "summary": summary, "key_info": key_info, "key_info_fields": key_info_fields,
+            "num_chars": len(extracted_text), "strategy": plan["strategy"]}
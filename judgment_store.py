@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from chunking import CHUNK_VERSION
+
+load_dotenv() # JUDGMENT_STORE_PATH etc. may be set in .env, as for the CLI
+
+# --- Configuration ---
+STORE_PATH = os.getenv("JUDGMENT_STORE_PATH", os.path.join("output", "judgments.sqlite3"))
+STORE_MMAP_BYTES = int(os.getenv("JUDGMENT_STORE_MMAP_BYTES", str(1024 * 1024 * 1024))) # Reads go through a 1 GB memory map
+TEXT_VERSION = "pypdf-ocr-v1" # Bump when text extraction changes, so stored text is extracted again
+BULK_COMMIT_SECONDS = 1.0 # Inside bulk(), writes are committed together at most this often
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# Every blob starts with one byte naming its codec, so a store written with zstd installed
+# stays readable (and writable with zlib) where it isn't
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+# Analysis outputs and the files they are exported to, in the layout app_cli_version.py writes
+TXT_SUFFIXES = {"summarized": "_summary.txt", "key_info": "_key_info.txt"}
+
+try:
+    import zstandard # Optional: compresses better than zlib and decompresses faster
+except ImportError:
+    zstandard = None
+
+
+# --- Compression ---
+def compress(data):
+    """Compresses bytes with zstd when the zstandard package is installed, otherwise with zlib."""
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(blob):
+    """Reverses compress() for a blob written with either codec."""
+    codec, data = blob[:1], blob[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This judgment store was written with zstd; install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec {codec!r} in the judgment store.")
+
+
+def _offsets(parts):
+    """End offset of each part of a text split into parts, as packed unsigned 32-bit integers."""
+    ends, end = array("I"), 0
+    for part in parts:
+        end += len(part)
+        ends.append(end)
+    return ends.tobytes()
+
+
+def _split(text, blob):
+    """Splits text at the end offsets packed by _offsets()."""
+    ends = array("I")
+    ends.frombytes(blob)
+    starts = [0, *ends[:-1]]
+    return [text[start:end] for start, end in zip(starts, ends)]
+
+
+# --- Judgment Store ---
+class JudgmentStore:
+    """
+    Single-file store of everything the CLI keeps per judgment, keyed by the PDF's content
+    hash: the file names it was found under, the extracted text with its page boundaries,
+    chunk boundaries, the summary and key information with its fields, and metadata about
+    each run. Texts are compressed blobs
+    (zstd if installed, else zlib) and reads are served from a memory map, so millions of
+    judgments live in one file instead of loose text files, and re-analysing one never
+    re-parses its PDF. export_txt() writes the old <name>_summary.txt / _key_info.txt layout.
+
+    Safe to share between threads, and between processes: a forked worker (e.g. the CLI's
+    extraction pool) opens its own connection on first use. Inside bulk() a write transaction
+    stays open for up to BULK_COMMIT_SECONDS, so while it is in use only read from other processes.
+    """
+
+    def __init__(self, path=STORE_PATH, mmap_bytes=STORE_MMAP_BYTES):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self._lock = threading.Lock()
+        self._bulk_depth = 0
+        self._last_commit = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._connect()
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS names (
+                name TEXT PRIMARY KEY,
+                doc_hash TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS names_doc_hash ON names (doc_hash);
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_hash TEXT PRIMARY KEY,
+                text_version TEXT NOT NULL,
+                num_pages INTEGER NOT NULL,
+                num_chars INTEGER NOT NULL,
+                page_ends BLOB NOT NULL,
+                text BLOB NOT NULL,
+                extracted_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_hash TEXT NOT NULL,
+                chunk_tokens INTEGER NOT NULL,
+                chunk_version TEXT NOT NULL DEFAULT '',
+                num_chunks INTEGER NOT NULL,
+                chunk_ends BLOB NOT NULL,
+                PRIMARY KEY (doc_hash, chunk_tokens)
+            );
+            CREATE TABLE IF NOT EXISTS analyses (
+                doc_hash TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                content BLOB NOT NULL,
+                fields BLOB,
+                input_chars INTEGER,
+                run_id INTEGER,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (doc_hash, stage)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                model_name TEXT,
+                settings TEXT,
+                judgments INTEGER,
+                usage TEXT
+            );
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+        if "chunk_version" not in columns: # Store from before chunk versions were recorded; its chunks are redone
+            self._conn.execute("ALTER TABLE chunks ADD COLUMN chunk_version TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+
+    def _db(self):
+        """The connection for this process; called with the lock held."""
+        if self._pid != os.getpid(): # SQLite connections must not be used across fork
+            self._inherited = self._conn # Kept, not closed: closing it here could disturb the parent's
+            self._bulk_depth = 0 # The parent's bulk() doesn't commit this process's writes
+            self._connect()
+        return self._conn
+
+    def _commit(self):
+        """Commits now, or inside bulk() once BULK_COMMIT_SECONDS have passed; called with the lock held."""
+        if self._bulk_depth and time.monotonic() - self._last_commit < BULK_COMMIT_SECONDS:
+            return
+        self._db().commit()
+        self._last_commit = time.monotonic()
+
+    @contextmanager
+    def bulk(self):
+        """
+        Groups the writes made inside the block (from any thread) into transactions of up to
+        BULK_COMMIT_SECONDS, instead of committing each one; everything is committed on exit.
+        """
+        with self._lock:
+            self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._bulk_depth -= 1
+                self._db().commit()
+                self._last_commit = time.monotonic()
+
+    # --- File Names ---
+    def add_name(self, doc_hash, name):
+        """Records that the file name (e.g. a PDF path) holds the judgment doc_hash; one judgment may have many."""
+        with self._lock:
+            self._db().execute("INSERT OR REPLACE INTO names (name, doc_hash, seen_at) VALUES (?, ?, ?)",
+                               (name, doc_hash, time.time()))
+            self._commit()
+
+    # --- Extracted Text ---
+    def put_text(self, doc_hash, pages):
+        """Stores the extracted text of a judgment's pages, replacing any stored before."""
+        text = "".join(pages)
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO documents (doc_hash, text_version, num_pages, num_chars, page_ends, text, "
+                "extracted_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc_hash, TEXT_VERSION, len(pages), len(text), _offsets(pages),
+                 compress(text.encode("utf-8")), time.time()),
+            )
+            self._commit()
+
+    def _load_text(self, doc_hash):
+        """Returns (text, packed page ends) for doc_hash, or None."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT text, page_ends FROM documents WHERE doc_hash = ? AND text_version = ?", (doc_hash, TEXT_VERSION)
+            ).fetchone()
+        return None if row is None else (decompress(row[0]).decode("utf-8"), row[1])
+
+    def has_text(self, doc_hash):
+        """True if a judgment's text is stored with the current TEXT_VERSION."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT 1 FROM documents WHERE doc_hash = ? AND text_version = ?", (doc_hash, TEXT_VERSION)
+            ).fetchone() is not None
+
+    def get_text(self, doc_hash):
+        """Returns a judgment's stored text, or None if it hasn't been stored with the current TEXT_VERSION."""
+        stored = self._load_text(doc_hash)
+        return None if stored is None else stored[0]
+
+    def get_pages(self, doc_hash):
+        """Returns a judgment's stored text page by page, or None."""
+        stored = self._load_text(doc_hash)
+        return None if stored is None else _split(*stored)
+
+    # --- Chunk Boundaries ---
+    def put_chunks(self, doc_hash, chunk_tokens, chunks):
+        """Stores where a judgment's text splits into chunks of chunk_tokens, as end offsets."""
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO chunks (doc_hash, chunk_tokens, chunk_version, num_chunks, chunk_ends) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_hash, chunk_tokens, CHUNK_VERSION, len(chunks), _offsets(chunks)),
+            )
+            self._commit()
+
+    def get_chunks(self, doc_hash, chunk_tokens):
+        """
+        Returns a judgment's chunks of chunk_tokens, cut from its stored text, or None if they
+        haven't been stored by the current chunker (CHUNK_VERSION).
+        """
+        with self._lock:
+            row = self._db().execute(
+                "SELECT chunk_ends FROM chunks WHERE doc_hash = ? AND chunk_tokens = ? AND chunk_version = ?",
+                (doc_hash, chunk_tokens, CHUNK_VERSION),
+            ).fetchone()
+        text = self.get_text(doc_hash) if row else None
+        return None if text is None else _split(text, row[0])
+
+    # --- Analyses ---
+    def put_analysis(self, doc_hash, stage, content, prompt_version, model_name, fields=None, input_chars=None,
+                     run_id=None):
+        """Stores the output of an analysis stage (and its parsed key-information fields, if any)."""
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO analyses (doc_hash, stage, prompt_version, model_name, content, fields, "
+                "input_chars, run_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_hash, stage, prompt_version, model_name, compress(content.encode("utf-8")),
+                 None if fields is None else compress(json.dumps(fields).encode("utf-8")),
+                 input_chars, run_id, time.time()),
+            )
+            self._commit()
+
+    def get_analysis(self, doc_hash, stage):
+        """
+        Returns a stored analysis as a dict with content, fields (or None), prompt_version,
+        model_name, input_chars, run_id and created_at, or None.
+        """
+        with self._lock:
+            row = self._db().execute(
+                "SELECT content, fields, prompt_version, model_name, input_chars, run_id, created_at FROM analyses "
+                "WHERE doc_hash = ? AND stage = ?", (doc_hash, stage)
+            ).fetchone()
+        if row is None:
+            return None
+        content, fields, prompt_version, model_name, input_chars, run_id, created_at = row
+        return {"content": decompress(content).decode("utf-8"),
+                "fields": None if fields is None else json.loads(decompress(fields)),
+                "prompt_version": prompt_version, "model_name": model_name, "input_chars": input_chars,
+                "run_id": run_id, "created_at": created_at}
+
+    def has_analysis(self, doc_hash, stage, prompt_version, model_name):
+        """True if stage is stored for doc_hash with prompt_version by model_name, without reading its content."""
+        with self._lock:
+            return self._db().execute(
+                "SELECT 1 FROM analyses WHERE doc_hash = ? AND stage = ? AND prompt_version = ? AND model_name = ?",
+                (doc_hash, stage, prompt_version, model_name),
+            ).fetchone() is not None
+
+    # --- Run Metadata ---
+    def start_run(self, model_name, settings=None):
+        """Records the start of a run (e.g. one CLI invocation) and returns its run_id."""
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT INTO runs (started_at, model_name, settings) VALUES (?, ?, ?)",
+                (time.time(), model_name, json.dumps(settings or {})),
+            )
+            self._db().commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, judgments, usage=None):
+        """Records the end of a run with the number of judgments it processed and its model usage."""
+        with self._lock:
+            self._db().execute(
+                "UPDATE runs SET finished_at = ?, judgments = ?, usage = ? WHERE run_id = ?",
+                (time.time(), judgments, json.dumps(usage or {}), run_id),
+            )
+            self._db().commit()
+
+    # --- Export and Statistics ---
+    def export_txt(self, folder, doc_hashes=None):
+        """
+        Writes the stored analyses to folder in the loose-file layout, <name>_summary.txt and
+        <name>_key_info.txt for every file name recorded for a judgment (or the start of its
+        hash if it has none), for all judgments or only doc_hashes. Returns the paths written.
+        """
+        os.makedirs(folder, exist_ok=True)
+        query = "SELECT a.doc_hash, a.stage, n.name FROM analyses a LEFT JOIN names n USING (doc_hash)"
+        with self._lock:
+            rows = self._db().execute(query).fetchall()
+        wanted = None if doc_hashes is None else set(doc_hashes)
+        paths = []
+        for doc_hash, stage, name in rows:
+            if stage not in TXT_SUFFIXES or (wanted is not None and doc_hash not in wanted):
+                continue
+            base_name = os.path.splitext(os.path.basename(name))[0] if name else doc_hash[:16]
+            path = os.path.join(folder, f"{base_name}{TXT_SUFFIXES[stage]}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.get_analysis(doc_hash, stage)["content"])
+            paths.append(path)
+        return paths
+
+    def stats(self):
+        """Returns judgment and analysis counts, the characters of text stored and the file size."""
+        with self._lock:
+            documents, chars, stored = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(num_chars), 0), COALESCE(SUM(LENGTH(text)), 0) FROM documents"
+            ).fetchone()
+            analyses = self._db().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            runs = self._db().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        size = sum(os.path.getsize(self.path + suffix) for suffix in ("", "-wal") if os.path.exists(self.path + suffix))
+        return {"documents": documents, "text_chars": chars, "text_bytes_stored": stored, "analyses": analyses,
+                "runs": runs, "file_bytes": size}
+
+
+# --- Export CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export the judgment store written by app_cli_version.py.")
+    parser.add_argument("--store", default=STORE_PATH, help=f"Store file (default: {STORE_PATH}, or $JUDGMENT_STORE_PATH).")
+    parser.add_argument("--export", metavar="FOLDER",
+                        help="Write every stored summary and key information as <name>_summary.txt / _key_info.txt.")
+    args = parser.parse_args()
+
+    store = JudgmentStore(args.store)
+    if args.export:
+        paths = store.export_txt(args.export)
+        print(f"Wrote {len(paths)} files to {args.export}.")
+    stats = store.stats()
+    print(f"{stats['documents']} judgments ({stats['text_chars']:,} characters of text in "
+          f"{stats['text_bytes_stored']:,} bytes), {stats['analyses']} analyses from {stats['runs']} runs; "
+          f"{stats['file_bytes']:,} bytes on disk.")
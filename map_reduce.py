@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from chunking import DEFAULT_CHUNK_TOKENS, chunk_judgment
+from token_budget import count_tokens
+from tracing import in_current_context
+
+# --- Configuration ---
+DEFAULT_MAP_WORKERS = 8 # Concurrent chunk summaries per level
+DEFAULT_NOTES_TOKENS = 40000 # Reduce until the combined notes fit in this many tokens
+MAX_LEVELS = 4 # Safety stop; each level typically shrinks the text 5-10x
+
+
+# --- Map Step ---
+def map_chunks(chunks, summarize_chunk, max_workers=DEFAULT_MAP_WORKERS, on_progress=None):
+    """
+    Runs summarize_chunk(chunk) over every chunk with at most max_workers calls in flight
+    and returns the notes in the original chunk order. A chunk whose call raises gets a
+    short placeholder instead, so one failure doesn't lose the rest of the document.
+    on_progress(done, total) is called from the calling thread after each chunk.
+    """
+    notes = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(in_current_context(summarize_chunk), chunk): index for index, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                notes[index] = future.result()
+            except Exception as e:
+                notes[index] = f"(Notes for this part are unavailable: {e})"
+            if on_progress:
+                on_progress(done, len(chunks))
+    return notes
+
+
+def join_notes(notes):
+    """Joins per-chunk notes into one document, labelling each part in order."""
+    return "\n\n".join(f"[Part {index} of {len(notes)}]\n{note.strip()}" for index, note in enumerate(notes, 1))
+
+
+# --- Map-Reduce ---
+def map_reduce_judgment(chunks, summarize_chunk, max_workers=DEFAULT_MAP_WORKERS,
+                        max_tokens=DEFAULT_NOTES_TOKENS, chunk_tokens=DEFAULT_CHUNK_TOKENS, on_progress=None):
+    """
+    Condenses a whole judgment into notes that fit in max_tokens.
+
+    Every chunk is summarized in parallel (map). If the joined notes are still too long,
+    they are re-chunked and summarized again (reduce), level by level, so latency grows
+    with the number of levels rather than with document length.
+    on_progress(level, done, total) reports progress within each level.
+    Returns (notes text, number of levels).
+    """
+    level = 0
+    while True:
+        level += 1
+        notes = map_chunks(
+            chunks, summarize_chunk, max_workers,
+            on_progress=(lambda done, total: on_progress(level, done, total)) if on_progress else None,
+        )
+        combined = join_notes(notes)
+        if count_tokens(combined) <= max_tokens or level >= MAX_LEVELS:
+            return combined, level
+
+        next_chunks = chunk_judgment(combined, max_tokens=chunk_tokens)
+        if len(next_chunks) >= len(chunks):
+            return combined, level # Notes aren't shrinking; another level would not help
+        chunks = next_chunks
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from token_budget import count_tokens
+from tracing import note
+
+# --- Configuration ---
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini") # "gemini", or "fake" for offline runs and benchmarks
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash-001") # Versioned: supports cached contexts
+
+# Fake backend behaviour (all optional)
+FAKE_LATENCY = float(os.getenv("FAKE_MODEL_LATENCY", "0.5")) # Seconds before the first token
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_MODEL_TOKENS_PER_SECOND", "200")) # Output speed; 0 for instant
+FAKE_ERROR_RATE = float(os.getenv("FAKE_MODEL_ERROR_RATE", "0")) # Fraction of calls failing with a retryable 503
+FAKE_SEED = int(os.getenv("FAKE_MODEL_SEED", "0"))
+
+FAKE_WORDS = (
+    "the court held that appellant respondent evidence section act judgment appeal high trial conviction "
+    "sentence principle reasoning facts issue constitution article witness prosecution order decree"
+).split()
+
+
+# --- Backend Base ---
+class ModelBackend:
+    """
+    Interface the pipeline calls models through. generate() returns the full response text and
+    generate_stream() yields it in pieces; both raise on errors. Subclasses call _record() once
+    per call so usage() can report calls, errors and token counts.
+
+    Backends with supports_context_cache can also hold a large text (a judgment) server-side:
+    create_context() uploads it once and returns a handle, and passing that handle as context
+    to generate() or generate_stream() puts the text before the prompt without sending it again.
+    """
+
+    name = "model"
+    supports_context_cache = False
+
+    def __init__(self):
+        self._usage = {"calls": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    def generate(self, prompt, timeout=None, response_schema=None, context=None):
+        """Returns the response text for prompt; response_schema requests JSON matching that schema."""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt, timeout=None, context=None):
+        """Yields the response text for prompt in pieces as it is generated."""
+        raise NotImplementedError
+
+    def create_context(self, contents, ttl_seconds):
+        """Stores contents server-side for ttl_seconds and returns a handle for the context argument."""
+        raise NotImplementedError(f"The {self.name} backend does not support context caching.")
+
+    def delete_context(self, handle):
+        """Deletes a context made by create_context before it expires."""
+        raise NotImplementedError(f"The {self.name} backend does not support context caching.")
+
+    def _record(self, input_tokens=0, output_tokens=0, error=False, cached_tokens=0):
+        """Counts one call; input_tokens excludes cached_tokens, the cached-context tokens it reused."""
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["errors"] += int(error)
+            self._usage["input_tokens"] += input_tokens
+            self._usage["output_tokens"] += output_tokens
+            self._usage["cached_tokens"] += cached_tokens
+        # Also count the call against the traced stage making it, if any
+        note("model_calls")
+        note("model_errors", int(error))
+        note("input_tokens", input_tokens)
+        note("output_tokens", output_tokens)
+        note("cached_tokens", cached_tokens)
+
+    def usage(self):
+        """Returns {"calls", "errors", "input_tokens", "output_tokens", "cached_tokens"} since the backend was created."""
+        with self._usage_lock:
+            return dict(self._usage)
+
+
+# --- Gemini ---
+class GeminiBackend(ModelBackend):
+    """
+    Google Gemini via google.generativeai. The API key is read and the client created on the
+    first call, so importing the pipeline works without GOOGLE_API_KEY.
+    Contexts are Gemini cached contents; the model must support them (e.g. a versioned model
+    such as the default gemini-2.0-flash-001), otherwise create_context raises and callers send
+    text inline.
+    """
+
+    supports_context_cache = True
+
+    def __init__(self, model_name=GEMINI_MODEL_NAME, api_key=None):
+        super().__init__()
+        self.name = model_name
+        self._api_key = api_key
+        self._model = None
+        self._context_models = {} # Cached-content name -> model bound to it
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                api_key = self._api_key or os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+                genai.configure(api_key=api_key)
+                self._model = genai.GenerativeModel(self.name)
+            return self._model
+
+    def _request_options(self, timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def _model_for(self, context):
+        if context is None:
+            return self._get_model()
+        with self._lock:
+            model = self._context_models.get(context)
+        if model is None:
+            raise ValueError(f"Unknown or deleted cached context: {context}")
+        return model
+
+    def _usage_tokens(self, response, prompt, text):
+        """Returns (input tokens excluding cached ones, output tokens, cached tokens)."""
+        usage = getattr(response, "usage_metadata", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+        input_tokens = (getattr(usage, "prompt_token_count", 0) or 0) - cached_tokens or count_tokens(prompt)
+        output_tokens = getattr(usage, "candidates_token_count", 0) or count_tokens(text)
+        return input_tokens, output_tokens, cached_tokens
+
+    def create_context(self, contents, ttl_seconds):
+        import datetime
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        self._get_model() # Configures the API key
+        try:
+            cached = caching.CachedContent.create(model=self.name, contents=[contents],
+                                                  ttl=datetime.timedelta(seconds=ttl_seconds))
+        except Exception:
+            self._record(count_tokens(contents), error=True)
+            raise
+        usage = getattr(cached, "usage_metadata", None)
+        self._record(getattr(usage, "total_token_count", 0) or count_tokens(contents))
+        with self._lock:
+            self._context_models[cached.name] = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        return cached.name
+
+    def delete_context(self, handle):
+        from google.generativeai import caching
+
+        with self._lock:
+            self._context_models.pop(handle, None)
+        caching.CachedContent.get(handle).delete()
+
+    def generate(self, prompt, timeout=None, response_schema=None, context=None):
+        generation_config = None
+        if response_schema is not None:
+            generation_config = {"response_mime_type": "application/json", "response_schema": response_schema}
+        try:
+            response = self._model_for(context).generate_content(
+                prompt, generation_config=generation_config, request_options=self._request_options(timeout)
+            )
+            text = response.text
+        except Exception:
+            self._record(count_tokens(prompt), error=True)
+            raise
+        self._record(*self._usage_tokens(response, prompt, text))
+        return text
+
+    def generate_stream(self, prompt, timeout=None, context=None):
+        parts = []
+        response = None
+        try:
+            response = self._model_for(context).generate_content(
+                prompt, stream=True, request_options=self._request_options(timeout)
+            )
+            for chunk in response:
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    continue # A chunk carrying only metadata or a finish reason has no text
+                if piece:
+                    parts.append(piece)
+                    yield piece
+        except Exception:
+            self._record(count_tokens(prompt), count_tokens("".join(parts)), error=True)
+            raise
+        self._record(*self._usage_tokens(response, prompt, "".join(parts)))
+
+
+# --- Deterministic Local Fake ---
+class FakeBackendError(Exception):
+    """Simulated API error; code 503 makes model_runner.is_retryable_error treat it like the real thing."""
+    code = 503
+
+
+class FakeContextNotFound(Exception):
+    """Raised for an expired or deleted fake context, like the 404 Gemini returns; not retryable."""
+    code = 404
+
+
+class FakeBackend(ModelBackend):
+    """
+    Offline stand-in for load tests, profiling and CI benchmarks. The same prompt always gets the
+    same response: "YES" for the judgment check, '**Heading:**' fields for the key-info prompt,
+    schema-shaped JSON when a response_schema is given, and filler prose otherwise.
+    Latency is latency seconds to the first token plus output tokens / tokens_per_second, and
+    error_rate of calls fail with a retryable 503 error (drawn from a seeded generator).
+    Contexts are kept in memory until their TTL runs out; a call with a context answers as if
+    the context text came first in the prompt, but only counts the prompt as input tokens.
+    """
+
+    supports_context_cache = True
+
+    def __init__(self, latency=FAKE_LATENCY, tokens_per_second=FAKE_TOKENS_PER_SECOND,
+                 error_rate=FAKE_ERROR_RATE, seed=FAKE_SEED, output_words=180):
+        super().__init__()
+        self.name = "fake"
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.output_words = output_words
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._contexts = {} # handle -> (contents, expiry time)
+        self._contexts_lock = threading.Lock()
+
+    def _maybe_fail(self, prompt):
+        with self._random_lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            self._record(count_tokens(prompt), error=True)
+            raise FakeBackendError("Fake backend: simulated 503 Service Unavailable")
+
+    def _sleep_for_tokens(self, tokens):
+        if self.tokens_per_second > 0:
+            time.sleep(tokens / self.tokens_per_second)
+
+    def create_context(self, contents, ttl_seconds):
+        time.sleep(self.latency)
+        self._maybe_fail(contents)
+        handle = f"fake-context-{hashlib.sha256(contents.encode('utf-8')).hexdigest()[:12]}-{time.monotonic_ns()}"
+        with self._contexts_lock:
+            self._contexts[handle] = (contents, time.monotonic() + ttl_seconds)
+        self._record(count_tokens(contents))
+        return handle
+
+    def delete_context(self, handle):
+        with self._contexts_lock:
+            self._contexts.pop(handle, None)
+
+    def _context_text(self, context):
+        """Returns the text of a live context ("" for none); raises FakeContextNotFound for a stale handle."""
+        if context is None:
+            return ""
+        with self._contexts_lock:
+            contents, expires = self._contexts.get(context, (None, 0))
+            if contents is None or expires < time.monotonic():
+                self._contexts.pop(context, None)
+                raise FakeContextNotFound(f"Fake backend: cached content {context} not found (404)")
+        return contents
+
+    def generate(self, prompt, timeout=None, response_schema=None, context=None):
+        time.sleep(self.latency)
+        context_text = self._context_text(context)
+        self._maybe_fail(prompt)
+        text = fake_response(context_text + prompt, response_schema, self.output_words)
+        self._sleep_for_tokens(count_tokens(text))
+        self._record(count_tokens(prompt), count_tokens(text),
+                     cached_tokens=count_tokens(context_text) if context_text else 0)
+        return text
+
+    def generate_stream(self, prompt, timeout=None, context=None):
+        time.sleep(self.latency)
+        context_text = self._context_text(context)
+        self._maybe_fail(prompt)
+        text = fake_response(context_text + prompt, None, self.output_words)
+        words = text.split(" ")
+        for start in range(0, len(words), 8):
+            piece = " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+            self._sleep_for_tokens(count_tokens(piece))
+            yield piece
+        self._record(count_tokens(prompt), count_tokens(text),
+                     cached_tokens=count_tokens(context_text) if context_text else 0)
+
+
+HEADING = re.compile(r"^\s*\*\*([^*\n]+?):?\*\*", re.MULTILINE)
+
+
+def _filler(seed_text, words):
+    rng = random.Random(hashlib.sha256(seed_text.encode("utf-8")).digest())
+    return " ".join(rng.choice(FAKE_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _fake_value(schema, name, seed_text):
+    kind = str(schema.get("type", "string")).lower()
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), f"{name} {i}", seed_text) for i in range(1, 3)]
+    if kind == "object":
+        return {key: _fake_value(value, key, seed_text) for key, value in schema.get("properties", {}).items()}
+    return _filler(seed_text + name, 40 if name == "summary" else 8)
+
+
+def fake_response(prompt, response_schema=None, output_words=180):
+    """Deterministic response text for prompt, shaped like what the pipeline's prompts ask for."""
+    if response_schema is not None:
+        return json.dumps(_fake_value(response_schema, "", prompt))
+    if 'Respond with ONLY "YES"' in prompt:
+        return "YES"
+    headings = HEADING.findall(prompt)
+    if headings:
+        return "\n\n".join(f"**{heading.strip()}:**\n{_filler(prompt + heading, 12)}" for heading in headings)
+    return _filler(prompt, output_words)
+
+
+# --- Backend Selection ---
+def get_backend(name=MODEL_BACKEND):
+    """Returns a new backend by name: "gemini" (default) or "fake"."""
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown MODEL_BACKEND '{name}'. Expected 'gemini' or 'fake'.")
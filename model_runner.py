@@ -0,0 +1,234 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import in_current_context, note
+
+# --- Configuration ---
+DEFAULT_CALL_TIMEOUT = 120 # Seconds to wait for a single model call before giving up on it
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504} # Quota exhausted and transient server errors
+
+
+# --- Concurrent Model Calls ---
+def run_concurrently(calls, timeout=DEFAULT_CALL_TIMEOUT, max_workers=None):
+    """
+    Runs independent model calls in a thread pool and yields (name, result, error)
+    for each call as soon as it finishes, so callers can show results in completion order.
+
+    calls maps a name to a zero-argument callable. A call that raises is yielded with
+    its exception as error. Calls still running after `timeout` seconds are cancelled
+    (or abandoned, if already started) and yielded with a TimeoutError, so one stuck
+    call never blocks the others.
+    """
+    if not calls:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(calls))
+    futures = {executor.submit(in_current_context(fn)): name for name, fn in calls.items()} # Calls continue the caller's trace
+    pending = set(futures)
+    deadline = time.monotonic() + timeout
+
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+        for future in pending:
+            future.cancel()
+            yield futures[future], None, TimeoutError(f"'{futures[future]}' did not finish within {timeout} seconds")
+    finally:
+        # Don't wait for abandoned calls; their threads finish (or time out) on their own
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_concurrently(calls, timeout=DEFAULT_CALL_TIMEOUT, max_workers=None, poll_interval=0.05):
+    """
+    Like run_concurrently, for calls that stream their output. Each callable takes an
+    on_text(text_so_far) argument; this yields (name, text_so_far, None, False) from the
+    calling thread as partial text arrives (at most one update per call every poll_interval
+    seconds, so a UI can redraw it), then (name, result, error, True) when the call finishes.
+    """
+    if not calls:
+        return
+
+    updates = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(calls))
+    futures = {
+        executor.submit(in_current_context(fn), lambda text, name=name: updates.put((name, text))): name
+        for name, fn in calls.items()
+    }
+    pending = set(futures)
+    finished = set()
+    deadline = time.monotonic() + timeout
+
+    def drain():
+        latest = {}
+        while True:
+            try:
+                name, text = updates.get_nowait()
+            except queue.Empty:
+                return latest
+            if name not in finished:
+                latest[name] = text # Only the newest text per call is worth drawing
+
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=min(poll_interval, remaining), return_when=FIRST_COMPLETED)
+            for name, text in drain().items():
+                yield name, text, None, False
+            for future in done:
+                finished.add(futures[future])
+                try:
+                    yield futures[future], future.result(), None, True
+                except Exception as e:
+                    yield futures[future], None, e, True
+
+        for future in pending:
+            future.cancel()
+            yield futures[future], None, TimeoutError(f"'{futures[future]}' did not finish within {timeout} seconds"), True
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Streaming Responses and Latency ---
+def collect_stream(pieces, on_text=None, started=None):
+    """
+    Joins the text pieces of a streamed model response, calling on_text(text_so_far) after each one.
+    Returns (text, time to first token, total latency), both in seconds since `started`
+    (a time.perf_counter() value, default now). Raises ValueError if no text came back.
+    """
+    started = time.perf_counter() if started is None else started
+    parts = []
+    first_token = None
+    for piece in pieces:
+        if not piece:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+        parts.append(piece)
+        if on_text:
+            on_text("".join(parts))
+    if not parts:
+        raise ValueError("The model returned no text")
+    return "".join(parts), first_token, time.perf_counter() - started
+
+
+class LatencyRecorder:
+    """Thread-safe record of time-to-first-token and total latency for each kind of model call."""
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, task, time_to_first_token, total_latency):
+        """Adds one call's timings (in seconds) under task."""
+        with self._lock:
+            self._samples.setdefault(task, []).append((time_to_first_token, total_latency))
+
+    def stats(self):
+        """Returns {task: {"calls", "avg_time_to_first_token", "avg_total_latency", "max_total_latency"}}."""
+        with self._lock:
+            return {
+                task: {
+                    "calls": len(samples),
+                    "avg_time_to_first_token": sum(first for first, _ in samples) / len(samples),
+                    "avg_total_latency": sum(total for _, total in samples) / len(samples),
+                    "max_total_latency": max(total for _, total in samples),
+                }
+                for task, samples in self._samples.items()
+            }
+
+
+# --- Rate Limiting ---
+class RateLimiter:
+    """
+    Thread-safe token-bucket limiter for requests-per-minute and tokens-per-minute quotas.
+    acquire() blocks until both buckets can cover the request, so concurrent callers
+    together never exceed either quota.
+    """
+
+    def __init__(self, rpm, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm) if tpm else 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def try_acquire(self, tokens=0):
+        """
+        Reserves one request carrying `tokens` tokens if both quotas can cover it now.
+        Returns 0 if it was reserved, otherwise the seconds to wait before it could be.
+        """
+        if self.tpm:
+            tokens = min(tokens, self.tpm) # A single oversized request would otherwise wait forever
+        with self._lock:
+            self._refill()
+            request_wait = (1 - self._requests) * 60.0 / self.rpm if self._requests < 1 else 0.0
+            token_wait = 0.0
+            if self.tpm and self._tokens < tokens:
+                token_wait = (tokens - self._tokens) * 60.0 / self.tpm
+            if request_wait <= 0 and token_wait <= 0:
+                self._requests -= 1
+                if self.tpm:
+                    self._tokens -= tokens
+                return 0.0
+            return max(request_wait, token_wait)
+
+    def acquire(self, tokens=0):
+        """Waits until one request carrying `tokens` tokens fits in both quotas, then reserves it."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+# --- Retries ---
+def is_retryable_error(error):
+    """True for rate-limit (429) and transient server (5xx) errors, plus timeouts and dropped connections."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) # google.api_core exceptions carry the HTTP status here
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def call_with_backoff(fn, max_retries=5, base_delay=2.0, max_delay=60.0):
+    """
+    Calls fn(), retrying retryable errors with exponential backoff and jitter.
+    Non-retryable errors, and the last error once retries run out, are re-raised.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_retryable_error(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            delay = delay / 2 + random.uniform(0, delay / 2) # Jitter so parallel workers don't retry in lockstep
+            print(f"Retryable model error ({e}); retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            note("retries")
+            time.sleep(delay)
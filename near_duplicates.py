@@ -0,0 +1,216 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+# NumPy is imported where signatures are computed, so importing this module stays cheap for the web app
+
+# --- Configuration ---
+INDEX_PATH = os.getenv("NEAR_DUPLICATE_INDEX_PATH", os.path.join(".cache", "near_duplicates.sqlite3"))
+SIMILARITY_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8")) # Estimated Jaccard similarity of shingles
+MIN_LENGTH_RATIO = 0.5 # Texts whose word counts differ more than this (e.g. a judgment and a digest quoting it) never match
+SHINGLE_WORDS = 5 # Word 5-grams: long enough that unrelated judgments share few, short enough to survive edits
+NUM_PERMUTATIONS = 128
+BANDS = 32 # 32 bands of 4 rows: copies above 0.7 similarity share a bucket with probability over 99.9%
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SIGNATURE_VERSION = "minhash-v1" # Bump when shingling or hashing changes; older signatures are then ignored
+
+MERSENNE_PRIME = (1 << 61) - 1
+WORD = re.compile(r"\w+")
+
+_PERMUTATIONS = None
+
+
+# --- MinHash Signatures ---
+def _permutations():
+    """The (a, b) coefficients of the NUM_PERMUTATIONS hash functions, drawn once from a fixed seed."""
+    global _PERMUTATIONS
+    if _PERMUTATIONS is None:
+        import numpy as np
+        rng = np.random.default_rng(20240601)
+        a = rng.integers(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+        b = rng.integers(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+        _PERMUTATIONS = (a, b)
+    return _PERMUTATIONS
+
+
+def text_words(text):
+    """
+    The text's words, lower-cased. Shingles are built from these, so layout, punctuation and
+    page furniture from different PDF renderings of a judgment don't change them.
+    """
+    return WORD.findall(text.lower())
+
+
+def shingle_hashes(words):
+    """Returns the distinct 32-bit hashes of the SHINGLE_WORDS-grams of text_words() as a NumPy array."""
+    import numpy as np
+
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if len(words) < SHINGLE_WORDS:
+        return np.unique(word_hashes)
+    # Combine each run of consecutive word hashes polynomially (wrapping at 64 bits), then keep 32 bits
+    count = len(words) - SHINGLE_WORDS + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        shingles = shingles * np.uint64(1000003) + word_hashes[offset:offset + count]
+    return np.unique(shingles % np.uint64(MERSENNE_PRIME) & np.uint64(0xFFFFFFFF))
+
+
+def minhash_signature(shingles, block_size=8192):
+    """
+    Returns the MinHash signature of a shingle_hashes() array: for each of NUM_PERMUTATIONS hash
+    functions, the minimum hash over all shingles, as a uint32 array. Two signatures agree in
+    about the same fraction of positions as the Jaccard similarity of the texts' shingle sets.
+    Shingles are processed in blocks so a very long judgment doesn't need a huge temporary matrix.
+    """
+    import numpy as np
+
+    a, b = _permutations()
+    signature = np.full(NUM_PERMUTATIONS, 0xFFFFFFFF, dtype=np.uint64)
+    for start in range(0, len(shingles), block_size):
+        block = shingles[start:start + block_size, None]
+        hashed = ((block * a + b) % np.uint64(MERSENNE_PRIME)) & np.uint64(0xFFFFFFFF)
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def signature_similarity(first, second):
+    """Estimated Jaccard similarity of two signatures: the fraction of positions where they agree."""
+    return float((first == second).mean())
+
+
+def band_keys(signature):
+    """
+    Returns the LSH bucket key of each band of the signature. Keys include the band number, so
+    one indexed integer column holds every band, and fit in SQLite's signed 64-bit integers.
+    """
+    data = signature.tobytes()
+    band_bytes = ROWS_PER_BAND * 4
+    return [
+        int.from_bytes(hashlib.blake2b(bytes([band]) + data[band * band_bytes:(band + 1) * band_bytes],
+                                       digest_size=8).digest(), "big") >> 1
+        for band in range(BANDS)
+    ]
+
+
+# --- Persistent LSH Index ---
+class NearDuplicateIndex:
+    """
+    Persistent MinHash/LSH index of judgment texts, for spotting the same judgment in another
+    PDF (reportable and non-reportable versions, different reporters, re-uploads).
+    Each document's signature is stored with its BANDS bucket keys in SQLite, so adding one is
+    a few inserts and a lookup is one indexed query for the candidates sharing a bucket,
+    whatever the size of the corpus; candidates are confirmed by comparing signatures.
+    Every near-duplicate points at the first copy indexed (its canonical copy).
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=INDEX_PATH, threshold=SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # No fsync per add; the index can always be rebuilt from the texts
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_hash TEXT PRIMARY KEY,
+                name TEXT,
+                canonical_hash TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                words INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                added_at REAL NOT NULL
+            )
+            """
+        )
+        # Clustered by bucket, so finding the candidates of a signature is BANDS short range scans
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER NOT NULL, doc_hash TEXT NOT NULL, "
+            "PRIMARY KEY (bucket, doc_hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def _best_match(self, signature, length, keys, exclude=None):
+        """Returns the most similar indexed document at or above the threshold, or None."""
+        import numpy as np
+
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT d.doc_hash, d.name, d.canonical_hash, d.signature, d.words FROM documents d "
+            f"WHERE d.version = ? AND d.doc_hash IN (SELECT doc_hash FROM buckets WHERE bucket IN ({placeholders}))",
+            (SIGNATURE_VERSION, *keys),
+        ).fetchall()
+        best = None
+        for doc_hash, name, canonical_hash, blob, words in rows:
+            if doc_hash == exclude or min(length, words) < MIN_LENGTH_RATIO * max(length, words):
+                continue
+            similarity = signature_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"doc_hash": doc_hash, "name": name, "canonical_hash": canonical_hash, "similarity": similarity}
+        return best
+
+    def find(self, text, exclude=None):
+        """
+        Returns the closest near-duplicate of text already in the index, as
+        {"doc_hash", "name", "canonical_hash", "similarity"}, or None.
+        exclude skips one document hash, e.g. the document's own.
+        """
+        words = text_words(text)
+        return self.find_signature(minhash_signature(shingle_hashes(words)), len(words), exclude)
+
+    def find_signature(self, signature, length, exclude=None):
+        """find() for a precomputed signature of a text of length words."""
+        with self._lock:
+            return self._best_match(signature, length, band_keys(signature), exclude)
+
+    def add(self, doc_hash, text, name=None):
+        """
+        Indexes a document (if it isn't already) and returns its closest earlier near-duplicate
+        as find() does, or None. A near-duplicate is recorded under the match's canonical copy.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canonical_hash FROM documents WHERE doc_hash = ? AND version = ?", (doc_hash, SIGNATURE_VERSION)
+            ).fetchone()
+        if row is not None and row[0] == doc_hash:
+            return None # Already indexed as a canonical copy
+        words = text_words(text)
+        return self.add_signature(doc_hash, minhash_signature(shingle_hashes(words)), len(words), name)
+
+    def add_signature(self, doc_hash, signature, length, name=None):
+        """add() for a precomputed signature of a text of length words."""
+        keys = band_keys(signature)
+        with self._lock:
+            match = self._best_match(signature, length, keys, exclude=doc_hash)
+            row = self._conn.execute(
+                "SELECT 1 FROM documents WHERE doc_hash = ? AND version = ?", (doc_hash, SIGNATURE_VERSION)
+            ).fetchone()
+            if row is None:
+                canonical_hash = match["canonical_hash"] if match else doc_hash
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_hash, name, canonical_hash, signature, words, version, "
+                    "added_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_hash, name, canonical_hash, signature.tobytes(), length, SIGNATURE_VERSION, time.time()),
+                )
+                self._conn.executemany("INSERT OR IGNORE INTO buckets (bucket, doc_hash) VALUES (?, ?)",
+                                       [(key, doc_hash) for key in keys])
+                self._conn.commit()
+        return match
+
+    def count(self):
+        """Number of documents in the index."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import ResultCache, hash_bytes
+
+# --- Configuration ---
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") != "0" # Set to 0 to leave pages without a text layer empty
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract") # Local Tesseract binary (apt install tesseract-ocr)
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "eng") # Tesseract language packs, e.g. "eng+hin"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1))) # Pages recognised at once
+OCR_MIN_CHARS = 20 # A page with less text than this (e.g. only a stamp or page number) is treated as scanned
+OCR_TIMEOUT = 120 # Seconds allowed per page
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(".cache", "ocr.sqlite3"))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 64 MB
+OCR_VERSION = "tesseract-v1" # Bump when the recognition settings change so cached text is not reused
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+_warned_missing = False
+
+
+# --- Scanned Page Detection ---
+def needs_ocr(text):
+    """True if a page's extracted text is too short to be a real text layer."""
+    return len(text.strip()) < OCR_MIN_CHARS
+
+
+def ocr_available():
+    """True if OCR is enabled and the Tesseract binary is installed; warns once if it isn't."""
+    global _warned_missing
+    if not OCR_ENABLED:
+        return False
+    if shutil.which(TESSERACT_CMD) is None:
+        if not _warned_missing:
+            print(f"Some pages have no text layer, but '{TESSERACT_CMD}' was not found, so they are left empty. "
+                  "Install Tesseract (e.g. apt install tesseract-ocr) or set TESSERACT_CMD to OCR scanned judgments.")
+            _warned_missing = True
+        return False
+    return True
+
+
+def _get_cache():
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResultCache(OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES)
+        return _CACHE
+
+
+# --- Recognition ---
+def page_images(page):
+    """Returns the encoded images (PNG, JPEG, ...) drawn on a pypdf page; a scanned page is usually one."""
+    return [image.data for image in page.images]
+
+
+def ocr_image(image_bytes, languages=OCR_LANGUAGES):
+    """Recognises the text of one encoded image with the Tesseract command-line tool."""
+    result = subprocess.run(
+        [TESSERACT_CMD, "stdin", "stdout", "-l", languages],
+        input=image_bytes, capture_output=True, timeout=OCR_TIMEOUT,
+        env=dict(os.environ, OMP_THREAD_LIMIT="1"), # One core per page; pages run side by side instead
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or f"exit code {result.returncode}")
+    return result.stdout.decode("utf-8", "replace")
+
+
+def _ocr_page(images, key):
+    """Worker: OCRs the images of one page in order and caches the text under key."""
+    text = "\n".join(ocr_image(image).strip() for image in images)
+    if text:
+        text += "\n"
+    _get_cache().put(key, text)
+    return text
+
+
+def ocr_pages(pages, workers=OCR_WORKERS):
+    """
+    OCRs pages that have no text layer, given as {page_number: pypdf page}; returns
+    {page_number: text}. Each page is cached by the hash of its images, so a judgment that is
+    uploaded or processed again is never recognised twice. Pages are recognised side by side,
+    each in its own Tesseract process, while their images are read here (pypdf readers are
+    not thread-safe). Pages that fail are reported and left out.
+    """
+    cache = _get_cache()
+    texts = {}
+    pending = {}
+    for page_number, page in pages.items():
+        try:
+            images = page_images(page)
+        except Exception as e:
+            print(f"Could not read the images of page {page_number} for OCR: {e}")
+            continue
+        if not images:
+            continue
+        key = ResultCache.make_key("ocr", hash_bytes(b"".join(images)), f"{OCR_VERSION}-{OCR_LANGUAGES}", TESSERACT_CMD)
+        cached = cache.get(key)
+        if cached is not None:
+            texts[page_number] = cached
+        else:
+            pending[page_number] = (images, key)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            futures = {page_number: pool.submit(_ocr_page, images, key) for page_number, (images, key) in pending.items()}
+            for page_number, future in futures.items():
+                try:
+                    texts[page_number] = future.result()
+                except Exception as e:
+                    print(f"OCR failed for page {page_number}: {e}")
+    return texts
@@ -0,0 +1,174 @@
+import io
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from pypdf import PdfReader
+
+from ocr import OCR_WORKERS, needs_ocr, ocr_available, ocr_pages
+
+# --- Configuration ---
+PARALLEL_MIN_PAGES = 24 # Below this, handing pages to worker processes costs more than it saves
+RANGES_PER_WORKER = 2 # Smaller page ranges balance the load when some pages are much denser than others
+
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock() # The web app extracts several uploads at once from worker threads
+
+
+# --- PDF Sources ---
+@contextmanager
+def open_pdf_stream(source):
+    """
+    Yields a seekable binary stream for source without copying the document.
+    A file path is memory-mapped (PdfReader would otherwise read the whole file into
+    a new buffer); file-like objects such as Streamlit uploads are rewound and used as-is.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+    else:
+        source.seek(0)
+        yield source
+
+
+# --- Page Iteration ---
+def iter_pdf_pages(source, max_pages=None):
+    """
+    Yields (page_number, text) for each page of a PDF, parsing pages lazily.
+    source is a file path or a binary file-like object. max_pages stops after the first
+    N pages, so callers that only need the opening of a document never parse the rest.
+    Page numbers start at 1. Pages without a text layer are OCRed when Tesseract is
+    available, and yield an empty string otherwise.
+    """
+    with open_pdf_stream(source) as stream:
+        reader = PdfReader(stream)
+        page_count = len(reader.pages)
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+        yield from _iter_reader_pages(reader, page_count)
+
+
+def _iter_reader_pages(reader, page_count):
+    """
+    iter_pdf_pages() on an open reader. Runs of scanned pages are held back and recognised
+    together, up to OCR_WORKERS side by side, then yielded in page order.
+    """
+    scanned = {} # page_number -> (pypdf page, its text layer) waiting for OCR
+    counts = {"scanned": 0, "recovered": 0}
+    for index in range(page_count):
+        page = reader.pages[index]
+        text = page.extract_text() or ""
+        if needs_ocr(text) and ocr_available():
+            scanned[index + 1] = (page, text)
+            if len(scanned) >= OCR_WORKERS:
+                yield from _recognise(scanned, counts)
+                scanned = {}
+            continue
+        if scanned:
+            yield from _recognise(scanned, counts)
+            scanned = {}
+        yield index + 1, text
+    if scanned:
+        yield from _recognise(scanned, counts)
+    if counts["scanned"]:
+        print(f"OCR recovered text for {counts['recovered']} of {counts['scanned']} pages without a text layer.")
+
+
+def _recognise(scanned, counts):
+    """OCRs {page_number: (page, text layer)} and returns [(page_number, text)]; failed pages keep their text layer."""
+    recognised = ocr_pages({page_number: page for page_number, (page, _) in scanned.items()})
+    counts["scanned"] += len(scanned)
+    counts["recovered"] += len(recognised)
+    return [(page_number, recognised.get(page_number, text)) for page_number, (_, text) in scanned.items()]
+
+
+def extract_pdf_text(source, max_pages=None):
+    """
+    Returns the text of a PDF (or of its first max_pages pages), joined once at the end.
+    Pages without a text layer are OCRed (see iter_pdf_pages).
+    """
+    return "".join(text for _, text in iter_pdf_pages(source, max_pages))
+
+
+# --- OCR Fallback for Scanned Pages ---
+def fill_scanned_pages(reader, texts):
+    """
+    Replaces the text of pages that have no text layer (scanned pages) with OCR text, when a
+    local Tesseract is available. Pages with text keep the fast path. texts holds the text of
+    reader's first len(texts) pages and is updated in place and returned. Used for pages
+    extracted in worker processes; serial extraction OCRs as it goes (iter_pdf_pages).
+    """
+    scanned = [index for index, text in enumerate(texts) if needs_ocr(text)]
+    if not scanned or not ocr_available():
+        return texts
+    recognised = ocr_pages({index + 1: reader.pages[index] for index in scanned})
+    for page_number, text in recognised.items():
+        texts[page_number - 1] = text
+    print(f"OCR recovered text for {len(recognised)} of {len(scanned)} pages without a text layer.")
+    return texts
+
+
+# --- Parallel Extraction ---
+def _extract_page_range(source, start, stop):
+    """Worker: returns the texts of pages [start, stop) of a PDF given as a path or raw bytes."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with open_pdf_stream(source) as stream:
+        reader = PdfReader(stream)
+        return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def _get_pool(workers):
+    """Returns a process pool that is kept alive between documents, so startup is paid once."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            # spawn, because forking a multi-threaded server (e.g. Streamlit) is unsafe
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def extract_pdf_text_parallel(source, workers=None, max_pages=None, min_pages=PARALLEL_MIN_PAGES):
+    """
+    Returns the text of a PDF, extracting page ranges in a pool of worker processes
+    and reassembling them in page order. pypdf's text extraction is pure Python,
+    so this scales with CPU cores on long judgments.
+
+    Documents shorter than min_pages, or workers <= 1, use serial extraction instead.
+    Must not be called from inside a worker process (e.g. the CLI's batch mode).
+    """
+    return "".join(extract_pdf_pages_parallel(source, workers, max_pages, min_pages))
+
+
+def extract_pdf_pages_parallel(source, workers=None, max_pages=None, min_pages=PARALLEL_MIN_PAGES):
+    """extract_pdf_text_parallel(), returning the text of each page instead of joining them."""
+    workers = workers or os.cpu_count() or 1
+    with open_pdf_stream(source) as stream:
+        reader = PdfReader(stream)
+        page_count = len(reader.pages)
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+        if workers <= 1 or page_count < min_pages:
+            return [text for _, text in _iter_reader_pages(reader, page_count)]
+
+    # Paths are re-opened by each worker; uploads have to be sent over as bytes
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+        source = source.read()
+
+    range_count = min(page_count, workers * RANGES_PER_WORKER)
+    bounds = [page_count * i // range_count for i in range(range_count + 1)]
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_page_range, source, bounds[i], bounds[i + 1]) for i in range(range_count)]
+    texts = [text for future in futures for text in future.result()]
+    if any(needs_ocr(text) for text in texts):
+        with open_pdf_stream(io.BytesIO(source) if isinstance(source, bytes) else source) as stream:
+            fill_scanned_pages(PdfReader(stream), texts)
+    return texts
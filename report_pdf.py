@@ -0,0 +1,168 @@
+import functools
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from structured_analysis import KEY_INFO_FIELDS, format_field_value
+from tracing import traced
+
+# reportlab takes over 100 ms to import, so it is imported on first use rather than with this module;
+# the web app only needs it when a report is downloaded.
+
+
+# --- Report Styles ---
+@functools.lru_cache(maxsize=1)
+def report_styles():
+    """Returns the report's paragraph styles by name, building them (and the sample style sheet) once."""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=1,  # Center alignment
+            spaceAfter=20
+        ),
+        'subtitle': ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            alignment=1,  # Center alignment
+            spaceAfter=30
+        ),
+        'section_header': ParagraphStyle(
+            'SectionHeader',
+            parent=styles['Heading2'],
+            fontSize=12,
+            spaceAfter=10
+        ),
+        'normal': ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=6,
+            leftIndent=0,
+            rightIndent=0
+        ),
+        'bold': ParagraphStyle(
+            'CustomBold',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=6,
+            fontName='Helvetica-Bold'
+        ),
+    }
+
+
+# --- Markdown to Flowables ---
+def markdown_to_flowables(markdown_text, styles):
+    """
+    Converts key-information markdown to report paragraphs in one pass over its lines: a
+    '**Heading:**' line becomes a bold paragraph and any other line a normal one with its
+    '*' emphasis marks removed. Text is escaped, so '<' and '&' print as written.
+    """
+    from reportlab.platypus import Paragraph
+
+    flowables = []
+    for line in markdown_text.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if (line.startswith('**') and line.endswith('**')) or ('**' in line and stripped.endswith(':')):
+            text, style = stripped.replace('**', '').strip(), styles['bold']
+        else:
+            text, style = stripped.replace('*', '').strip(), styles['normal']
+        if text:
+            flowables.append(Paragraph(escape(text), style))
+    return flowables
+
+
+# --- PDF Generation Function (Using ReportLab) ---
+def _report_text_size(args, kwargs):
+    """Characters of summary and key-information text going into a report (for tracing)."""
+    return sum(len(text) for text in args[:2] if isinstance(text, str))
+
+
+def report_content(summary_text, key_info_markdown, judgment_file_name="judgment_analysis", key_info_fields=None):
+    """
+    Returns the report's flowables. When key_info_fields (parsed from a combined analysis) is
+    given, it is rendered directly instead of re-parsing key_info_markdown.
+    """
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = report_styles()
+    content = [
+        Paragraph("Legal Judgment Analysis", styles['title']),
+        Paragraph(escape(f"Analysis for: {judgment_file_name.replace('.pdf', '')}"), styles['subtitle']),
+        Paragraph("Summary", styles['section_header']),
+    ]
+
+    if summary_text:
+        # Split summary into paragraphs and add each one
+        for paragraph in summary_text.split('\n'):
+            if paragraph.strip():
+                content.append(Paragraph(escape(paragraph.strip()), styles['normal']))
+
+    content.append(Spacer(1, 20))
+    content.append(Paragraph("Key Information", styles['section_header']))
+
+    if key_info_fields:
+        for field, heading, _ in KEY_INFO_FIELDS:
+            content.append(Paragraph(escape(f"{heading}:"), styles['bold']))
+            for line in format_field_value(key_info_fields[field]).split('\n'):
+                if line.strip():
+                    content.append(Paragraph(escape(line.strip()), styles['normal']))
+    elif key_info_markdown:
+        content.extend(markdown_to_flowables(key_info_markdown, styles))
+    return content
+
+
+def write_pdf_report(output, summary_text, key_info_markdown, judgment_file_name="judgment_analysis", key_info_fields=None):
+    """
+    Renders the report straight into output: a file path, or a writable binary stream such as
+    an open file or an HTTP response, so no copy of the PDF is held in memory.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(output, pagesize=letter, topMargin=0.75*inch)
+    doc.build(report_content(summary_text, key_info_markdown, judgment_file_name, key_info_fields))
+
+
+@traced("pdf", measure_input=_report_text_size)
+def generate_pdf_output(summary_text, key_info_markdown, judgment_file_name="judgment_analysis", key_info_fields=None):
+    """Returns the report as PDF bytes (see write_pdf_report to write it to a file or stream instead)."""
+    buffer = io.BytesIO()
+    write_pdf_report(buffer, summary_text, key_info_markdown, judgment_file_name, key_info_fields)
+    return buffer.getvalue()
+
+
+# --- Batch Rendering ---
+def _render_report_job(job):
+    """Worker: writes one report job and returns (output_path, error message or None)."""
+    try:
+        write_pdf_report(job["output_path"], job["summary"], job["key_info"], job["judgment_file_name"],
+                         job.get("key_info_fields"))
+        return job["output_path"], None
+    except Exception as e:
+        return job["output_path"], str(e)
+
+
+def render_reports(jobs, workers=None):
+    """
+    Writes many reports, each job a dict with output_path, summary, key_info, judgment_file_name
+    and optionally key_info_fields. Reports are laid out by pure-Python ReportLab code, so
+    they are rendered in a pool of worker processes (each building the styles once), in
+    batches to keep the hand-off cheap. Returns [(output_path, error or None)] in job order.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [_render_report_job(job) for job in jobs]
+    # spawn, as in pdf_text, because forking a multi-threaded process is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_render_report_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
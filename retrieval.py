@@ -0,0 +1,193 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from token_budget import count_tokens
+
+# --- Configuration ---
+RETRIEVAL_CACHE_DIR = os.getenv("RETRIEVAL_CACHE_DIR", os.path.join(".cache", "chunk_vectors"))
+RETRIEVAL_VERSION = "bm25-v1" # Bump when tokenization or weighting changes, so saved vectors are rebuilt
+DEFAULT_RETRIEVAL_TOKENS = 20000 # Budget per prompt; about 8 chunks of 2,500 tokens
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "been", "by", "for", "from", "had", "has", "have", "he", "her",
+    "his", "in", "is", "it", "its", "of", "on", "or", "that", "the", "their", "this", "to", "was", "were",
+    "which", "with",
+}
+
+# Cue words for the parts of a judgment each prompt needs. Chunks are ranked against each field
+# separately and the selection alternates between fields, so no single field crowds out the rest.
+FIELD_QUERIES = {
+    "facts": "facts prosecution case incident complainant fir deceased accused occurred informant "
+             "witness evidence recovered investigation trial court high court",
+    "issues": "issue issues question questions consideration whether contention contentions submitted "
+              "submission argued learned counsel appellant respondent",
+    "holding": "appeal appeals allowed dismissed set aside quashed upheld affirmed acquitted commuted "
+               "succeeds hereby stand partly accordingly disposed pending costs directed conclusion",
+    "reasoning": "held hold view opinion reason reasons reasoning principle settled law precedent "
+                 "observed considered therefore satisfied finding findings",
+    "statutes": "section sections article articles act code constitution provision rule ipc crpc cpc "
+                "penal procedure evidence",
+}
+# Which fields each prompt draws its chunks for
+PROMPT_FIELDS = {
+    "summary": ("facts", "issues", "holding", "reasoning"),
+    "key_info": ("facts", "issues", "holding", "reasoning", "statutes"),
+}
+
+
+# --- Tokenization ---
+def tokenize(text):
+    """Lower-cased words and numbers without stopwords, with a plural 's' stripped ('sections' -> 'section')."""
+    terms = []
+    for term in TOKEN.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 4 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+# --- BM25 Chunk Vectors ---
+class ChunkVectors:
+    """
+    Sparse BM25 term weights for the chunks of one judgment, stored as parallel NumPy arrays
+    (chunk id, term id, weight) so a query is scored with one vectorized pass over the non-zeros.
+    """
+
+    def __init__(self, vocabulary, chunk_ids, term_ids, weights, num_chunks):
+        self.vocabulary = vocabulary # term -> term id
+        self.chunk_ids = chunk_ids
+        self.term_ids = term_ids
+        self.weights = weights
+        self.num_chunks = num_chunks
+
+    @classmethod
+    def build(cls, chunks):
+        """Computes BM25 weights for every (chunk, term) pair that occurs in chunks."""
+        vocabulary = {}
+        chunk_ids, term_ids, counts = [], [], []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk)
+            lengths[chunk_id] = len(terms)
+            for term, count in Counter(terms).items():
+                chunk_ids.append(chunk_id)
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                counts.append(count)
+
+        chunk_ids = np.array(chunk_ids, dtype=np.int32)
+        term_ids = np.array(term_ids, dtype=np.int32)
+        counts = np.array(counts, dtype=np.float32)
+        document_frequency = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+        length_norm = 1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()) if len(chunks) else 0.0, 1.0)
+        weights = idf[term_ids] * counts * (BM25_K1 + 1) / (counts + BM25_K1 * length_norm[chunk_ids])
+        return cls(vocabulary, chunk_ids, term_ids, weights.astype(np.float32), len(chunks))
+
+    def score(self, query):
+        """Returns an array with the BM25 score of every chunk for query."""
+        query_ids = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not query_ids:
+            return np.zeros(self.num_chunks, dtype=np.float32)
+        mask = np.isin(self.term_ids, query_ids)
+        return np.bincount(self.chunk_ids[mask], weights=self.weights[mask], minlength=self.num_chunks)
+
+    def save(self, path):
+        """Writes the vectors to a compressed .npz file."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        vocabulary = np.array(sorted(self.vocabulary, key=self.vocabulary.get))
+        np.savez_compressed(path, vocabulary=vocabulary, chunk_ids=self.chunk_ids, term_ids=self.term_ids,
+                            weights=self.weights, num_chunks=np.array(self.num_chunks))
+
+    @classmethod
+    def load(cls, path):
+        """Reads vectors written by save()."""
+        with np.load(path) as data:
+            vocabulary = {str(term): term_id for term_id, term in enumerate(data["vocabulary"])}
+            return cls(vocabulary, data["chunk_ids"], data["term_ids"], data["weights"], int(data["num_chunks"]))
+
+
+def load_or_build_vectors(chunks, cache_key, cache_dir=RETRIEVAL_CACHE_DIR):
+    """
+    Returns ChunkVectors for chunks, reusing the copy saved under cache_key (e.g. the PDF hash
+    plus the chunk size) when it exists, and saving newly built vectors for next time.
+    """
+    path = os.path.join(cache_dir, f"{cache_key}-{RETRIEVAL_VERSION}.npz")
+    if os.path.exists(path):
+        try:
+            vectors = ChunkVectors.load(path)
+            if vectors.num_chunks == len(chunks):
+                return vectors
+        except Exception as e:
+            print(f"Ignoring unreadable chunk vectors {path}: {e}")
+    vectors = ChunkVectors.build(chunks)
+    try:
+        vectors.save(path)
+    except OSError as e:
+        print(f"Could not save chunk vectors to {path}: {e}")
+    return vectors
+
+
+# --- Chunk Selection ---
+def select_relevant_chunks(chunks, vectors, fields, max_tokens=DEFAULT_RETRIEVAL_TOKENS, keep=(0, -1)):
+    """
+    Returns the indices (in document order) of the chunks to send for a prompt needing `fields`.
+    The chunks in `keep` (by default the first, with the court and parties, and the last, with the
+    final order) come first; then each field in turn adds its best-scoring remaining chunk until
+    max_tokens is reached. Chunks that score zero for a field are never added for it.
+    """
+    if not chunks:
+        return []
+
+    chosen = set()
+    used_tokens = 0
+    for index in keep:
+        index = index % len(chunks)
+        if index not in chosen and used_tokens + count_tokens(chunks[index]) <= max_tokens:
+            chosen.add(index)
+            used_tokens += count_tokens(chunks[index])
+
+    rankings = []
+    for field in fields:
+        scores = vectors.score(FIELD_QUERIES[field])
+        order = np.argsort(-scores, kind="stable")
+        rankings.append([int(index) for index in order if scores[index] > 0])
+
+    positions = [0] * len(rankings)
+    advanced = True
+    while advanced:
+        advanced = False
+        for r, ranking in enumerate(rankings):
+            while positions[r] < len(ranking) and ranking[positions[r]] in chosen:
+                positions[r] += 1
+            if positions[r] >= len(ranking):
+                continue
+            index = ranking[positions[r]]
+            positions[r] += 1
+            advanced = True
+            tokens = count_tokens(chunks[index])
+            if used_tokens + tokens <= max_tokens:
+                chosen.add(index)
+                used_tokens += tokens
+    return sorted(chosen)
+
+
+def join_selected(chunks, indices):
+    """Joins the selected chunks, marking each gap where chunks were left out with '[...]'."""
+    parts = []
+    previous = None
+    for index in indices:
+        if previous is not None and index != previous + 1:
+            parts.append("\n\n[...]\n\n")
+        parts.append(chunks[index])
+        previous = index
+    return "".join(parts)
@@ -0,0 +1,190 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv() # SEARCH_INDEX_PATH may be set in .env, as for the CLI
+
+from structured_analysis import NOT_FOUND, format_field_value
+
+# --- Configuration ---
+INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join("output", "search_index.sqlite3"))
+INDEX_VERSION = "index-v1" # Bump when the indexed columns or tokenizer change, so judgments are re-indexed
+
+# Searchable columns and their bm25 weights: a match in the case name or citation outranks one in the body
+COLUMNS = ("case_name", "citation", "judges", "statutes", "body")
+COLUMN_WEIGHTS = (10.0, 8.0, 5.0, 3.0, 1.0)
+# Key-info field feeding each column other than the full text
+COLUMN_FIELDS = {"case_name": "case_name", "citation": "citation", "judges": "judges", "statutes": "relevant_statutes"}
+
+# A "quoted phrase" or a single word; everything else in a query (punctuation, FTS operators) is ignored
+QUERY_TERM = re.compile(r'"([^"]+)"|(\w+)')
+
+
+# --- Query Parsing ---
+def to_match_query(query, column=None):
+    """
+    Turns a free-text query such as 'Section 302 IPC' or '"rarest of rare" Nath' into an FTS5 MATCH
+    expression that requires every word and quoted phrase, optionally only within one column.
+    Returns None if the query has no searchable words.
+    """
+    terms = []
+    for phrase, word in QUERY_TERM.findall(query):
+        words = re.findall(r"\w+", phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    if not terms:
+        return None
+    expression = " ".join(terms)
+    return f"{column} : ({expression})" if column else expression
+
+
+# --- Search Index ---
+class SearchIndex:
+    """
+    SQLite FTS5 full-text index over processed judgments: the extracted text plus the case name,
+    citation, judges and statutes from the key information. Each judgment is stored once per
+    PDF path and re-indexed only when its content hash changes, so updates are incremental.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                pdf_path TEXT NOT NULL UNIQUE,
+                doc_hash TEXT NOT NULL,
+                indexed_at REAL NOT NULL
+            )
+            """
+        )
+        # rowid of each FTS row is the documents.id; porter stemming lets "murder" match "murdered"
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS judgments USING fts5({', '.join(COLUMNS)}, tokenize='porter unicode61')"
+        )
+        self._conn.commit()
+
+    def add(self, pdf_path, doc_hash, text, key_info_fields=None):
+        """
+        Indexes (or re-indexes) one judgment. key_info_fields maps key-info field names to a
+        string or list of strings, as returned by structured_analysis.
+        Returns False without writing if this exact content is already indexed.
+        """
+        key_info_fields = key_info_fields or {}
+        values = []
+        for field in COLUMN_FIELDS.values():
+            value = key_info_fields.get(field) or ""
+            values.append("" if value == NOT_FOUND else format_field_value(value))
+        with self._lock:
+            row = self._conn.execute("SELECT id, doc_hash FROM documents WHERE pdf_path = ?", (pdf_path,)).fetchone()
+            if row is not None and row[1] == doc_hash:
+                return False
+            with self._conn:
+                if row is not None:
+                    self._conn.execute("DELETE FROM judgments WHERE rowid = ?", (row[0],))
+                    self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (pdf_path, doc_hash, indexed_at) VALUES (?, ?, ?)",
+                    (pdf_path, doc_hash, time.time()),
+                ).lastrowid
+                self._conn.execute(
+                    f"INSERT INTO judgments (rowid, {', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_id, *values, text),
+                )
+        return True
+
+    def remove(self, pdf_path):
+        """Drops one judgment from the index. Returns True if it was indexed."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM documents WHERE pdf_path = ?", (pdf_path,)).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM judgments WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        return True
+
+    def search(self, query, column=None, limit=10):
+        """
+        Returns up to limit judgments matching every word of query, best match first, as dicts with
+        pdf_path, case_name, citation, judges, score (lower is better) and a text snippet.
+        column restricts matching to one of COLUMNS.
+        """
+        if column is not None and column not in COLUMNS:
+            raise ValueError(f"Unknown search field '{column}'. Expected one of: {', '.join(COLUMNS)}")
+        match_query = to_match_query(query, column)
+        if match_query is None:
+            return []
+
+        snippet_column = COLUMNS.index(column) if column else -1 # -1 lets FTS5 pick the best-matching column
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT d.pdf_path, j.case_name, j.citation, j.judges,
+                       bm25(judgments, {', '.join(str(w) for w in COLUMN_WEIGHTS)}) AS score,
+                       snippet(judgments, {snippet_column}, '[', ']', ' ... ', 16)
+                FROM judgments j JOIN documents d ON d.id = j.rowid
+                WHERE judgments MATCH ?
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match_query, limit),
+            ).fetchall()
+        return [
+            {"pdf_path": pdf_path, "case_name": case_name, "citation": citation, "judges": judges,
+             "score": score, "snippet": snippet}
+            for pdf_path, case_name, citation, judges, score, snippet in rows
+        ]
+
+    def count(self):
+        """Number of judgments in the index."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def optimize(self):
+        """Merges the index's internal segments; worth running after indexing many judgments."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO judgments (judgments) VALUES ('optimize')")
+
+
+# --- Query CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the judgments indexed by app_cli_version.py.")
+    parser.add_argument("query", nargs="?",
+                        help='Words that must all appear, e.g. \'Section 302 IPC\' or \'"rarest of rare"\'.')
+    parser.add_argument("--field", choices=COLUMNS, help="Only match within this field.")
+    parser.add_argument("--limit", type=int, default=10, help="Maximum number of results (default: 10).")
+    parser.add_argument("--index", default=INDEX_PATH, help=f"Index file (default: {INDEX_PATH}, or $SEARCH_INDEX_PATH).")
+    parser.add_argument("--optimize", action="store_true", help="Merge index segments for faster queries, then exit.")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    if args.optimize:
+        index.optimize()
+        print(f"Optimized index of {index.count()} judgments.")
+    elif not args.query:
+        parser.error("a query is required (or use --optimize)")
+    else:
+        start = time.perf_counter()
+        results = index.search(args.query, column=args.field, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for rank, result in enumerate(results, 1):
+            print(f"{rank}. {result['case_name'] or os.path.basename(result['pdf_path'])}"
+                  + (f" — {result['citation']}" if result['citation'] else ""))
+            print(f"   {result['pdf_path']}")
+            print(f"   {' '.join(result['snippet'].split())}")
+        print(f"\n{len(results)} result(s) from {index.count()} indexed judgments in {elapsed_ms:.1f} ms.")
@@ -0,0 +1,109 @@
+import json
+import re
+
+# --- Key Information Fields ---
+# (JSON field, heading shown to the user, instruction for the model), in display order.
+# List fields come back as JSON arrays of strings; everything else as a single string.
+KEY_INFO_FIELDS = [
+    ("case_name", "Case Name", "Full case name, e.g. 'Appellant Name vs. Respondent Name'."),
+    ("citation", "Citation", "The official citation, e.g. '(YEAR) VOLUME SCC PAGE' or the neutral citation."),
+    ("court_and_date", "Court & Date", "Court name and exact date of judgment delivery, e.g. 'Supreme Court of India, DD Month YYYY'."),
+    ("judges", "Judges", "Names of the judges who authored or concurred with the judgment."),
+    ("facts", "Facts", "The most relevant facts that led to the dispute, around 40-50 words. Explicitly identify and label any "
+                       "direct, circumstantial and other evidence (e.g. expert testimony, physical evidence), if present and relevant."),
+    ("jurisdictional_basis", "Jurisdictional Basis", "The legal provision or source of power that allows the court to hear the case, "
+                                                     "such as articles/sections of the Constitution or specific statutes."),
+    ("issues", "Issue(s)", "The main legal question(s) the court was asked to decide."),
+    ("holding", "Holding", "The court's final decision or ruling on the issue(s)."),
+    ("reasoning", "Reasoning (Ratio Decidendi)", "The core legal rationale and principles the court used to arrive at its holding."),
+    ("relevant_statutes", "Relevant Statutes/Principles", "Indian Acts, Sections, or established legal principles cited or discussed."),
+    ("practical_implications", "Practical Implications", "Real-world consequences or significance for future cases, legal practice or "
+                                                         "interpretation of law, around 30 words. Say if it sets or clarifies a precedent."),
+]
+LIST_FIELDS = {"judges", "issues", "relevant_statutes"}
+NOT_FOUND = "Not found"
+
+# "**Heading:**" (or "**Heading**", "**Heading:** value") lines in the key-info text the two-call path produces
+MARKDOWN_HEADING = re.compile(
+    r"^[ \t]*\*\*(" + "|".join(re.escape(heading) for _, heading, _ in KEY_INFO_FIELDS) + r")[ \t]*:?[ \t]*\*\*:?[ \t]*",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+# JSON schema for the model's structured output (Gemini's OpenAPI subset)
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        **{
+            field: ({"type": "array", "items": {"type": "string"}} if field in LIST_FIELDS else {"type": "string"})
+            for field, _, _ in KEY_INFO_FIELDS
+        },
+    },
+    "required": ["summary"] + [field for field, _, _ in KEY_INFO_FIELDS],
+}
+
+
+# --- Prompt Helpers ---
+def describe_fields():
+    """Returns the field list for the combined-analysis prompt, one 'field: instruction' per line."""
+    return "\n".join(
+        f"- {field} ({'list of strings' if field in LIST_FIELDS else 'string'}): {instruction}"
+        for field, _, instruction in KEY_INFO_FIELDS
+    )
+
+
+# --- Parsing and Validation ---
+def parse_analysis_response(response_text):
+    """
+    Parses and validates a combined-analysis JSON response.
+    Returns (summary, key_info_fields) where key_info_fields maps each field to a string
+    or list of strings, with missing or empty fields set to "Not found".
+    Raises ValueError if the response is not a JSON object with a non-empty summary.
+    """
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Response is not a JSON object")
+
+    summary = data.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("Response has no summary")
+
+    fields = {}
+    for field, _, _ in KEY_INFO_FIELDS:
+        value = data.get(field)
+        if isinstance(value, list):
+            value = [str(item).strip() for item in value if str(item).strip()]
+        elif value is not None:
+            value = str(value).strip()
+        fields[field] = value or NOT_FOUND
+    return summary.strip(), fields
+
+
+# --- Formatting ---
+def format_field_value(value):
+    """Returns a field value as display text, joining list fields one item per line."""
+    if isinstance(value, list):
+        return "\n".join(f"- {item}" for item in value)
+    return value
+
+
+def key_info_to_markdown(fields):
+    """Renders parsed key-info fields in the same '**Heading:**' layout the two-call path produces."""
+    return "\n\n".join(f"**{heading}:**\n{format_field_value(fields[field])}" for field, heading, _ in KEY_INFO_FIELDS)
+
+
+def parse_key_info_markdown(text):
+    """
+    Recovers key-info fields from '**Heading:**' markdown written by the two-call path, so saved
+    .txt outputs can be read back. Returns {field: text}; fields missing from the text are omitted.
+    """
+    fields_by_heading = {heading.lower(): field for field, heading, _ in KEY_INFO_FIELDS}
+    matches = list(MARKDOWN_HEADING.finditer(text))
+    fields = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        value = text[match.end():next_match.start() if next_match else len(text)].strip()
+        fields[fields_by_heading[match.group(1).lower()]] = value
+    return fields
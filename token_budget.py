@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# --- Configuration ---
+# Judgment tokens each prompt may be sent; longer judgments are condensed, or cut down to their
+# opening and closing sections. The default is the old limit of 20 chunks of 2,500 tokens.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "50000"))
+PROMPT_TOKEN_BUDGETS = { # Per prompt, e.g. SUMMARY_TOKEN_BUDGET=20000 to send the summary prompt less
+    prompt: int(os.getenv(f"{prompt.upper()}_TOKEN_BUDGET", str(PROMPT_TOKEN_BUDGET))) for prompt in ("summary", "key_info")
+}
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "1048576")) # Input limit of gemini-2.0-flash-001
+RESERVED_PROMPT_TOKENS = 4096 # Room in the context window for a prompt's instructions
+HEAD_SHARE = 0.7 # Share of the budget for a long judgment's opening sections; the rest goes to its closing ones
+COUNT_CACHE_ENTRIES = 50000 # Token counts of chunks remembered, about 100 bytes each
+
+# Gemini's SentencePiece vocabulary has most words as a single token and splits digits one by one.
+# Counting each letter run as a token per WORD_PIECE_CHARS letters, and every digit, punctuation mark
+# and line break as one, comes out a little above the real count, so a budget is never overshot.
+WORD_PIECE_CHARS = 8
+WORDS = re.compile(r"[^\W\d_]+")
+SINGLE_TOKENS = re.compile(r"\d|[^\w\s]|_|\n+")
+
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+# --- Token Counting ---
+def _count(text):
+    return sum((len(word) - 1) // WORD_PIECE_CHARS + 1 for word in WORDS.findall(text)) + len(SINGLE_TOKENS.findall(text))
+
+
+def count_tokens(text):
+    """
+    Approximate number of model tokens in text, counted locally. Counts of long texts (chunks,
+    prompts) are cached by a hash of the text, so a chunk is only counted once however many
+    selections, strategies and prompts it is considered for.
+    """
+    if len(text) < 1000:
+        return _count(text)
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _counts_lock:
+        tokens = _counts.get(key)
+        if tokens is not None:
+            _counts.move_to_end(key)
+            return tokens
+    tokens = _count(text)
+    with _counts_lock:
+        _counts[key] = tokens
+        if len(_counts) > COUNT_CACHE_ENTRIES:
+            _counts.popitem(last=False)
+    return tokens
+
+
+def prompt_budget(prompt):
+    """Judgment tokens the prompt ("summary" or "key_info") may be sent, within the model's context window."""
+    return min(PROMPT_TOKEN_BUDGETS.get(prompt, PROMPT_TOKEN_BUDGET), MODEL_CONTEXT_TOKENS - RESERVED_PROMPT_TOKENS)
+
+
+# --- Budgeted Chunk Selection ---
+def select_within_budget(chunks, budget, head_share=HEAD_SHARE):
+    """
+    Chooses the chunks of a judgment to send under budget tokens. A judgment that fits is sent
+    whole. Otherwise chunks are taken from the start (court, parties, facts, issues) up to
+    head_share of the budget and from the end (reasoning, holding, final order) with the rest;
+    whatever one end leaves unused goes to the other, so the budget is filled as far as whole
+    chunks allow.
+
+    Returns a dict with text, tokens (of the text), total_tokens (of the whole judgment),
+    complete, selected_chunks and description.
+    """
+    counts = [count_tokens(chunk) for chunk in chunks]
+    total_tokens = sum(counts)
+    if total_tokens <= budget:
+        return {"text": "".join(chunks), "tokens": total_tokens, "total_tokens": total_tokens, "complete": True,
+                "selected_chunks": len(chunks), "description": f"completely in {len(chunks)} sections."}
+
+    head, used = 0, 0
+    while head < len(chunks) and used + counts[head] <= budget * head_share:
+        used += counts[head]
+        head += 1
+    tail = len(chunks) # Chunks from tail onwards are selected
+    while tail > head and used + counts[tail - 1] <= budget:
+        used += counts[tail - 1]
+        tail -= 1
+    while head < tail and used + counts[head] <= budget: # The end didn't need all of its share
+        used += counts[head]
+        head += 1
+
+    selected = chunks[:head] + chunks[tail:]
+    tail_count = len(chunks) - tail
+    description = (f"the first {head} and last {tail_count} sections." if tail_count
+                   else f"only the first {head} sections.")
+    return {"text": "".join(selected), "tokens": used, "total_tokens": total_tokens, "complete": False,
+            "selected_chunks": len(selected), "description": description}
@@ -0,0 +1,233 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# --- Configuration ---
+# One JSON line per finished stage is appended here; set TRACE_LOG_PATH to an empty string to turn logging off
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(".cache", "trace.jsonl"))
+PROFILER = os.getenv("PROFILER", "") # "cprofile" or "pyinstrument" writes a profile of every traced run
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(".cache", "profiles"))
+
+# Counters a stage accumulates through note() while it runs
+COUNTERS = ("model_calls", "model_errors", "input_tokens", "output_tokens", "cached_tokens", "retries",
+            "cache_hits", "cache_misses")
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_stage = contextvars.ContextVar("trace_stage", default=None)
+_counter_lock = threading.Lock()
+_log_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+
+# --- Traces ---
+class Trace:
+    """
+    Per-stage timings and counters for one judgment. Use it as a context manager: stages run
+    inside the block (including in threads started through model_runner and map_reduce, which
+    copy the context) are recorded here and written to the JSON trace log as each one finishes.
+    """
+
+    def __init__(self, document, log_path=TRACE_LOG_PATH):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.document = document
+        self.log_path = log_path
+        self.records = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_trace.reset(self._token)
+        return False
+
+    def add(self, record):
+        """Stores a finished stage record and appends it to the trace log."""
+        record = {"trace_id": self.trace_id, "document": self.document, **record}
+        with self._lock:
+            self.records.append(record)
+        if self.log_path:
+            write_log_line(self.log_path, record)
+
+    def summary(self):
+        """Returns one dict per stage name (in first-run order) with its runs, times and counters added up."""
+        stages = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            totals = stages.setdefault(record["stage"], {
+                "stage": record["stage"], "runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "input_chars": 0, "output_chars": 0, **{counter: 0 for counter in COUNTERS}, "errors": 0,
+            })
+            totals["runs"] += 1
+            totals["errors"] += int(record["error"] is not None)
+            for key in ("wall_seconds", "cpu_seconds", "input_chars", "output_chars") + COUNTERS:
+                totals[key] += record[key] or 0
+        return list(stages.values())
+
+    def elapsed(self):
+        """Seconds since the trace was created."""
+        return time.perf_counter() - self.started
+
+    def describe(self):
+        """One line with each stage's wall time, for printing after a judgment finishes."""
+        parts = []
+        for totals in self.summary():
+            detail = f"{totals['stage']} {totals['wall_seconds']:.2f}s"
+            extras = [f"{totals[key]} {label}" for key, label in
+                      (("model_calls", "calls"), ("retries", "retries"), ("cache_hits", "cached")) if totals[key]]
+            parts.append(detail + (f" ({', '.join(extras)})" if extras else ""))
+        return f"{'; '.join(parts)}; total {self.elapsed():.2f}s"
+
+
+def write_log_line(path, record):
+    """Appends record to the JSON-lines file at path; logging problems are printed, never raised."""
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(record, ensure_ascii=False)
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not write trace log {path}: {e}")
+
+
+def current_trace():
+    """Returns the Trace active in this context, or None."""
+    return _current_trace.get()
+
+
+# --- Stages ---
+def _size(value):
+    return len(value) if isinstance(value, (str, bytes)) else None
+
+
+@contextmanager
+def stage(name, input_chars=None):
+    """
+    Times the block as stage `name` of the active trace, yielding its record (or None when no
+    trace is active, in which case nothing is measured). Wall time is perf_counter time; CPU time
+    is that of the calling thread, so worker processes and extra threads are not included.
+    Set record["output_chars"] to the size of the stage's result.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    record = {"stage": name, "input_chars": input_chars, "output_chars": None,
+              **{counter: 0 for counter in COUNTERS}, "error": None}
+    token = _current_stage.set(record)
+    started_at = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+        record["cpu_seconds"] = round(time.thread_time() - cpu_start, 4)
+        record["started_at"] = round(started_at, 3)
+        _current_stage.reset(token)
+        trace.add(record)
+
+
+def _first_argument_size(args, kwargs):
+    return _size(args[0]) if args else None
+
+
+def traced(name, measure_input=_first_argument_size):
+    """
+    Decorator recording every call of the function as stage `name` of the active trace.
+    measure_input(args, kwargs) gives the input size (default: length of the first argument
+    when it is text); the output size is the length of a text or bytes result.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with stage(name, measure_input(args, kwargs)) as record:
+                result = fn(*args, **kwargs)
+                record["output_chars"] = _size(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def note(counter, amount=1):
+    """Adds amount to a counter (one of COUNTERS) of the stage running in this context, if any."""
+    record = _current_stage.get()
+    if record is not None:
+        with _counter_lock:
+            record[counter] += amount
+
+
+def in_current_context(fn):
+    """
+    Wraps fn to run in a copy of the caller's context, so a worker thread continues the caller's
+    trace. Each call gets its own copy, so the wrapper can be called repeatedly and concurrently.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+# --- Profiling ---
+@contextmanager
+def profiled(name, profiler=PROFILER, profile_dir=PROFILE_DIR):
+    """
+    Profiles the block with cProfile (.prof, open with snakeviz or pstats) or pyinstrument
+    (.html) and saves it under profile_dir, when profiler is set. Only the calling thread is
+    profiled, and only one block at a time; overlapping blocks run unprofiled.
+    """
+    if not profiler or not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    path = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}")
+    try:
+        if profiler == "cprofile":
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield path + ".prof"
+            finally:
+                profile.disable()
+                os.makedirs(profile_dir, exist_ok=True)
+                profile.dump_stats(path + ".prof")
+                print(f"Profile saved to {path}.prof")
+        elif profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("PROFILER=pyinstrument needs the pyinstrument package (pip install pyinstrument); not profiling.")
+                yield None
+                return
+            profile = Profiler()
+            profile.start()
+            try:
+                yield path + ".html"
+            finally:
+                profile.stop()
+                os.makedirs(profile_dir, exist_ok=True)
+                with open(path + ".html", "w", encoding="utf-8") as f:
+                    f.write(profile.output_html())
+                print(f"Profile saved to {path}.html")
+        else:
+            print(f"Unknown profiler '{profiler}'. Expected 'cprofile' or 'pyinstrument'; not profiling.")
+            yield None
+    finally:
+        _profile_lock.release()